@@ -0,0 +1,246 @@
+"""
+Parsing of the LLMWhisperer ASCII tables of the pages of
+tests/processors/fixtures: the previous read_csv (python engine) based parser
+versus the single pass convert_list_to_dict, which validates the dates of all
+the tables of a page at once.
+
+    PYTHONPATH=src python benchmarks/bench_ascii_table_parser.py --repeat 20
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import math
+import os
+import re
+import time
+from collections import defaultdict
+from io import StringIO
+
+import pandas as pd
+
+from processors import llmwhisperer_analytical as lwa
+from utils.extract_utils import validate
+
+FIXTURES = os.path.join(
+    os.path.dirname(__file__), "..", "tests", "processors", "fixtures"
+)
+
+
+def strip_columns_names(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = df.columns.str.strip()
+    return df
+
+
+def strip_string_cells(df: pd.DataFrame) -> pd.DataFrame:
+    for column in df.columns:
+        if df[column].dtype == "object":
+            df[column] = df[column].str.strip()
+    return df
+
+
+def find_similar_columns(lst: list[str], pattern: re.Pattern) -> dict:
+    grouped_items = defaultdict(list)
+    for item in lst:
+        if re.search(pattern, item):
+            prefix = re.split(pattern, item)[0]
+            grouped_items[prefix].append(item)
+    return grouped_items
+
+
+def get_first_not_null_value(
+    df: pd.DataFrame, index: int, input_list: list[str]
+):
+    for col in input_list:
+        value = df.at[index, col]
+        if value is not None or math.isnan(value) or value == "":
+            return value.strip() if isinstance(value, str) else value
+    return None
+
+
+def read_csv_table_to_dataframe(table: str) -> pd.DataFrame:
+    """
+    The previous from_ascii_table_to_dataframe: python engine read_csv
+    followed by the column repair rounds, with the helpers above, kept here
+    as they were since the parser no longer uses them.
+    """
+    lines = table.split("\n")
+    lines_to_skip = [
+        i
+        for i, line in enumerate(lines)  # jump header line
+        if re.match(lwa.pattern_table_separator, line)
+    ]
+    df = strip_columns_names(
+        pd.read_csv(
+            StringIO(table),
+            sep="|",
+            skipinitialspace=True,
+            engine="python",
+            skiprows=lines_to_skip,
+            index_col=0,
+            dtype=str,
+        ).reset_index(drop=True)
+    )
+    df = df[
+        df["Data"].apply(lambda x: isinstance(x, str) and validate(x.strip()))
+    ]  # type: ignore
+    columns_from_txt: list[str] = df.columns.str.strip().to_list()[
+        :-1
+    ]  # remove last column because is aways empty
+    # situações de falha de processamento que necessita de tratamento
+    if columns_from_txt != lwa.COLUMNS.to_list():
+        # falha de processamento que gera coluna repetida
+        if (
+            len(
+                list(
+                    filter(
+                        lambda el: re.search(r"( \.[0-9]+)$", el),
+                        columns_from_txt,
+                    )
+                )
+            )
+            > 0
+        ):
+            print("Processing error: duplicate column title found., fixing...")
+            repeated_columns = find_similar_columns(
+                columns_from_txt, re.compile(r"( \.[0-9]+)$")
+            )
+            for key, value in repeated_columns.items():
+                columns_not_empty = []
+                for column in value:
+                    if df[column].isna().all():  # type: ignore
+                        columns_not_empty.append(column)
+                for item in df[key].index:
+                    if (
+                        df.at[item, key] is None
+                        or pd.isna(df.at[item, key])
+                        or df.at[item, key] == ""
+                    ):
+                        df.at[item, key] = get_first_not_null_value(
+                            df, item, columns_not_empty
+                        )
+                df.drop(columns=value, inplace=True)
+                print(f"finished removing duplicate columns for {key}")
+                columns_from_txt = df.columns.str.strip().to_list()[
+                    :-1
+                ]  # remove last column because is aways empty
+        # falha de processamento quando funde duas colunas  Descrição e Participante
+        if "Descrição Participante" in df.columns.str.strip():
+            print(
+                "Processing error: 'Descrição Participante' column found., fixing..."
+            )
+            df.rename(
+                columns={
+                    "Descrição Participante": "Descrição",
+                },
+                inplace=True,
+            )
+            df.insert(loc=2, column="Participante", value="")
+            print("Fixed 'Descrição Participante' column.")
+            columns_from_txt = df.columns.str.strip().to_list()[
+                :-1
+            ]  # remove last column because is aways empty
+
+        # falha de processamento que gera coluna vazia no meio da tabela
+        if (
+            len(
+                list(
+                    filter(
+                        lambda el: re.search(r"^Unnamed", el), columns_from_txt
+                    )
+                )
+            )
+            > 0
+        ):
+            print("Processing error: empty column title found., fixing...")
+            if df["Valor"].isna().all():  # type: ignore
+                print("Iniciando movimentação de dados para coluna correta")
+                df.drop(columns=["Valor"], inplace=True)
+                for index, column in reversed(
+                    list(enumerate(columns_from_txt))
+                ):  # type: ignore
+                    if re.search(r"^Unnamed", column):
+                        break
+                    df.rename(
+                        columns={
+                            columns_from_txt[index - 1]: columns_from_txt[
+                                index
+                            ],
+                        },
+                        inplace=True,
+                    )
+                print("Colunas movimentadas com sucesso.. continuando...")
+            else:
+                print(
+                    "Situação não tratada: coluna Valor preenchida, por enquanto deixa como está"
+                )
+            columns_from_txt = df.columns.str.strip().to_list()[
+                :-1
+            ]  # remove last column because is aways empty
+    df = df.loc[:, ~df.columns.str.contains("^Unnamed")]
+    df.columns = lwa.COLUMNS
+    # concat_dataframe_cells ran here, but every row left has a valid date,
+    # so it never found a continuation row to merge
+    return strip_string_cells(df)  # type: ignore
+
+
+def fixture_pages() -> list[list[str]]:
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            blocks = lwa.split_blocks(f.read())
+        pages.append([lwa.clean_table_text(block) for block in blocks])
+    return pages
+
+
+def read_csv_page(data: list[str]) -> dict:
+    """
+    The previous convert_list_to_dict, one read_csv parse per table.
+    """
+    return {
+        data[i - 1].strip(): read_csv_table_to_dataframe(line)
+        for i, line in enumerate(data)
+        if re.match(lwa.pattern_table_text, line)
+    }
+
+
+def measure(parser, pages: list[list[str]], repeat: int) -> tuple[float, list]:
+    # the parsers print the column repairs, keep them out of the timings
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            parsed = [parser(page) for page in pages]
+        return time.perf_counter() - started, parsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = fixture_pages()
+    slow, expected = measure(read_csv_page, pages, args.repeat)
+    fast, parsed = measure(lwa.convert_list_to_dict, pages, args.repeat)
+    tables = 0
+    for page, reference in zip(parsed, expected, strict=True):
+        assert list(page) == list(reference)
+        for key, frame in page.items():
+            tables += 1
+            # data_processing fills the empty cells, None or NaN alike
+            pd.testing.assert_frame_equal(
+                frame.reset_index(drop=True).fillna(""),
+                reference[key].reset_index(drop=True).fillna(""),
+                check_dtype=False,
+            )
+
+    runs = len(pages) * args.repeat
+    print(f"pages: {len(pages)} ({tables} tables) x {args.repeat}")
+    print(f"read_csv: {slow / runs * 1000:.2f} ms/page")
+    print(
+        f"single pass: {fast / runs * 1000:.2f} ms/page ({slow / fast:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
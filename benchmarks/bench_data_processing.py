@@ -0,0 +1,106 @@
+"""
+Assembly of the analytical rows: the previous pd.concat inside the loop of
+data_processing versus the single concat, from 10 to 10k rows.
+
+    PYTHONPATH=src python benchmarks/bench_data_processing.py --rows 10 100 1000 10000
+"""
+
+import argparse
+import time
+
+import pandas as pd
+
+from processors import llmwhisperer_analytical as lwa
+
+# rows per account block of the synthetic report
+BLOCK_ROWS = 5
+
+
+def concat_in_loop(data: dict, filename: str) -> pd.DataFrame:
+    """
+    The previous data_processing: each block concatenated to the result.
+    """
+    return_data = pd.DataFrame([], columns=lwa.COLUMNS)
+    for key, value in data.items():
+        if isinstance(value, pd.DataFrame):
+            inner_data = value.copy()
+            inner_data["ContaContabilCompleto"] = key
+            inner_data["ContaContabilDescritivo"] = (
+                lwa.extract_group_from_contacontabilcompleto(
+                    lwa.pattern_account_grouped, key, 3
+                )
+            )
+            inner_data["ContaContabil"] = (
+                lwa.extract_group_from_contacontabilcompleto(
+                    lwa.pattern_account_grouped, key, 1
+                )
+            )
+            inner_data["file"] = filename
+            inner_data.drop(columns=["ContaContabilCompleto"], inplace=True)
+            return_data = pd.concat(
+                [return_data, inner_data], ignore_index=True
+            )
+    return_data["Valor"] = (
+        return_data["Valor"]
+        .replace(to_replace=r"\.", value="", regex=True)
+        .replace(to_replace=r",", value=".", regex=True)
+        .astype(pd.Float64Dtype())
+    )
+    return_data["ContaContabil"] = return_data["ContaContabil"].astype(str)
+    return_data["Documento"] = return_data["Documento"].astype(str)
+    return_data["Data"] = pd.to_datetime(
+        return_data["Data"], format="%d/%m/%Y"
+    )
+    return_data.rename(columns={"Descrição": "Descricao"}, inplace=True)
+    return_data.rename(columns={"Período": "Periodo"}, inplace=True)
+    return_data.fillna("", inplace=True)
+    return return_data
+
+
+def synthetic_blocks(rows: int) -> dict:
+    blocks = {}
+    for block in range(max(rows // BLOCK_ROWS, 1)):
+        blocks[f"1.{block} - Conta {block}"] = pd.DataFrame(
+            [
+                [
+                    f"{i % 28 + 1:02d}/{i % 12 + 1:02d}/2024",
+                    f"Descrição {i}",
+                    f"Participante {i}",
+                    "12/2024",
+                    str(i),
+                    f"{i}.{i % 1000:03d},{i % 100:02d}",
+                ]
+                for i in range(block * BLOCK_ROWS, (block + 1) * BLOCK_ROWS)
+            ],
+            columns=lwa.COLUMNS,
+        )
+    return blocks
+
+
+def measure(function, *args) -> tuple[float, pd.DataFrame]:
+    started = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[10, 100, 1000, 10000]
+    )
+    args = parser.parse_args()
+
+    print(f"{'rows':>6} {'function':>22} {'before':>10} {'after':>10}")
+    for rows in args.rows:
+        blocks = synthetic_blocks(rows)
+        slow, expected = measure(concat_in_loop, blocks, "bench.pdf")
+        fast, result = measure(lwa.data_processing, blocks, "bench.pdf")
+        pd.testing.assert_frame_equal(result, expected)
+        print(
+            f"{rows:>6} {'data_processing':>22} "
+            f"{slow * 1000:>8.1f}ms {fast * 1000:>8.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Row classification and title propagation of a docling table: the row by row
+identify_row/get_current_title applies versus the vectorized identify_rows
+and current_titles, on a synthetic table.
+
+    PYTHONPATH=src python benchmarks/bench_docling_titles.py --rows 5000
+"""
+
+import argparse
+import time
+
+from pandas import DataFrame
+
+from processors.docling_analytical import (
+    current_titles,
+    get_current_title,
+    identify_row,
+    identify_rows,
+)
+
+
+def synthetic_table(rows: int) -> DataFrame:
+    data = []
+    for i in range(rows):
+        if i % 50 == 0:
+            data.append(f"1.{i // 50} - Conta {i // 50}")
+        elif i % 50 == 49:
+            data.append(f"TOTAL: 1.{i // 50} Conta {i // 50}")
+        else:
+            data.append(f"{i % 28 + 1:02d}/{i % 12 + 1:02d}/2024")
+    return DataFrame({"Data": data})
+
+
+def row_by_row(table: DataFrame) -> DataFrame:
+    table = table.copy()
+    table.insert(0, "tipoDado", table.apply(identify_row, axis=1))
+    table.insert(
+        0,
+        "ContaContabilCompleto",
+        table.apply(lambda row: get_current_title(table, row), axis=1),
+    )
+    return table
+
+
+def vectorized(table: DataFrame) -> DataFrame:
+    table = table.copy()
+    table.insert(0, "tipoDado", identify_rows(table["Data"]))
+    table.insert(0, "ContaContabilCompleto", current_titles(table))
+    return table
+
+
+def measure(fn, table: DataFrame) -> tuple[float, DataFrame]:
+    started = time.perf_counter()
+    result = fn(table)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    table = synthetic_table(args.rows)
+    slow, expected = measure(row_by_row, table)
+    fast, result = measure(vectorized, table)
+    assert result.equals(expected), "vectorized result differs"
+
+    print(f"rows: {args.rows}")
+    print(f"row by row: {slow * 1000:.1f} ms")
+    print(f"vectorized: {fast * 1000:.1f} ms ({slow / fast:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
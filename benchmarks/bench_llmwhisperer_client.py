@@ -0,0 +1,116 @@
+"""
+Per-page overhead of creating an LLMWhispererClientV2 for every page versus
+the process-wide pooled client, against a local stand-in of the API.
+
+The stand-in answers instantly, so the timings isolate client setup and
+connection handling. --handshake-ms delays every new connection to emulate
+the TLS handshake paid against the real (https) service.
+
+    PYTHONPATH=src python benchmarks/bench_llmwhisperer_client.py --pages 200
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from unstract.llmwhisperer import LLMWhispererClientV2
+from unstract.llmwhisperer import client_v2 as llmwhisperer_client_module
+
+from services.llmwhisperer import get_client, process_pdf_file
+
+
+def make_handler(handshake_seconds: float):
+    class StandInHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        disable_nagle_algorithm = True
+        connections = 0
+
+        def setup(self):
+            type(self).connections += 1
+            time.sleep(handshake_seconds)
+            super().setup()
+
+        def reply(self, status: int, body: dict):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):  # noqa: N802
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.reply(202, {"whisper_hash": "h", "status": "processing"})
+
+        def do_GET(self):  # noqa: N802
+            if self.path.startswith("/whisper-status"):
+                self.reply(200, {"status": "processed"})
+            else:
+                self.reply(200, {"result_text": "| Data | Valor |"})
+
+        def log_message(self, *_):
+            pass
+
+    return StandInHandler
+
+
+def run_pages(pages: int, input_path: str, output_path: str, client_fn):
+    start = time.perf_counter()
+    for _ in range(pages):
+        assert process_pdf_file(input_path, output_path, client=client_fn())
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--handshake-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    handler = make_handler(args.handshake_ms / 1000)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["LLMWHISPERER_BASE_URL_V2"] = (
+        f"http://127.0.0.1:{server.server_port}"
+    )
+    os.environ["LLMWHISPERER_LOGGING_LEVEL"] = "ERROR"
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        input_path = os.path.join(tmpdir, "page.pdf")
+        output_path = os.path.join(tmpdir, "page.txt")
+        with open(input_path, "wb") as f:
+            f.write(b"%PDF-1.4 stand-in page")
+
+        # baseline: the client library with a new session per request
+        llmwhisperer_client_module.requests = requests
+        handler.connections = 0
+        per_page = run_pages(
+            args.pages, input_path, output_path, LLMWhispererClientV2
+        )
+        per_page_connections = handler.connections
+
+        handler.connections = 0
+        pooled = run_pages(args.pages, input_path, output_path, get_client)
+        pooled_connections = handler.connections
+
+    server.shutdown()
+    print(f"pages: {args.pages}, handshake: {args.handshake_ms} ms")
+    for name, seconds, connections in (
+        ("client per page", per_page, per_page_connections),
+        ("pooled client", pooled, pooled_connections),
+    ):
+        print(
+            f"{name:>16}: {seconds:8.3f} s total, "
+            f"{seconds / args.pages * 1000:7.2f} ms/page, "
+            f"{connections} connections"
+        )
+    print(f"saved per page: {(per_page - pooled) / args.pages * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Merge of the page csvs: the previous merge_document, reading every file in a
+DataFrame and writing their concatenation, versus the streaming merge, with
+and without read-ahead threads. Reports the time and the peak memory
+allocated by Python (tracemalloc).
+
+    PYTHONPATH=src python benchmarks/bench_merger.py --files 2000 --rows 60
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from utils.merger import merge_document
+
+COLUMNS = [
+    "Data",
+    "Descricao",
+    "Participante",
+    "Documento",
+    "Valor",
+    "ContaContabil",
+    "file",
+]
+
+
+def merge_in_memory(path: str, output_path: str):
+    csv_files = [
+        os.path.join(path, f)
+        for f in os.listdir(path)
+        if f.endswith(".csv") and os.path.join(path, f) != output_path
+    ]
+    dataframes = [pd.read_csv(file_path) for file_path in csv_files]
+    merged_df = pd.concat(dataframes, ignore_index=False)
+    merged_df.to_csv(output_path, index=False)
+
+
+def write_pages(path: str, files: int, rows: int):
+    for page in range(files):
+        file = f"2024-01_page_{page:05d}.csv"
+        lines = [",".join(f'"{column}"' for column in COLUMNS)]
+        lines += [
+            f'"2024-01-{row % 28 + 1:02d}","Pagamento {row} referente ao '
+            f'servico","Fornecedor {row % 37}","{page * rows + row}",'
+            f'"{row * 10.5}","3.1.{row % 9}","{file}"'
+            for row in range(rows)
+        ]
+        with open(os.path.join(path, file), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def measure(label: str, merge, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    merge(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<24} {elapsed:8.2f} s {peak / 1024 / 1024:10.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=60)
+    parser.add_argument("--read-workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as path:
+        pages = os.path.join(path, "pages")
+        os.mkdir(pages)
+        write_pages(pages, args.files, args.rows)
+        size = sum(
+            os.path.getsize(os.path.join(pages, f)) for f in os.listdir(pages)
+        )
+        print(f"{args.files} files, {size / 1024 / 1024:.1f} MB")
+        print(f"{'':<24} {'time':>10} {'peak':>13}")
+        outputs = {
+            "pandas concat": os.path.join(path, "concat.csv"),
+            "streaming": os.path.join(path, "streaming.csv"),
+            "streaming + threads": os.path.join(path, "threads.csv"),
+        }
+        measure(
+            "pandas concat", merge_in_memory, pages, outputs["pandas concat"]
+        )
+        measure("streaming", merge_document, pages, outputs["streaming"])
+        measure(
+            "streaming + threads",
+            merge_document,
+            pages,
+            outputs["streaming + threads"],
+            args.read_workers,
+        )
+
+        rows = {
+            label: pd.read_csv(output)
+            .sort_values(["file", "Documento"])
+            .reset_index(drop=True)
+            for label, output in outputs.items()
+        }
+        for merged in rows.values():
+            pd.testing.assert_frame_equal(merged, rows["pandas concat"])
+        print("same rows in every output")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Output formats of the merger: the flat merged csv versus the Parquet
+dataset partitioned by PeriodoPrestacaoContas. Reports the size on disk,
+the time to read everything with pandas and the time to read a single
+period (the csv is read whole and filtered, the dataset prunes the other
+partitions).
+
+    PYTHONPATH=src python benchmarks/bench_merger_formats.py --periods 36 --files 100 --rows 60
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from utils.merger import merge_document, merge_document_parquet
+
+COLUMNS = [
+    "ContaContabil",
+    "ContaContabilDescritivo",
+    "ContaContabilGrupo",
+    "CompoeTaxa",
+    "PeriodoPrestacaoContas",
+    "Data",
+    "Descricao",
+    "Participante",
+    "Documento",
+    "Valor",
+    "file",
+]
+
+
+def write_pages(path: str, periods: int, files: int, rows: int):
+    for p in range(periods):
+        period = f"{2022 + p // 12}-{p % 12 + 1:02d}"
+        for page in range(files):
+            file = f"{period}_page_{page:04d}.csv"
+            lines = [",".join(f'"{column}"' for column in COLUMNS)]
+            for row in range(rows):
+                account = (page * rows + row) % 40
+                lines.append(
+                    f'"3.1.{account}","Despesa {account}","Despesas",'
+                    f'"{account % 2 == 0}","{period}",'
+                    f'"{period}-{row % 28 + 1:02d}",'
+                    f'"Pagamento {row} referente ao servico",'
+                    f'"Fornecedor {row % 37}","{page * rows + row}",'
+                    f'"{row * 10.5}","{file}"'
+                )
+            with open(os.path.join(path, file), "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+
+
+def size_of(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, f))
+        for root, _, files in os.walk(path)
+        for f in files
+    )
+
+
+def timed(read) -> tuple[float, pd.DataFrame]:
+    start = time.perf_counter()
+    result = read()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--periods", type=int, default=36)
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=60)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as path:
+        pages = os.path.join(path, "pages")
+        os.mkdir(pages)
+        write_pages(pages, args.periods, args.files, args.rows)
+        merged_csv = os.path.join(path, "merged.csv")
+        merged_parquet = os.path.join(path, "merged")
+        merge_document(pages, merged_csv)
+        merge_document_parquet(
+            pages, merged_parquet, ["PeriodoPrestacaoContas"]
+        )
+        period = "2023-06"
+
+        csv_all, csv_rows = timed(lambda: pd.read_csv(merged_csv))
+        parquet_all, parquet_rows = timed(
+            lambda: pd.read_parquet(merged_parquet)
+        )
+        csv_one, csv_period = timed(
+            lambda: (
+                (table := pd.read_csv(merged_csv))[
+                    table["PeriodoPrestacaoContas"] == period
+                ]
+            )
+        )
+        parquet_one, parquet_period = timed(
+            lambda: pd.read_parquet(
+                merged_parquet,
+                filters=[("PeriodoPrestacaoContas", "=", period)],
+            )
+        )
+        assert len(csv_rows) == len(parquet_rows)
+        assert len(csv_period) == len(parquet_period) > 0
+        assert csv_rows["Valor"].sum() == parquet_rows["Valor"].sum()
+
+        print(f"{len(csv_rows)} rows, {args.periods} periods")
+        print(f"{'':<10} {'size':>10} {'read all':>10} {'1 period':>10}")
+        for label, output, read_all, read_one in [
+            ("csv", merged_csv, csv_all, csv_one),
+            ("parquet", merged_parquet, parquet_all, parquet_one),
+        ]:
+            print(
+                f"{label:<10} {size_of(output) / 1024 / 1024:7.1f} MB "
+                f"{read_all:8.2f} s {read_one:8.2f} s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Enrichment of an analytical page csv with the configuration sheets: the
+previous row by row transform_generated_analytical_data (a boolean mask over
+the sheets for every row and column) versus the indexed one, on a synthetic
+page and synthetic sheets. Both outputs must be byte for byte identical.
+
+    PYTHONPATH=src python benchmarks/bench_transformer.py --rows 2000 --accounts 300
+"""
+
+import argparse
+import csv
+import os
+import shutil
+import tempfile
+import time
+from types import FunctionType
+
+import pandas
+
+from rp_transformers.analytical import (
+    add_configurated_column,
+    add_periodo_competencia_column,
+    extract_common_unit_information,
+    regex_old_unit_format,
+    rename_unit,
+    transform_generated_analytical_data,
+)
+from utils.config_loader import ConfigLoader
+
+FILE_NAME = "page_10_2024-01.csv"
+
+
+def transform_row_by_row(
+    csv_page_path: str,
+    analytical_accounts_configuration_url: str,
+    analytical_units_renamed_list_url: str,
+):
+    """
+    The previous transform_generated_analytical_data.
+    """
+    accounts_configuration: pandas.DataFrame = pandas.DataFrame()
+    units_to_rename: pandas.DataFrame = pandas.DataFrame()
+    if analytical_accounts_configuration_url:
+        accounts_configuration = pandas.read_csv(
+            analytical_accounts_configuration_url,
+            dtype={
+                "ContaContabil": str,
+                "ContaContabilGrupo": str,
+                "ContaContabilNormalizado": str,
+            },
+        )
+    if analytical_units_renamed_list_url:
+        units_to_rename = pandas.read_csv(analytical_units_renamed_list_url)
+
+    csv_to_transform = pandas.read_csv(csv_page_path, dtype=str).fillna("")
+    table_output = csv_to_transform.copy()
+    if not units_to_rename.empty:
+        table_output.insert(
+            0,
+            "ParticipanteReview",
+            table_output.apply(
+                lambda row: rename_unit(
+                    row["Participante"],
+                    units_to_rename[
+                        units_to_rename["Participante"].str.match(
+                            ".*"
+                            + extract_common_unit_information(
+                                row["Participante"], regex_old_unit_format
+                            )
+                        )
+                    ],
+                ),
+                axis=1,
+            ),
+        )
+        table_output.drop(columns=["Participante"], inplace=True)
+        table_output.rename(
+            columns={"ParticipanteReview": "Participante"}, inplace=True
+        )
+    if not accounts_configuration.empty:
+        for column_name in [
+            "PeriodoPrestacaoContas",
+            "ContaContabilGrupo",
+            "ContaContabilGrupoDescritivo",
+            "Natureza",
+            "NaturezaDescritivo",
+            "CompoeTaxa",
+            "AcordadoAssembleia",
+            "ContaContabilDescritivo",
+            "ContaContabilNormalizado",
+        ]:
+            if column_name in list(csv_to_transform.columns.values):
+                table_output.drop(columns=[column_name], inplace=True)
+            fnlambda: FunctionType = add_configurated_column
+            if column_name == "PeriodoPrestacaoContas":
+                fnlambda = add_periodo_competencia_column
+            table_output.insert(
+                0,
+                column_name,
+                table_output.apply(
+                    lambda row: fnlambda(  # noqa: B023
+                        column_name,  # noqa: B023
+                        accounts_configuration[
+                            (
+                                row["ContaContabil"]
+                                == accounts_configuration["ContaContabil"]
+                            )
+                            | (
+                                row["ContaContabil"]
+                                == accounts_configuration[
+                                    "ContaContabilNormalizado"
+                                ]
+                            )
+                        ],
+                        row["file"],
+                    ),
+                    axis=1,
+                ),
+            )
+        table_output.drop(columns=["ContaContabil"], inplace=True)
+        table_output.rename(
+            columns={"ContaContabilNormalizado": "ContaContabil"},
+            inplace=True,
+        )
+    table_output.to_csv(csv_page_path, index=False, quoting=csv.QUOTE_ALL)
+
+
+def write_sheets(directory: str, accounts: int, units: int) -> tuple[str, str]:
+    accounts_path = os.path.join(directory, "accounts.csv")
+    pandas.DataFrame(
+        [
+            {
+                "ContaContabil": f"1.{i:03d}",
+                "ContaContabilDescritivo": f"Conta {i}",
+                "ContaContabilGrupo": f"1.{i % 10}",
+                "ContaContabilGrupoDescritivo": f"Grupo {i % 10}",
+                "Natureza": 1 + i % 2,
+                "NaturezaDescritivo": "Receita" if i % 2 == 0 else "Despesa",
+                "ContaContabilNormalizado": f"1.{i}",
+                "CompoeTaxa": i % 3 == 0,
+                "AcordadoAssembleia": i % 5 == 0,
+            }
+            for i in range(accounts)
+        ]
+    ).to_csv(accounts_path, index=False)
+    units_path = ""
+    if units:
+        units_path = os.path.join(directory, "units.csv")
+        pandas.DataFrame(
+            {
+                "Participante": [
+                    f"Un. R{i % 30}-{i}-QD{i % 40}-LT{i % 50}"
+                    for i in range(units)
+                ]
+            }
+        ).to_csv(units_path, index=False)
+    return accounts_path, units_path
+
+
+def write_page(path: str, rows: int, accounts: int, units: int) -> None:
+    pandas.DataFrame(
+        [
+            {
+                "Data": "2024-01-02",
+                "Descricao": f"Lançamento {i}",
+                # units, some of them missing from the rename list, and
+                # participants that are not units
+                "Participante": f"Un. {i % (units + 10)}-QD{i % (units + 10) % 40}-LT{i % (units + 10) % 50}"
+                if i % 4
+                else f"Fornecedor {i}",
+                "Periodo": "01/2024",
+                "Documento": str(i),
+                "Valor": i * 1.5,
+                "ContaContabilDescritivo": f"Conta {i}",
+                # codes by ContaContabil, by ContaContabilNormalizado and
+                # codes missing from the account plan
+                "ContaContabil": f"1.{i % accounts:03d}"
+                if i % 3 == 0
+                else f"1.{i % (accounts + 20)}",
+                "file": FILE_NAME,
+            }
+            for i in range(rows)
+        ]
+    ).to_csv(path, index=False, quoting=csv.QUOTE_NONNUMERIC)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--accounts", type=int, default=300)
+    parser.add_argument("--units", type=int, default=0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        accounts_path, units_path = write_sheets(
+            directory, args.accounts, args.units
+        )
+        before = os.path.join(directory, "before", FILE_NAME)
+        after = os.path.join(directory, "after", FILE_NAME)
+        for path in (before, after):
+            os.makedirs(os.path.dirname(path))
+            write_page(path, args.rows, args.accounts, args.units)
+
+        started = time.perf_counter()
+        transform_row_by_row(before, accounts_path, units_path)
+        slow = time.perf_counter() - started
+
+        started = time.perf_counter()
+        transform_generated_analytical_data(
+            after,
+            accounts_path,
+            units_path,
+            config_loader=ConfigLoader(accounts_path, units_path),
+        )
+        fast = time.perf_counter() - started
+
+        with open(before, "rb") as f, open(after, "rb") as g:
+            assert f.read() == g.read(), "outputs differ"
+    finally:
+        shutil.rmtree(directory)
+
+    print(f"rows: {args.rows}, accounts: {args.accounts}, units: {args.units}")
+    print(f"row by row: {slow * 1000:.1f} ms")
+    print(f"indexed: {fast * 1000:.1f} ms ({slow / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
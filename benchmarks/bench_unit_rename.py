@@ -0,0 +1,105 @@
+"""
+Renaming of the units of an analytical page: the previous rename_unit apply,
+scanning the whole rename list with a fresh regex for every row, versus
+rename_units with the unit index built once per run.
+
+    PYTHONPATH=src python benchmarks/bench_unit_rename.py --rows 50000 --units 2000
+"""
+
+import argparse
+import time
+
+import pandas
+
+from rp_transformers.analytical import (
+    build_units_index,
+    extract_common_unit_information,
+    regex_old_unit_format,
+    rename_unit,
+    rename_units,
+)
+
+
+class SheetsStandIn:
+    """
+    Minimal ConfigLoader providing only the rename list.
+    """
+
+    def __init__(self, units_to_rename: pandas.DataFrame):
+        self._units_to_rename = units_to_rename
+
+    def units_to_rename(self) -> pandas.DataFrame:
+        return self._units_to_rename
+
+
+def rename_row_by_row(
+    table: pandas.DataFrame, units_to_rename: pandas.DataFrame
+) -> pandas.Series:
+    return table.apply(
+        lambda row: rename_unit(
+            row["Participante"],
+            units_to_rename[
+                units_to_rename["Participante"].str.match(
+                    ".*"
+                    + extract_common_unit_information(
+                        row["Participante"], regex_old_unit_format
+                    )
+                )
+            ],
+        ),
+        axis=1,
+    )
+
+
+def unit_code(i: int) -> str:
+    # fixed width, so no code is a substring of another one
+    return f"{i:05d}-QD{i % 40:02d}-LT{i % 50:02d}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--units", type=int, default=2000)
+    args = parser.parse_args()
+
+    units_to_rename = pandas.DataFrame(
+        {
+            "Participante": [
+                f"Un. R{i % 30:02d}-{unit_code(i)}" for i in range(args.units)
+            ]
+        }
+    )
+    # units, some of them missing from the rename list, participants that
+    # are not units and empty participants
+    table = pandas.DataFrame(
+        {
+            "Participante": [
+                ""
+                if i % 10 == 0
+                else f"Fornecedor {i}"
+                if i % 4 == 0
+                else f"Un. {unit_code(i % (args.units + 100))}"
+                for i in range(args.rows)
+            ]
+        }
+    )
+
+    started = time.perf_counter()
+    expected = rename_row_by_row(table, units_to_rename)
+    slow = time.perf_counter() - started
+
+    started = time.perf_counter()
+    units_index = build_units_index(SheetsStandIn(units_to_rename))  # type: ignore
+    renamed = rename_units(
+        table["Participante"], units_index, units_to_rename["Participante"]
+    )
+    fast = time.perf_counter() - started
+
+    assert renamed.to_list() == expected.to_list(), "renames differ"
+    print(f"rows: {args.rows}, units: {args.units}")
+    print(f"row by row: {slow * 1000:.1f} ms")
+    print(f"indexed: {fast * 1000:.1f} ms ({slow / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,42 @@
+import csv
+import hashlib
+import io
 import os
 import shutil
+import time
+from collections import Counter, deque
+from collections.abc import Iterable, Iterator
+from functools import partial
 from types import FunctionType
 
+import pandas
 from google.cloud import bigquery
 
 from processors.llmwhisperer_analytical import (
     process_txt_file as process_txt_file_llmwhisperer,
 )
-from rp_transformers.analytical import transform_generated_analytical_data
+from processors.text_layer import (
+    process_pdf_file as process_pdf_file_text_layer,
+)
+from rp_transformers.analytical import (
+    to_text_table,
+    transform_analytical_data,
+    transform_generated_analytical_data,
+)
 from services.gcp import (
+    CsvBatchLoader,
     clear_data_analytical_from_file,
-    upload_csv_to_bigquery,
-)
-from services.llmwhisperer import (
-    process_pdf_file as process_pdf_file_llmwhisperer,
+    cluster_analytical_table,
+    create_staging_table,
+    replace_files_from_staging,
+    upload_function,
 )
-from utils.constants import FileType
-from utils.spliter import split_pdf_to_pages
+from utils.config_loader import ConfigLoader
+from utils.constants import FileType, UploadFormat
+from utils.job_state import JobState, RunState
+from utils.ocr_cache import OcrCache, hash_file
+from utils.pipeline import prefetch
+from utils.spliter import iter_pdf_pages, split_pdf_to_pages
 
 
 def is_this_file_type(path: str, type: FileType) -> bool:
@@ -39,7 +59,36 @@ def reprocess(
     client: bigquery.Client,
     dataset_id: str,
     table_id: str,
+    ocr_client: object | None = None,
+    ocr_cache: OcrCache | None = None,
+    config_loader: ConfigLoader | None = None,
+    upload_format: UploadFormat = UploadFormat.csv,
+    staging_merge: bool = False,
+    cluster_table: bool = False,
 ) -> None:
+    """
+    Reprocesses the files of source_dir of the given type. With
+    staging_merge, the csvs uploaded are loaded into a staging table and
+    replace the rows of their files in a single MERGE, instead of a
+    DELETE and a load job per file. cluster_table clusters the table by
+    file and PeriodoPrestacaoContas before uploading.
+    """
+    # the configuration sheets are fetched once for all the files
+    if config_loader is None:
+        config_loader = ConfigLoader(
+            analytical_accounts_configuration, analytical_units_renamed_list
+        )
+    if upload and cluster_table:
+        cluster_analytical_table(client, dataset_id, table_id)
+    staging_loader: CsvBatchLoader | None = None
+    staged: list[str] = []
+    if upload and staging_merge and file_type == FileType.CSV:
+        staging_loader = CsvBatchLoader(
+            client,
+            dataset_id,
+            create_staging_table(client, dataset_id, table_id),
+            upload_format=upload_format,
+        )
     files: list[str] = [
         os.path.join(source_dir, file)
         for file in os.listdir(source_dir)
@@ -55,12 +104,8 @@ def reprocess(
                 print(f"Converting {page_path} to text...")
                 file_txt_path = process_pdf_file_fn(
                     page_path,
-                    page_path.replace(
-                        ".pdf",
-                        ".txt"
-                        if process_pdf_file_fn == process_pdf_file_llmwhisperer
-                        else ".csv",
-                    ),
+                    ocr_output_path(page_path, process_txt_file_fn),
+                    **ocr_kwargs(ocr_client, ocr_cache),
                 )
                 shutil.move(
                     file_txt_path,
@@ -82,7 +127,14 @@ def reprocess(
                     page_path,
                     analytical_accounts_configuration,
                     analytical_units_renamed_list,
+                    config_loader=config_loader,
                 )
+                if staging_loader is not None:
+                    # moved only once its rows are merged into the table
+                    with open(page_path, "rb") as f:
+                        staging_loader.add(f.read())
+                    staged.append(page_path)
+                    continue
                 if upload:
                     print(f"Deleting existing data from {page_path}")
                     clear_data_analytical_from_file(
@@ -92,7 +144,7 @@ def reprocess(
                         os.path.basename(page_path),
                     )
                     print(f"Uploading {page_path} to BigQuery...")
-                    upload_csv_to_bigquery(
+                    upload_function(upload_format)(
                         client, page_path, dataset_id, table_id
                     )
                     print("Uploaded to BigQuery.")
@@ -101,6 +153,492 @@ def reprocess(
                     os.path.join(output_dir, os.path.basename(page_path)),
                 )
 
+    if staging_loader is not None:
+        merge_staged_files(staging_loader, table_id, staged, output_dir)
+
+
+def merge_staged_files(
+    staging_loader: CsvBatchLoader,
+    table_id: str,
+    staged: list[str],
+    output_dir: str,
+) -> None:
+    """
+    Loads the pending csvs into the staging table, replaces the rows of the
+    staged files in table_id and moves them to output_dir. The staging table
+    is dropped even when the merge fails.
+    """
+    client = staging_loader.client
+    try:
+        staging_loader.flush()
+        if staged:
+            print(f"Merging {len(staged)} files into {table_id}...")
+            replace_files_from_staging(
+                client,
+                staging_loader.dataset_id,
+                table_id,
+                staging_loader.table_id,
+                [os.path.basename(page_path) for page_path in staged],
+            )
+    finally:
+        client.delete_table(
+            f"{client.project}.{staging_loader.dataset_id}."
+            f"{staging_loader.table_id}",
+            not_found_ok=True,
+        )
+    for page_path in staged:
+        shutil.move(
+            page_path,
+            os.path.join(output_dir, os.path.basename(page_path)),
+        )
+
+
+def ocr_output_path(
+    page_path: str, process_txt_file_fn: FunctionType | None
+) -> str:
+    """
+    Path written by the OCR step: text when it still needs to be parsed by
+    process_txt_file_fn, otherwise the backend writes the csv directly.
+    """
+    return page_path.replace(
+        ".pdf", ".txt" if process_txt_file_fn is not None else ".csv"
+    )
+
+
+def ocr_kwargs(
+    ocr_client: object | None, ocr_cache: OcrCache | None = None
+) -> dict:
+    """
+    Keyword arguments injecting a shared OCR client and the OCR result cache
+    into process_pdf_file_fn or process_pdf_files_fn; whatever is None is left
+    out, letting the backend use its default.
+    """
+    kwargs: dict = {}
+    if ocr_client is not None:
+        kwargs["client"] = ocr_client
+    if ocr_cache is not None:
+        kwargs["cache"] = ocr_cache
+    return kwargs
+
+
+def convert_text_layer(input_path: str, output_path: str) -> str | None:
+    """
+    Rebuilds the page from its native text layer, skipping the OCR.
+    The text is parsed right away when the OCR backend would have written
+    the csv directly (output_path ending in .csv).
+
+    Returns:
+        str | None: The output path, or None when the page needs OCR.
+    """
+    file_txt_output = output_path.replace(".csv", ".txt")
+    if not process_pdf_file_text_layer(input_path, file_txt_output):
+        return None
+    if file_txt_output == output_path:
+        return output_path
+    output_path = process_txt_file_llmwhisperer(file_txt_output)
+    os.remove(file_txt_output)
+    return output_path
+
+
+def convert_with_text_layer(
+    input_path: str,
+    output_path: str,
+    process_pdf_file_fn: FunctionType,
+    routes: Counter,
+    **kwargs,
+) -> str:
+    """
+    process_pdf_file_fn wrapper sending only the pages without a usable text
+    layer to the OCR, counting the route taken by each page in routes.
+    """
+    output = convert_text_layer(input_path, output_path)
+    if output is not None:
+        routes["text layer"] += 1
+        return output
+    routes["ocr"] += 1
+    return process_pdf_file_fn(input_path, output_path, **kwargs)
+
+
+def convert_pages_with_text_layer(
+    jobs: Iterable[tuple[str, str]],
+    process_pdf_files_fn: FunctionType,
+    routes: Counter,
+    **kwargs,
+) -> Iterator[str]:
+    """
+    Same as convert_with_text_layer for a batch function: only the jobs
+    without a usable text layer are handed to process_pdf_files_fn, and the
+    outputs are still yielded in the order of the jobs. A text layer output
+    is yielded as soon as the jobs before it are done, the batch function is
+    only resumed while one of its pages is awaited.
+    """
+    source = iter(jobs)
+    # outputs of the jobs read so far, None for the ones sent to the OCR
+    pending: deque[str | None] = deque()
+    ocr_queue: deque[tuple[str, str]] = deque()
+    ocr_outputs: Iterator[str] | None = None
+
+    def read_job() -> bool:
+        job = next(source, None)
+        if job is None:
+            return False
+        output = convert_text_layer(*job)
+        pending.append(output)
+        if output is None:
+            routes["ocr"] += 1
+            ocr_queue.append(job)
+        else:
+            routes["text layer"] += 1
+        return True
+
+    def ocr_jobs() -> Iterator[tuple[str, str]]:
+        # the batch function reads ahead through here, past text layer pages
+        while ocr_queue or read_job():
+            if ocr_queue:
+                yield ocr_queue.popleft()
+
+    while pending or read_job():
+        output = pending.popleft()
+        if output is None:
+            if ocr_outputs is None:
+                ocr_outputs = process_pdf_files_fn(ocr_jobs(), **kwargs)
+            output = next(ocr_outputs)
+        yield output
+    if ocr_outputs is not None:
+        # let the batch function finish (e.g. report its metrics)
+        for _ in ocr_outputs:
+            pass
+
+
+def restore_page_text(
+    page_path: str, reprocess: bool, processed_dir: str
+) -> str | None:
+    """
+    Returns the text output of a page that does not need OCR, because it was
+    converted before or because it was restored from processed_dir when
+    reprocessing. Returns None when the page must be converted.
+    """
+    file_txt_output = page_path.replace(".pdf", ".txt")
+    file_txt_processed_output = os.path.join(
+        processed_dir, os.path.basename(file_txt_output)
+    )
+    if os.path.exists(file_txt_output) and not reprocess:
+        return file_txt_output
+    # restore the file if it was processed before
+    if reprocess and os.path.exists(file_txt_processed_output):
+        print(f"Revert {page_path} txt from processed dir...")
+        shutil.move(file_txt_processed_output, file_txt_output)
+        move_page_to_processed(page_path, processed_dir)
+        return file_txt_output
+    return None
+
+
+def move_page_to_processed(page_path: str, processed_dir: str) -> None:
+    shutil.move(
+        page_path,
+        os.path.join(processed_dir, os.path.basename(page_path)),
+    )
+
+
+def convert_page_to_text(
+    page_path: str,
+    reprocess: bool,
+    processed_dir: str,
+    process_pdf_file_fn: FunctionType,
+    process_txt_file_fn: FunctionType | None = None,
+    ocr_client: object | None = None,
+    ocr_cache: OcrCache | None = None,
+) -> tuple[str, str]:
+    """
+    OCR stage of the run pipeline: converts a split page to text, or restores
+    the text from processed_dir when reprocessing.
+
+    Returns:
+        tuple[str, str]: The page path and the text output path ("" when the conversion failed).
+    """
+    file_txt_output = restore_page_text(page_path, reprocess, processed_dir)
+    if file_txt_output is None:
+        print(f"Converting {page_path} to text...")
+        file_txt_output = process_pdf_file_fn(
+            page_path,
+            ocr_output_path(page_path, process_txt_file_fn),
+            **ocr_kwargs(ocr_client, ocr_cache),
+        )
+        move_page_to_processed(page_path, processed_dir)
+    return page_path, file_txt_output
+
+
+def convert_pages_to_text(
+    pdf_pages: Iterable[str],
+    reprocess: bool,
+    processed_dir: str,
+    process_pdf_files_fn: FunctionType,
+    process_txt_file_fn: FunctionType | None = None,
+    ocr_client: object | None = None,
+    ocr_cache: OcrCache | None = None,
+) -> Iterator[tuple[str, str]]:
+    """
+    Same as convert_page_to_text for many pages, handing every page that
+    needs OCR to a batch function (e.g. concurrent submissions), which
+    receives (input, output) pairs and yields the output paths in order.
+
+    Yields:
+        tuple[str, str]: The page path and the text output path, in page order.
+    """
+    # pages already read from pdf_pages, waiting for their turn to be yielded
+    pending: deque[tuple[str, str | None]] = deque()
+
+    def jobs() -> Iterator[tuple[str, str]]:
+        for page_path in pdf_pages:
+            file_txt_output = restore_page_text(
+                page_path, reprocess, processed_dir
+            )
+            pending.append((page_path, file_txt_output))
+            if file_txt_output is None:
+                print(f"Converting {page_path} to text...")
+                yield (
+                    page_path,
+                    ocr_output_path(page_path, process_txt_file_fn),
+                )
+
+    for converted_output in process_pdf_files_fn(
+        jobs(), **ocr_kwargs(ocr_client, ocr_cache)
+    ):
+        # outputs arrive in job order: flush the pages that skipped OCR
+        # up to the page this output belongs to
+        page_path, file_txt_output = pending.popleft()
+        while file_txt_output is not None:
+            yield page_path, file_txt_output
+            page_path, file_txt_output = pending.popleft()
+        move_page_to_processed(page_path, processed_dir)
+        yield page_path, converted_output
+    while pending:
+        page_path, file_txt_output = pending.popleft()
+        yield page_path, file_txt_output or ""
+
+
+def store_intermediate(
+    table: pandas.DataFrame, file_csv_output: str, processed_dir: str
+) -> None:
+    """
+    Writes the parsed page, before the transformation, for debugging.
+    """
+    intermediates_dir = os.path.join(processed_dir, "intermediates")
+    os.makedirs(intermediates_dir, exist_ok=True)
+    table.to_csv(
+        os.path.join(intermediates_dir, os.path.basename(file_csv_output)),
+        index=False,
+        quoting=csv.QUOTE_NONNUMERIC,
+    )
+
+
+def store_page_table(
+    table: pandas.DataFrame, file_csv_output: str, config_loader: ConfigLoader
+) -> bytes:
+    """
+    Transforms a parsed page and writes the final csv, the same written by
+    process_txt_file followed by transform_generated_analytical_data.
+
+    Returns:
+        bytes: The content of the csv, to be uploaded without reading it.
+    """
+    transformed = transform_analytical_data(
+        to_text_table(table), config_loader
+    )
+    if transformed is None:
+        content = table.to_csv(index=False, quoting=csv.QUOTE_NONNUMERIC)
+    else:
+        content = transformed.to_csv(index=False, quoting=csv.QUOTE_ALL)
+    data = content.encode("utf-8")
+    with open(file_csv_output, "wb") as f:
+        f.write(data)
+    return data
+
+
+def move_uploaded_csv(
+    page_path: str,
+    file_csv_output: str,
+    file_csv_processed_output: str,
+    run_state: RunState | None = None,
+    started: float = 0.0,
+) -> None:
+    """
+    Moves the uploaded csv of the page to processed_dir, recording the page
+    as uploaded.
+    """
+    shutil.move(file_csv_output, file_csv_processed_output)
+    if run_state is not None:
+        run_state.record(
+            page_path,
+            "uploaded",
+            csv_path=file_csv_processed_output,
+            upload_seconds=time.perf_counter() - started,
+        )
+
+
+def process_page_text(
+    page_path: str,
+    file_txt_output: str,
+    reprocess: bool,
+    processed_dir: str,
+    process_txt_file_fn: FunctionType | None,
+    upload: bool,
+    analytical_accounts_configuration: str,
+    analytical_units_renamed_list: str,
+    client: bigquery.Client,
+    dataset_id: str,
+    table_id: str,
+    config_loader: ConfigLoader | None = None,
+    parse_txt_file_fn: FunctionType | None = None,
+    keep_intermediates: bool = False,
+    csv_loader: CsvBatchLoader | None = None,
+    upload_format: UploadFormat = UploadFormat.csv,
+    run_state: RunState | None = None,
+) -> None:
+    """
+    Parse, transform and upload stages of the run pipeline for a single page.
+
+    With parse_txt_file_fn the text is parsed to a DataFrame that is handed in
+    memory to the transformation and to the upload, and only the final csv is
+    written; keep_intermediates also stores the parsed csv in
+    <processed_dir>/intermediates.
+
+    With csv_loader the upload only adds the page to the current batch, and
+    the csv is moved to processed_dir once the batch is loaded.
+
+    With run_state the page is recorded as parsed and then uploaded, with the
+    paths and hash of its artifacts and the time spent on each stage.
+    """
+    if file_txt_output == "":
+        return
+    started = time.perf_counter()
+    file_txt_processed_output = os.path.join(
+        processed_dir, os.path.basename(page_path.replace(".pdf", ".txt"))
+    )
+    file_csv_output = page_path.replace(".pdf", ".csv")
+    file_csv_processed_output = os.path.join(
+        processed_dir, os.path.basename(file_csv_output)
+    )
+    table: pandas.DataFrame | None = None
+    if not os.path.exists(file_csv_output) or reprocess:
+        if reprocess and os.path.exists(file_csv_processed_output):
+            print(f"Revert {page_path} csv from processed dir...")
+            shutil.move(
+                file_csv_processed_output,
+                file_csv_output,
+            )
+        elif parse_txt_file_fn is not None:
+            print(f"Parsing {page_path}...")
+            table = parse_txt_file_fn(file_txt_output)
+            if keep_intermediates:
+                store_intermediate(table, file_csv_output, processed_dir)
+        else:
+            if process_txt_file_fn is not None:
+                print(f"Converting {page_path} to csv...")
+                file_csv_output = process_txt_file_fn(file_txt_output)
+        shutil.move(
+            file_txt_output,
+            file_txt_processed_output,
+        )
+
+    if table is not None:
+        if config_loader is None:
+            config_loader = ConfigLoader(
+                analytical_accounts_configuration,
+                analytical_units_renamed_list,
+            )
+        data = store_page_table(table, file_csv_output, config_loader)
+        if run_state is not None:
+            run_state.record(
+                page_path,
+                "parsed",
+                txt_path=file_txt_processed_output,
+                csv_path=file_csv_output,
+                csv_sha256=hashlib.sha256(data).hexdigest(),
+                parse_seconds=time.perf_counter() - started,
+            )
+        uploaded = partial(
+            move_uploaded_csv,
+            page_path,
+            file_csv_output,
+            file_csv_processed_output,
+            run_state,
+            time.perf_counter(),
+        )
+        if upload and csv_loader is not None:
+            csv_loader.add(data, uploaded)
+        elif upload:
+            print(f"Uploading {file_csv_output} to BigQuery...")
+            upload_function(upload_format)(
+                client, io.BytesIO(data), dataset_id, table_id
+            )
+            print("Uploaded to BigQuery.")
+            uploaded()
+        return
+
+    # If necessary a transform pipeline will change csv with auxiliary information
+    transform_generated_analytical_data(
+        file_csv_output,
+        analytical_accounts_configuration,
+        analytical_units_renamed_list,
+        config_loader=config_loader,
+    )
+
+    if upload and not os.path.exists(file_csv_output) and not reprocess:
+        print("you need to reprocess the file to upload it")
+
+    if run_state is not None and os.path.exists(file_csv_output):
+        run_state.record(
+            page_path,
+            "parsed",
+            txt_path=file_txt_processed_output,
+            csv_path=file_csv_output,
+            csv_sha256=hash_file(file_csv_output),
+            parse_seconds=time.perf_counter() - started,
+        )
+    uploaded = partial(
+        move_uploaded_csv,
+        page_path,
+        file_csv_output,
+        file_csv_processed_output,
+        run_state,
+        time.perf_counter(),
+    )
+    if upload and os.path.exists(file_csv_output) and csv_loader is not None:
+        with open(file_csv_output, "rb") as f:
+            csv_loader.add(f.read(), uploaded)
+    elif upload and os.path.exists(file_csv_output):
+        print(f"Uploading {file_csv_output} to BigQuery...")
+        upload_function(upload_format)(
+            client, file_csv_output, dataset_id, table_id
+        )
+        print("Uploaded to BigQuery.")
+        uploaded()
+
+
+def record_page_text(
+    run_state: RunState,
+    page_path: str,
+    file_txt_output: str,
+    split_at: dict[str, float],
+) -> None:
+    """
+    Records the end of the OCR stage of a page, or its failure when the
+    conversion produced no output.
+    """
+    started = split_at.pop(page_path, None)
+    if file_txt_output == "":
+        run_state.fail(page_path, "the conversion produced no output")
+        return
+    run_state.record(
+        page_path,
+        "ocr",
+        txt_path=file_txt_output,
+        ocr_seconds=time.perf_counter() - started
+        if started is not None
+        else None,
+    )
+
 
 def run(
     path: str,
@@ -118,86 +656,287 @@ def run(
     client: bigquery.Client,
     dataset_id: str,
     table_id: str,
+    workers: int = 1,
+    stream: bool = False,
+    queue_size: int = 8,
+    process_pdf_files_fn: FunctionType | None = None,
+    ocr_client: object | None = None,
+    ocr_cache: OcrCache | None = None,
+    text_layer: bool = False,
+    config_loader: ConfigLoader | None = None,
+    parse_txt_file_fn: FunctionType | None = None,
+    keep_intermediates: bool = False,
+    upload_batch_bytes: int = 0,
+    upload_format: UploadFormat = UploadFormat.csv,
+    job_state: JobState | None = None,
 ) -> None:
-    os.makedirs(processed_dir, exist_ok=True)
+    """
+    Splits the PDF and runs every page through OCR, parsing, transformation
+    and (optionally) the BigQuery upload.
+
+    With stream=True the split, OCR and parse/transform/upload stages run
+    concurrently, each in its own thread, connected by queues holding at most
+    queue_size pages, so the first page is processed while the rest of the
+    document is still being split. The streaming split is sequential, so
+    workers only applies when stream is False.
+
+    When process_pdf_files_fn is given, pages that need OCR are handed to it
+    in batch (see convert_pages_to_text) instead of one process_pdf_file_fn
+    call per page. ocr_client, when given, is passed as the client of every
+    OCR call, so a single client (and its connections) serves the whole run,
+    and ocr_cache lets the backends skip pages whose results are cached.
+
+    With text_layer=True, pages carrying a native text layer are rebuilt from
+    it (see processors.text_layer) and only image-only pages go to the OCR;
+    the number of pages on each route is printed at the end.
+
+    config_loader provides the configuration sheets of the transformation;
+    by default they are fetched once, on the first page, for the whole run.
+
+    With parse_txt_file_fn the pages are handed as DataFrames from the parse
+    to the transformation and the upload, writing only the final csv (and the
+    parsed one with keep_intermediates), see process_page_text.
+
+    With upload_batch_bytes the pages are uploaded in batches of about that
+    size, one BigQuery load job per batch, instead of one job per page.
+    upload_format chooses between loading the csv or a typed Parquet file.
 
-    pdf_pages_list = split_pdf_to_pages(
-        input_pdf_path=path,
-        output_dir=output_dir,
-        start=start,
-        end=end,
+    With job_state the stage of every page, its artifacts, timings and errors
+    are recorded, and pages that reached the final stage (uploaded, or parsed
+    without upload) in a previous run with the same content are skipped,
+    unless reprocessing.
+    """
+    run_batch(
+        [(path, start, end)],
+        output_dir,
+        reprocess,
+        processed_dir,
+        process_txt_file_fn,
+        process_pdf_file_fn,
+        upload,
+        analytical_accounts_configuration,
+        analytical_units_renamed_list,
+        client,
+        dataset_id,
+        table_id,
+        workers=workers,
+        stream=stream,
+        queue_size=queue_size,
+        process_pdf_files_fn=process_pdf_files_fn,
+        ocr_client=ocr_client,
+        ocr_cache=ocr_cache,
+        text_layer=text_layer,
+        config_loader=config_loader,
+        parse_txt_file_fn=parse_txt_file_fn,
+        keep_intermediates=keep_intermediates,
+        upload_batch_bytes=upload_batch_bytes,
+        upload_format=upload_format,
+        job_state=job_state,
     )
 
-    for i, page_path in enumerate(pdf_pages_list, start=1):
-        print(f"Processing page {i} of {len(pdf_pages_list)}: {page_path}")
 
-        file_txt_output = page_path.replace(".pdf", ".txt")
-        file_txt_processed_output = os.path.join(
-            processed_dir, os.path.basename(file_txt_output)
+def run_batch(
+    documents: list[tuple[str, int, int | None]],
+    output_dir: str,
+    reprocess: bool,
+    processed_dir: str,
+    process_txt_file_fn: FunctionType | None,
+    process_pdf_file_fn: FunctionType,
+    upload: bool,
+    analytical_accounts_configuration: str,
+    analytical_units_renamed_list: str,
+    client: bigquery.Client,
+    dataset_id: str,
+    table_id: str,
+    workers: int = 1,
+    stream: bool = False,
+    queue_size: int = 8,
+    process_pdf_files_fn: FunctionType | None = None,
+    ocr_client: object | None = None,
+    ocr_cache: OcrCache | None = None,
+    text_layer: bool = False,
+    config_loader: ConfigLoader | None = None,
+    parse_txt_file_fn: FunctionType | None = None,
+    keep_intermediates: bool = False,
+    upload_batch_bytes: int = 0,
+    upload_format: UploadFormat = UploadFormat.csv,
+    job_state: JobState | None = None,
+) -> None:
+    """
+    Runs the pages of many PDFs, given as (path, start, end), through the
+    stages of run in a single work queue: each document is split when the
+    pipeline reaches it, so the OCR of its first pages overlaps the last
+    pages of the previous one, and the OCR client, the configuration
+    sheets, the batch OCR workers (e.g. the warm docling models) and the
+    BigQuery load batches are shared by every document.
+
+    With job_state every document gets its own run, finished when the whole
+    batch is done (its last pages may be loaded together with the next
+    document), or failed with the error that stopped the batch.
+    """
+    os.makedirs(processed_dir, exist_ok=True)
+    if config_loader is None:
+        config_loader = ConfigLoader(
+            analytical_accounts_configuration, analytical_units_renamed_list
         )
 
-        if not os.path.exists(file_txt_output) or reprocess:
-            # restore the file if it was processed before
-            if reprocess and os.path.exists(file_txt_processed_output):
-                print(f"Revert {page_path} txt from processed dir...")
-                shutil.move(file_txt_processed_output, file_txt_output)
-            else:
-                print(f"Converting {page_path} to text...")
-                file_txt_output = process_pdf_file_fn(
-                    page_path,
-                    page_path.replace(
-                        ".pdf",
-                        ".txt"
-                        if process_pdf_file_fn == process_pdf_file_llmwhisperer
-                        else ".csv",
-                    ),
-                )
-            shutil.move(
-                page_path,
-                os.path.join(processed_dir, os.path.basename(page_path)),
+    routes: Counter = Counter()
+    if text_layer:
+        process_pdf_file_fn = partial(
+            convert_with_text_layer,
+            process_pdf_file_fn=process_pdf_file_fn,
+            routes=routes,
+        )
+        if process_pdf_files_fn is not None:
+            process_pdf_files_fn = partial(
+                convert_pages_with_text_layer,
+                process_pdf_files_fn=process_pdf_files_fn,
+                routes=routes,
+            )
+
+    final_stage = "uploaded" if upload else "parsed"
+    # run of every document started so far, and of each of its pages
+    run_states: dict[str, RunState] = {}
+    page_runs: dict[str, RunState] = {}
+    # when each page was split, to time its OCR
+    split_at: dict[str, float] = {}
+
+    def document_pages(
+        path: str, start: int, end: int | None
+    ) -> Iterator[str]:
+        pdf_pages: Iterable[str]
+        total = ""
+        if stream:
+            pdf_pages = iter_pdf_pages(
+                input_pdf_path=path,
+                output_dir=output_dir,
+                start=start,
+                end=end,
             )
-        if file_txt_output != "":
-            file_csv_output = page_path.replace(".pdf", ".csv")
-            file_csv_processed_output = os.path.join(
-                processed_dir, os.path.basename(file_csv_output)
+        else:
+            pdf_pages = split_pdf_to_pages(
+                input_pdf_path=path,
+                output_dir=output_dir,
+                start=start,
+                end=end,
+                workers=workers,
             )
-            if not os.path.exists(file_csv_output) or reprocess:
-                if reprocess and os.path.exists(file_csv_processed_output):
-                    print(f"Revert {page_path} csv from processed dir...")
-                    shutil.move(
-                        file_csv_processed_output,
-                        file_csv_output,
+            total = f" of {len(pdf_pages)}"
+        run_state = None
+        if job_state is not None:
+            run_state = run_states[path] = job_state.start_run(path)
+
+        for i, page_path in enumerate(pdf_pages, start=1):
+            if run_state is not None:
+                pdf_sha256 = hash_file(page_path)
+                if not reprocess and run_state.is_done(
+                    page_path, final_stage, pdf_sha256
+                ):
+                    print(
+                        f"Skipping page {i}{total}: {page_path}, "
+                        f"already {final_stage}"
                     )
-                else:
-                    if process_txt_file_fn is not None:
-                        print(f"Converting {page_path} to csv...")
-                        file_csv_output = process_txt_file_fn(file_txt_output)
-                shutil.move(
-                    file_txt_output,
-                    file_txt_processed_output,
+                    move_page_to_processed(page_path, processed_dir)
+                    continue
+                run_state.record(
+                    page_path,
+                    "split",
+                    pdf_path=page_path,
+                    pdf_sha256=pdf_sha256,
                 )
+                page_runs[page_path] = run_state
+                split_at[page_path] = time.perf_counter()
+            print(f"Processing page {i}{total}: {page_path}")
+            yield page_path
 
-            # If necessary a transform pipeline will change csv with auxiliary information
-            transform_generated_analytical_data(
-                file_csv_output,
-                analytical_accounts_configuration,
-                analytical_units_renamed_list,
+    pages: Iterable[str] = (
+        page_path
+        for document in documents
+        for page_path in document_pages(*document)
+    )
+    if stream:
+        pages = prefetch(pages, maxsize=queue_size)
+
+    def convert(page_path: str) -> tuple[str, str]:
+        try:
+            return convert_page_to_text(
+                page_path,
+                reprocess,
+                processed_dir,
+                process_pdf_file_fn,
+                process_txt_file_fn,
+                ocr_client,
+                ocr_cache,
             )
+        except Exception as error:
+            if page_path in page_runs:
+                page_runs[page_path].fail(page_path, error)
+            raise
 
-            if (
-                upload
-                and not os.path.exists(file_csv_output)
-                and not reprocess
-            ):
-                print("you need to reprocess the file to upload it")
-
-            if upload and os.path.exists(file_csv_output):
-                print(f"Uploading {file_csv_output} to BigQuery...")
-                upload_csv_to_bigquery(
-                    client, file_csv_output, dataset_id, table_id
-                )
-                print("Uploaded to BigQuery.")
-                shutil.move(
-                    file_csv_output,
-                    file_csv_processed_output,
+    csv_loader = (
+        CsvBatchLoader(
+            client, dataset_id, table_id, upload_batch_bytes, upload_format
+        )
+        if upload and upload_batch_bytes > 0
+        else None
+    )
+
+    text_pages: Iterable[tuple[str, str]]
+    if process_pdf_files_fn is not None:
+        text_pages = convert_pages_to_text(
+            pages,
+            reprocess,
+            processed_dir,
+            process_pdf_files_fn,
+            process_txt_file_fn,
+            ocr_client,
+            ocr_cache,
+        )
+    else:
+        text_pages = (convert(page_path) for page_path in pages)
+    if stream:
+        text_pages = prefetch(text_pages, maxsize=queue_size)
+
+    page_path = ""
+    try:
+        for page_path, file_txt_output in text_pages:
+            run_state = page_runs.get(page_path)
+            if run_state is not None:
+                record_page_text(
+                    run_state, page_path, file_txt_output, split_at
                 )
+            process_page_text(
+                page_path,
+                file_txt_output,
+                reprocess,
+                processed_dir,
+                process_txt_file_fn,
+                upload,
+                analytical_accounts_configuration,
+                analytical_units_renamed_list,
+                client,
+                dataset_id,
+                table_id,
+                config_loader,
+                parse_txt_file_fn,
+                keep_intermediates,
+                csv_loader,
+                upload_format,
+                run_state,
+            )
+            page_path = ""
+        if csv_loader is not None:
+            csv_loader.flush()
+    except BaseException as error:
+        if page_path in page_runs:
+            page_runs[page_path].fail(page_path, error)
+        for run_state in run_states.values():
+            run_state.finish(error)
+        raise
+    for run_state in run_states.values():
+        run_state.finish()
+    if text_layer:
+        print(
+            f"Pages converted from the text layer: {routes['text layer']}, "
+            f"by OCR: {routes['ocr']}"
+        )
@@ -1,4 +1,5 @@
 import os
+from functools import partial
 
 import typer
 from dotenv import load_dotenv
@@ -6,17 +7,47 @@ from google.cloud import bigquery
 
 from analytical import reprocess as reprocess_analytical_import
 from analytical import run as run_analytical_import
+from analytical import run_batch as run_batch_analytical_import
+from processors.docling_analytical import (
+    log_converter_metrics as log_docling_metrics,
+)
 from processors.docling_analytical import (
     process_pdf_file as process_pdf_file_docling,
 )
+from processors.docling_analytical import (
+    process_pdf_files as process_pdf_files_docling,
+)
+from processors.llmwhisperer_analytical import (
+    parse_txt_file as parse_txt_file_llmwhisperer,
+)
 from processors.llmwhisperer_analytical import (
     process_txt_file as process_txt_file_llmwhisperer,
 )
+from services.llmwhisperer import (
+    get_client as get_llmwhisperer_client,
+)
 from services.llmwhisperer import (
     process_pdf_file as process_pdf_file_llmwhisperer,
 )
-from utils.constants import FileType, MethodType
-from utils.merger import merge_document
+from services.llmwhisperer import (
+    process_pdf_files as process_pdf_files_llmwhisperer,
+)
+from utils.chapters import ANALYTICAL_CHAPTER, cached_chapter_range
+from utils.config_loader import ConfigLoader
+from utils.constants import (
+    FileType,
+    MergeFormat,
+    MethodType,
+    UploadFormat,
+)
+from utils.documents import find_documents, load_ranges
+from utils.job_state import JobState
+from utils.merger import (
+    is_replaceable_dataset,
+    merge_document,
+    merge_document_parquet,
+)
+from utils.ocr_cache import OcrCache
 from utils.spliter import split_pdf_to_pages as split_pdf_import
 
 # Create Typer apps
@@ -24,9 +55,133 @@ app = typer.Typer()
 analytical_app = typer.Typer()
 spliter_app = typer.Typer()
 merger_app = typer.Typer()
+cache_app = typer.Typer()
 app.add_typer(analytical_app, name="analytical", help="Analytical commands")
 app.add_typer(spliter_app, name="spliter", help="Splitting commands")
 app.add_typer(merger_app, name="merger", help="Merge commands")
+app.add_typer(cache_app, name="cache", help="OCR result cache commands")
+
+DEFAULT_OCR_CACHE_DIR = os.path.join(os.getcwd(), "cache", "ocr")
+DEFAULT_CHAPTER_CACHE_DIR = os.path.join(os.getcwd(), "cache", "chapters")
+DEFAULT_CONFIG_CACHE_DIR = os.path.join(os.getcwd(), "cache", "config")
+DEFAULT_JOB_STATE_DB = os.path.join(os.getcwd(), "cache", "jobs.sqlite")
+MEGABYTE = 1024 * 1024
+
+
+def ocr_client_function(
+    method: MethodType,
+    pool_size: int = 10,
+    keep_alive: bool = True,
+):
+    """
+    Returns the OCR client shared by every page of a run, or None when the
+    method creates its own.
+    """
+    if method == MethodType.llmwhisperer:
+        return get_llmwhisperer_client(pool_size, keep_alive)
+    return None
+
+
+def auto_range_function(
+    path: str, cache_dir: str = DEFAULT_CHAPTER_CACHE_DIR
+) -> tuple[int, int]:
+    """
+    Returns the start and end of the analytical chapter of the PDF, in the
+    numbering used by --start/--end.
+    """
+    found = cached_chapter_range(path, cache_dir)
+    if found is None:
+        raise typer.BadParameter(
+            f"'{ANALYTICAL_CHAPTER}' not found in {path}, use --start/--end"
+        )
+    first, last = found
+    print(f"Found '{ANALYTICAL_CHAPTER}' on pages {first} to {last} of {path}")
+    # split_pdf_to_pages reads the pages from start to end counting from 0
+    return first - 1, last - 1
+
+
+def ocr_cache_function(
+    enabled: bool = True,
+    cache_dir: str = DEFAULT_OCR_CACHE_DIR,
+    max_size_mb: int = 1024,
+) -> OcrCache | None:
+    """
+    Returns the OCR result cache used by a run, or None when it is disabled.
+    """
+    if not enabled:
+        return None
+    return OcrCache(cache_dir, max_size_mb * MEGABYTE)
+
+
+def config_loader_function(
+    offline: bool = False,
+    cache_dir: str = DEFAULT_CONFIG_CACHE_DIR,
+    ttl_hours: float = 24,
+) -> ConfigLoader:
+    """
+    Returns the loader of the configuration sheets shared by a run, keeping
+    their snapshots in cache_dir.
+    """
+    return ConfigLoader(
+        os.environ["GOOGLE_SHEET_ACCOUNT_PLAN_ANALYTICAL_URL"],
+        os.environ["GOOGLE_SHEET_RENAMED_UNITS_ANALYTICAL_URL"],
+        snapshot_dir=cache_dir,
+        ttl_seconds=ttl_hours * 60 * 60,
+        offline=offline,
+    )
+
+
+def process_pdf_files_function(
+    method: MethodType,
+    max_in_flight: int = 1,
+    docling_workers: int = 1,
+    docling_threads: int | None = None,
+):
+    """
+    Returns the batch OCR function converting many pages at the same time,
+    or None to convert the pages one by one.
+    """
+    if method == MethodType.llmwhisperer and max_in_flight > 1:
+        return partial(
+            process_pdf_files_llmwhisperer, max_in_flight=max_in_flight
+        )
+    if method == MethodType.docling and docling_workers > 1:
+        return partial(
+            process_pdf_files_docling,
+            workers=docling_workers,
+            num_threads=docling_threads,
+        )
+    return None
+
+
+def analytical_functions(
+    method: MethodType = MethodType.llmwhisperer,
+    max_in_flight: int = 1,
+    pool_size: int = 10,
+    keep_alive: bool = True,
+    docling_workers: int = 1,
+    docling_threads: int | None = None,
+) -> dict:
+    """
+    Returns the OCR and parse functions of the method, and the OCR client
+    shared by them, as arguments of the analytical run.
+    """
+    return {
+        "process_pdf_file_fn": process_pdf_file_llmwhisperer
+        if method == MethodType.llmwhisperer
+        else process_pdf_file_docling,
+        "process_txt_file_fn": process_txt_file_llmwhisperer
+        if method == MethodType.llmwhisperer
+        else None,
+        "process_pdf_files_fn": process_pdf_files_function(
+            method, max_in_flight, docling_workers, docling_threads
+        ),
+        "ocr_client": ocr_client_function(method, pool_size, keep_alive),
+        # pages parsed by llmwhisperer are handed in memory up to the upload
+        "parse_txt_file_fn": parse_txt_file_llmwhisperer
+        if method == MethodType.llmwhisperer
+        else None,
+    }
 
 
 def run_analytical_function(
@@ -41,20 +196,29 @@ def run_analytical_function(
     processed_dir: str = "",
     upload: bool = False,
     method: MethodType = MethodType.llmwhisperer,
+    workers: int = 1,
+    stream: bool = False,
+    queue_size: int = 8,
+    max_in_flight: int = 1,
+    pool_size: int = 10,
+    keep_alive: bool = True,
+    ocr_cache: OcrCache | None = None,
+    docling_workers: int = 1,
+    docling_threads: int | None = None,
+    text_layer: bool = False,
+    config_loader: ConfigLoader | None = None,
+    keep_intermediates: bool = False,
+    upload_batch_mb: int = 0,
+    upload_format: UploadFormat = UploadFormat.csv,
+    job_state: JobState | None = None,
 ):
-    return run_analytical_import(
+    run_analytical_import(
         path,
         output_dir,
         start,
         end,
         reprocess=reprocess,
         processed_dir=processed_dir,
-        process_pdf_file_fn=process_pdf_file_llmwhisperer
-        if method == MethodType.llmwhisperer
-        else process_pdf_file_docling,
-        process_txt_file_fn=process_txt_file_llmwhisperer
-        if method == MethodType.llmwhisperer
-        else None,
         analytical_accounts_configuration=os.environ[
             "GOOGLE_SHEET_ACCOUNT_PLAN_ANALYTICAL_URL"
         ],
@@ -65,7 +229,132 @@ def run_analytical_function(
         client=client,
         dataset_id=dataset_id,
         table_id=table_id,
+        workers=workers,
+        stream=stream,
+        queue_size=queue_size,
+        ocr_cache=ocr_cache,
+        text_layer=text_layer,
+        config_loader=config_loader,
+        keep_intermediates=keep_intermediates,
+        upload_batch_bytes=upload_batch_mb * MEGABYTE,
+        upload_format=upload_format,
+        job_state=job_state,
+        **analytical_functions(
+            method,
+            max_in_flight,
+            pool_size,
+            keep_alive,
+            docling_workers,
+            docling_threads,
+        ),
+    )
+    # with docling workers the metrics are reported by each worker
+    if method == MethodType.docling and docling_workers <= 1:
+        log_docling_metrics()
+
+
+def batch_documents_function(
+    location: str,
+    ranges_path: str | None = None,
+    start: int = 1,
+    end: int | None = None,
+    auto_range: bool = False,
+    chapter_cache_dir: str = DEFAULT_CHAPTER_CACHE_DIR,
+) -> list[tuple[str, int, int | None]]:
+    """
+    Returns the (path, start, end) of every PDF of the batch: the range of
+    the manifest when it lists the document, otherwise the detected chapter
+    with auto_range, or start and end.
+    """
+    try:
+        paths = find_documents(location)
+        ranges = load_ranges(ranges_path) if ranges_path else {}
+    except (OSError, ValueError) as error:
+        raise typer.BadParameter(str(error)) from error
+    unknown = set(ranges) - {os.path.basename(path) for path in paths}
+    if unknown:
+        raise typer.BadParameter(
+            f"Documents of {ranges_path} not found in {location}: "
+            f"{', '.join(sorted(unknown))}"
+        )
+
+    documents = []
+    for path in paths:
+        name = os.path.basename(path)
+        if name in ranges:
+            page_range = ranges[name]
+            if page_range is None:
+                page_range = auto_range_function(path, chapter_cache_dir)
+        elif auto_range:
+            page_range = auto_range_function(path, chapter_cache_dir)
+        else:
+            page_range = start, end
+        documents.append((path, *page_range))
+    return documents
+
+
+def batch_analytical_function(
+    documents: list[tuple[str, int, int | None]],
+    output_dir: str,
+    dataset_id: str,
+    table_id: str,
+    client: bigquery.Client,
+    reprocess: bool = False,
+    processed_dir: str = "",
+    upload: bool = False,
+    method: MethodType = MethodType.llmwhisperer,
+    workers: int = 1,
+    stream: bool = False,
+    queue_size: int = 8,
+    max_in_flight: int = 1,
+    pool_size: int = 10,
+    keep_alive: bool = True,
+    ocr_cache: OcrCache | None = None,
+    docling_workers: int = 1,
+    docling_threads: int | None = None,
+    text_layer: bool = False,
+    config_loader: ConfigLoader | None = None,
+    keep_intermediates: bool = False,
+    upload_batch_mb: int = 0,
+    upload_format: UploadFormat = UploadFormat.csv,
+    job_state: JobState | None = None,
+):
+    run_batch_analytical_import(
+        documents,
+        output_dir,
+        reprocess=reprocess,
+        processed_dir=processed_dir,
+        analytical_accounts_configuration=os.environ[
+            "GOOGLE_SHEET_ACCOUNT_PLAN_ANALYTICAL_URL"
+        ],
+        analytical_units_renamed_list=os.environ[
+            "GOOGLE_SHEET_RENAMED_UNITS_ANALYTICAL_URL"
+        ],
+        upload=upload,
+        client=client,
+        dataset_id=dataset_id,
+        table_id=table_id,
+        workers=workers,
+        stream=stream,
+        queue_size=queue_size,
+        ocr_cache=ocr_cache,
+        text_layer=text_layer,
+        config_loader=config_loader,
+        keep_intermediates=keep_intermediates,
+        upload_batch_bytes=upload_batch_mb * MEGABYTE,
+        upload_format=upload_format,
+        job_state=job_state,
+        **analytical_functions(
+            method,
+            max_in_flight,
+            pool_size,
+            keep_alive,
+            docling_workers,
+            docling_threads,
+        ),
     )
+    if method == MethodType.docling and docling_workers <= 1:
+        log_docling_metrics()
 
 
 def reprocess_analytical_function(
@@ -77,8 +366,15 @@ def reprocess_analytical_function(
     method: MethodType = MethodType.llmwhisperer,
     file_type: FileType = FileType.TXT,
     upload: bool = False,
+    pool_size: int = 10,
+    keep_alive: bool = True,
+    ocr_cache: OcrCache | None = None,
+    config_loader: ConfigLoader | None = None,
+    upload_format: UploadFormat = UploadFormat.csv,
+    staging_merge: bool = False,
+    cluster_table: bool = False,
 ):
-    return reprocess_analytical_import(
+    reprocess_analytical_import(
         path,
         output_dir,
         process_pdf_file_fn=process_pdf_file_llmwhisperer
@@ -98,7 +394,15 @@ def reprocess_analytical_function(
         client=client,
         dataset_id=dataset_id,
         table_id=table_id,
+        ocr_client=ocr_client_function(method, pool_size, keep_alive),
+        ocr_cache=ocr_cache,
+        config_loader=config_loader,
+        upload_format=upload_format,
+        staging_merge=staging_merge,
+        cluster_table=cluster_table,
     )
+    if method == MethodType.docling:
+        log_docling_metrics()
 
 
 def split_pdf_function(
@@ -106,6 +410,7 @@ def split_pdf_function(
     output_dir: str = "output",
     start: int = 1,
     end: int | None = None,
+    workers: int = 1,
 ):
     """
     Split a PDF file into individual pages and save them to the output directory.
@@ -117,11 +422,12 @@ def split_pdf_function(
         output_dir (str): Directory where the split pages will be saved.
         start (int): The first page to split (1-based index).
         end (int, optional): The last page to split. If None, splits to the last page.
+        workers (int): Number of processes used to write the pages.
 
     Returns:
         List[str]: List of file paths to the split PDF pages.
     """
-    return split_pdf_import(path, output_dir, start, end)
+    return split_pdf_import(path, output_dir, start, end, workers)
 
 
 # Typer command decorators that call the functions
@@ -137,7 +443,76 @@ def run(
     processed_dir: str = os.path.join(os.getcwd(), "processed"),
     reprocess: bool = False,
     method: MethodType = MethodType.llmwhisperer,
+    workers: int = typer.Option(
+        1, help="Number of processes used to split the PDF pages"
+    ),
+    stream: bool = typer.Option(
+        False,
+        help="Overlap split, OCR and parsing, processing each page as soon as it is split",
+    ),
+    queue_size: int = typer.Option(
+        8, help="Maximum pages waiting between stages when streaming"
+    ),
+    max_in_flight: int = typer.Option(
+        1,
+        help="Pages submitted to LLMWhisperer at the same time, without waiting for each result",
+    ),
+    pool_size: int = typer.Option(
+        10, help="HTTP connections kept open to the OCR service"
+    ),
+    keep_alive: bool = typer.Option(
+        True, help="Reuse HTTP connections to the OCR service between pages"
+    ),
+    ocr_cache: bool = typer.Option(
+        True, help="Reuse OCR results of pages with identical content"
+    ),
+    ocr_cache_dir: str = DEFAULT_OCR_CACHE_DIR,
+    ocr_cache_max_size_mb: int = typer.Option(
+        1024,
+        help="Size above which the least recently used results are evicted",
+    ),
+    docling_workers: int = typer.Option(
+        1,
+        help="Processes converting pages with docling, each one with its own loaded models",
+    ),
+    docling_threads: int | None = typer.Option(
+        None,
+        help="Threads of each docling worker, defaults to the CPU count divided by the workers",
+    ),
+    text_layer: bool = typer.Option(
+        False,
+        help="Rebuild pages that have a native text layer from it, sending only image-only pages to OCR",
+    ),
+    auto_range: bool = typer.Option(
+        False,
+        help="Detect the pages of the analytical chapter instead of using --start/--end",
+    ),
+    chapter_cache_dir: str = DEFAULT_CHAPTER_CACHE_DIR,
+    upload_batch_mb: int = typer.Option(
+        64,
+        help="Upload the pages in BigQuery load jobs of about this size, 0 for one job per page",
+    ),
+    upload_format: UploadFormat = UploadFormat.csv,
+    keep_intermediates: bool = typer.Option(
+        False,
+        help="Also store the parsed csv of each page, before the transformation, in <processed-dir>/intermediates",
+    ),
+    offline_config: bool = typer.Option(
+        False,
+        help="Use only the local snapshot of the configuration sheets",
+    ),
+    config_cache_dir: str = DEFAULT_CONFIG_CACHE_DIR,
+    config_ttl_hours: float = typer.Option(
+        24, help="Age above which the configuration sheets are fetched again"
+    ),
+    job_state: bool = typer.Option(
+        False,
+        help="Record the progress of every page in --job-state-db and skip the pages already done, with the same content, in previous runs",
+    ),
+    job_state_db: str = DEFAULT_JOB_STATE_DB,
 ):
+    if auto_range:
+        start, end = auto_range_function(path, chapter_cache_dir)
     return run_analytical_function(
         path=path,
         output_dir=output_dir,
@@ -147,6 +522,145 @@ def run(
         processed_dir=processed_dir,
         upload=upload,
         method=method,
+        workers=workers,
+        stream=stream,
+        queue_size=queue_size,
+        max_in_flight=max_in_flight,
+        pool_size=pool_size,
+        keep_alive=keep_alive,
+        ocr_cache=ocr_cache_function(
+            ocr_cache, ocr_cache_dir, ocr_cache_max_size_mb
+        ),
+        docling_workers=docling_workers,
+        docling_threads=docling_threads,
+        text_layer=text_layer,
+        keep_intermediates=keep_intermediates,
+        upload_batch_mb=upload_batch_mb,
+        upload_format=upload_format,
+        job_state=JobState(job_state_db) if job_state else None,
+        config_loader=config_loader_function(
+            offline_config, config_cache_dir, config_ttl_hours
+        ),
+        dataset_id=os.environ["GOOGLE_CLOUD_BIGQUERY_DATASET_ID"],
+        table_id=os.environ["GOOGLE_CLOUD_BIGQUERY_TABLE_ID_ANALYTICAL"],
+        client=bigquery.Client(project=os.environ.get("GOOGLE_CLOUD_PROJECT")),
+    )
+
+
+@analytical_app.command(
+    help="Run the analytical extraction on every PDF of a directory or glob, in a single work queue"
+)
+def batch(
+    location: str,
+    ranges: str | None = typer.Option(
+        None,
+        help="JSON manifest with the start and end of the pages of each document, by file name",
+    ),
+    output_dir: str = os.path.join(os.getcwd(), "output"),
+    start: int = 1,
+    end: int | None = None,
+    upload: bool = False,
+    processed_dir: str = os.path.join(os.getcwd(), "processed"),
+    reprocess: bool = False,
+    method: MethodType = MethodType.llmwhisperer,
+    workers: int = typer.Option(
+        1, help="Number of processes used to split the PDF pages"
+    ),
+    stream: bool = typer.Option(
+        False,
+        help="Overlap split, OCR and parsing, processing each page as soon as it is split",
+    ),
+    queue_size: int = typer.Option(
+        8, help="Maximum pages waiting between stages when streaming"
+    ),
+    max_in_flight: int = typer.Option(
+        1,
+        help="Pages submitted to LLMWhisperer at the same time, without waiting for each result",
+    ),
+    pool_size: int = typer.Option(
+        10, help="HTTP connections kept open to the OCR service"
+    ),
+    keep_alive: bool = typer.Option(
+        True, help="Reuse HTTP connections to the OCR service between pages"
+    ),
+    ocr_cache: bool = typer.Option(
+        True, help="Reuse OCR results of pages with identical content"
+    ),
+    ocr_cache_dir: str = DEFAULT_OCR_CACHE_DIR,
+    ocr_cache_max_size_mb: int = typer.Option(
+        1024,
+        help="Size above which the least recently used results are evicted",
+    ),
+    docling_workers: int = typer.Option(
+        1,
+        help="Processes converting pages with docling, each one with its own loaded models",
+    ),
+    docling_threads: int | None = typer.Option(
+        None,
+        help="Threads of each docling worker, defaults to the CPU count divided by the workers",
+    ),
+    text_layer: bool = typer.Option(
+        False,
+        help="Rebuild pages that have a native text layer from it, sending only image-only pages to OCR",
+    ),
+    auto_range: bool = typer.Option(
+        False,
+        help="Detect the pages of the analytical chapter of the documents missing from --ranges",
+    ),
+    chapter_cache_dir: str = DEFAULT_CHAPTER_CACHE_DIR,
+    upload_batch_mb: int = typer.Option(
+        64,
+        help="Upload the pages in BigQuery load jobs of about this size, 0 for one job per page",
+    ),
+    upload_format: UploadFormat = UploadFormat.csv,
+    keep_intermediates: bool = typer.Option(
+        False,
+        help="Also store the parsed csv of each page, before the transformation, in <processed-dir>/intermediates",
+    ),
+    offline_config: bool = typer.Option(
+        False,
+        help="Use only the local snapshot of the configuration sheets",
+    ),
+    config_cache_dir: str = DEFAULT_CONFIG_CACHE_DIR,
+    config_ttl_hours: float = typer.Option(
+        24, help="Age above which the configuration sheets are fetched again"
+    ),
+    job_state: bool = typer.Option(
+        False,
+        help="Record the progress of every page in --job-state-db and skip the pages already done, with the same content, in previous runs",
+    ),
+    job_state_db: str = DEFAULT_JOB_STATE_DB,
+):
+    documents = batch_documents_function(
+        location, ranges, start, end, auto_range, chapter_cache_dir
+    )
+    print(f"Processing {len(documents)} documents")
+    return batch_analytical_function(
+        documents=documents,
+        output_dir=output_dir,
+        reprocess=reprocess,
+        processed_dir=processed_dir,
+        upload=upload,
+        method=method,
+        workers=workers,
+        stream=stream,
+        queue_size=queue_size,
+        max_in_flight=max_in_flight,
+        pool_size=pool_size,
+        keep_alive=keep_alive,
+        ocr_cache=ocr_cache_function(
+            ocr_cache, ocr_cache_dir, ocr_cache_max_size_mb
+        ),
+        docling_workers=docling_workers,
+        docling_threads=docling_threads,
+        text_layer=text_layer,
+        keep_intermediates=keep_intermediates,
+        upload_batch_mb=upload_batch_mb,
+        upload_format=upload_format,
+        job_state=JobState(job_state_db) if job_state else None,
+        config_loader=config_loader_function(
+            offline_config, config_cache_dir, config_ttl_hours
+        ),
         dataset_id=os.environ["GOOGLE_CLOUD_BIGQUERY_DATASET_ID"],
         table_id=os.environ["GOOGLE_CLOUD_BIGQUERY_TABLE_ID_ANALYTICAL"],
         client=bigquery.Client(project=os.environ.get("GOOGLE_CLOUD_PROJECT")),
@@ -162,6 +676,37 @@ def reprocess(
     method: MethodType = MethodType.llmwhisperer,
     file_type: FileType = FileType.TXT,
     upload: bool = False,
+    pool_size: int = typer.Option(
+        10, help="HTTP connections kept open to the OCR service"
+    ),
+    keep_alive: bool = typer.Option(
+        True, help="Reuse HTTP connections to the OCR service between pages"
+    ),
+    ocr_cache: bool = typer.Option(
+        True, help="Reuse OCR results of pages with identical content"
+    ),
+    ocr_cache_dir: str = DEFAULT_OCR_CACHE_DIR,
+    ocr_cache_max_size_mb: int = typer.Option(
+        1024,
+        help="Size above which the least recently used results are evicted",
+    ),
+    upload_format: UploadFormat = UploadFormat.csv,
+    offline_config: bool = typer.Option(
+        False,
+        help="Use only the local snapshot of the configuration sheets",
+    ),
+    config_cache_dir: str = DEFAULT_CONFIG_CACHE_DIR,
+    config_ttl_hours: float = typer.Option(
+        24, help="Age above which the configuration sheets are fetched again"
+    ),
+    staging_merge: bool = typer.Option(
+        False,
+        help="Load the csvs into a staging table and replace their rows with a single MERGE",
+    ),
+    cluster_table: bool = typer.Option(
+        False,
+        help="Cluster the table by file and PeriodoPrestacaoContas before uploading",
+    ),
 ):
     return reprocess_analytical_function(
         path=path,
@@ -169,24 +714,74 @@ def reprocess(
         method=method,
         file_type=file_type,
         upload=upload,
+        pool_size=pool_size,
+        keep_alive=keep_alive,
+        ocr_cache=ocr_cache_function(
+            ocr_cache, ocr_cache_dir, ocr_cache_max_size_mb
+        ),
+        config_loader=config_loader_function(
+            offline_config, config_cache_dir, config_ttl_hours
+        ),
+        upload_format=upload_format,
+        staging_merge=staging_merge,
+        cluster_table=cluster_table,
         dataset_id=os.environ["GOOGLE_CLOUD_BIGQUERY_DATASET_ID"],
         table_id=os.environ["GOOGLE_CLOUD_BIGQUERY_TABLE_ID_ANALYTICAL"],
         client=bigquery.Client(project=os.environ.get("GOOGLE_CLOUD_PROJECT")),
     )
 
 
+@analytical_app.command(help="Summarize a run recorded in the job state")
+def status(
+    run_id: int | None = typer.Option(
+        None, help="Run to summarize, defaults to the last one"
+    ),
+    job_state_db: str = DEFAULT_JOB_STATE_DB,
+):
+    summary = (
+        JobState(job_state_db).summary(run_id)
+        if os.path.exists(job_state_db)
+        else None
+    )
+    if summary is None:
+        raise typer.BadParameter(f"No run recorded in {job_state_db}")
+    run = summary["run"]
+    print(f"run {run['id']}: {run['document']} ({run['status']})")
+    if run["error"]:
+        print(f"error: {run['error']}")
+    print(
+        "pages: "
+        + ", ".join(
+            f"{stage} {count}" for stage, count in summary["stages"].items()
+        )
+    )
+    seconds = summary["seconds"]
+    print(
+        f"pages processed in this run: {summary['pages_in_run']} "
+        f"(ocr {seconds['ocr']:.1f} s, parse {seconds['parse']:.1f} s, "
+        f"upload {seconds['upload']:.1f} s)"
+    )
+    for page in summary["failed"]:
+        print(f"failed at {page['stage']}: {page['page']}: {page['error']}")
+    return summary
+
+
 @spliter_app.command(name="run", help="Split a PDF file into individual pages")
 def run_split(
     path: str,
     output_dir: str = "output",
     start: int = 1,
     end: int | None = None,
+    workers: int = typer.Option(
+        1, help="Number of processes used to split the PDF pages"
+    ),
 ):
     return split_pdf_function(
         path=path,
         output_dir=output_dir,
         start=start,
         end=end,
+        workers=workers,
     )
 
 
@@ -196,8 +791,64 @@ def run_split(
 def run_merger(
     path_dir: str = os.path.join(os.getcwd(), "output"),
     output: str = os.path.join(os.getcwd(), "processed", "merged.csv"),
+    read_workers: int = typer.Option(
+        1, help="Threads reading the csv files ahead of the merge"
+    ),
+    incremental: bool = typer.Option(
+        False,
+        help="Merge only the csv files new or changed since the last merge, using the manifest next to the output",
+    ),
+    format: MergeFormat = MergeFormat.csv,
+    partition_by: str = typer.Option(
+        "",
+        help="Comma separated columns partitioning the Parquet dataset, e.g. PeriodoPrestacaoContas",
+    ),
+):
+    if format == MergeFormat.csv:
+        merge_document(path_dir, output, read_workers, incremental)
+        return
+    if incremental:
+        raise typer.BadParameter("--incremental only merges csv output")
+    # the dataset is a directory: merged.csv becomes merged/
+    output_dir = output.removesuffix(".csv")
+    if not is_replaceable_dataset(output_dir):
+        raise typer.BadParameter(
+            f"{output_dir} exists and is not a dataset written by the merger"
+        )
+    merge_document_parquet(
+        path_dir,
+        output_dir,
+        [column for column in partition_by.split(",") if column],
+        read_workers,
+    )
+
+
+@cache_app.command(name="stats", help="Show the size of the OCR result cache")
+def cache_stats(
+    cache_dir: str = DEFAULT_OCR_CACHE_DIR,
+):
+    stats = OcrCache(cache_dir).stats()
+    print(f"entries: {stats['entries']}")
+    print(f"size: {stats['size'] / MEGABYTE:.2f} MB")
+    for method, method_stats in stats["methods"].items():
+        print(
+            f"  {method}: {method_stats['entries']} entries, "
+            f"{method_stats['size'] / MEGABYTE:.2f} MB"
+        )
+    return stats
+
+
+@cache_app.command(
+    name="prune",
+    help="Evict the least recently used OCR results above a size",
+)
+def cache_prune(
+    cache_dir: str = DEFAULT_OCR_CACHE_DIR,
+    max_size_mb: int = 1024,
 ):
-    merge_document(path_dir, output)
+    removed = OcrCache(cache_dir).prune(max_size_mb * MEGABYTE)
+    print(f"removed {removed} entries")
+    return removed
 
 
 if __name__ == "__main__":
@@ -5,7 +5,15 @@ and extracting tables from the document.
 """
 
 import logging
+import multiprocessing
+import os
 import re
+import threading
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import cache
 
 import pandas as pd
 from docling.backend.pypdfium2_backend import PyPdfiumDocumentBackend
@@ -22,17 +30,37 @@ from docling.datamodel.pipeline_options import (
 from docling.document_converter import (
     DocumentConverter,
     ImageFormatOption,
+    PdfFormatOption,
 )
 from pandas import DataFrame, Series
 
 from utils.constants import COLUMNS_ANALYTICAL as COLUMNS
-from utils.constants import ExtractTypeRow
+from utils.constants import ExtractTypeRow, MethodType
 from utils.extract_utils import (
     extract_group_from_contacontabilcompleto,
     validate,
+    validate_series,
 )
+from utils.ocr_cache import OcrCache
 
 pattern = re.compile(r"^(\d+\.\d[0-9.]*)( - )(.*$)")
+pattern_total = re.compile(r"^TOTAL: \d+\.\d+.*")
+
+# conversion options, part of the OCR cache key
+DOCLING_OPTIONS = {
+    "ocr_lang": ["lat", "por", "Latin"],
+    "table_mode": TableFormerMode.ACCURATE.value,
+    "do_cell_matching": True,
+}
+
+# converter metrics of this process, see get_converter_metrics
+_metrics = {
+    "model_loads": 0,
+    "model_load_seconds": 0.0,
+    "pages": 0,
+    "page_seconds": 0.0,
+}
+_metrics_lock = threading.Lock()
 
 
 def get_current_title(table: DataFrame, row: Series | DataFrame):
@@ -52,9 +80,9 @@ def identify_row(line: Series) -> ExtractTypeRow | None:
 
     if first_column == "Data":
         return ExtractTypeRow.HEADERS
-    elif re.match(r"^TOTAL: \d+\.\d+.*", first_column):
+    elif re.match(pattern_total, first_column):
         return ExtractTypeRow.TOTAL
-    elif re.match(r"^(\d+\.\d[0-9.]*)( - )(.*$)", first_column):
+    elif re.match(pattern, first_column):
         return ExtractTypeRow.TITLE
     elif validate(first_column):
         return ExtractTypeRow.ROW
@@ -62,40 +90,146 @@ def identify_row(line: Series) -> ExtractTypeRow | None:
         return ExtractTypeRow.OTHERS
 
 
-def process_pdf_file(input_path: str, output_path: str):
+def identify_rows(data: Series) -> Series:
     """
-    Main function to convert a PDF document and extract tables.
-    It uses the Docling library to parse the PDF and Tesseract for OCR.
-    The extracted tables are processed to identify and categorize rows,
-    and then saved as CSV and HTML files.
+    Vectorized identify_row: classifies every row of the table at once from
+    its 'Data' column.
+    Returns a Series of ExtractTypeRow aligned with data.
     """
+    first_column = data.astype(str).str.strip()
+    is_date = validate_series(first_column).to_numpy()
+
+    row_types = Series(ExtractTypeRow.OTHERS, index=data.index, dtype=object)
+    # assigned from the lowest to the highest precedence of identify_row
+    row_types[is_date] = ExtractTypeRow.ROW
+    row_types[first_column.str.match(pattern)] = ExtractTypeRow.TITLE
+    row_types[first_column.str.match(pattern_total)] = ExtractTypeRow.TOTAL
+    row_types[first_column == "Data"] = ExtractTypeRow.HEADERS
+    return row_types
 
-    logging.basicConfig(level=logging.INFO)
 
+def current_titles(table: DataFrame) -> Series:
+    """
+    Vectorized get_current_title: the 'Data' of the closest TITLE row at or
+    above each row, forward-filled in a single pass (None before the first
+    title).
+    """
+    titles = (
+        table["Data"].where(table["tipoDado"] == ExtractTypeRow.TITLE).ffill()
+    )
+    return titles.astype(object).where(titles.notna(), None)
+
+
+def build_converter(num_threads: int = 4) -> DocumentConverter:
+    """
+    Builds a DocumentConverter with the Tesseract OCR and TableFormer options
+    used by the analytical report, as described by DOCLING_OPTIONS.
+    """
     # Docling Parse with Tesseract
     #    ----------------------
     pipeline_options = PdfPipelineOptions()
     pipeline_options.do_ocr = True
     pipeline_options.do_table_structure = True
-    pipeline_options.table_structure_options.do_cell_matching = True
+    pipeline_options.table_structure_options.do_cell_matching = (
+        DOCLING_OPTIONS["do_cell_matching"]
+    )
     pipeline_options.ocr_options = TesseractCliOcrOptions(
-        lang=["lat", "por", "Latin"],
+        lang=DOCLING_OPTIONS["ocr_lang"],
+    )
+    pipeline_options.table_structure_options.mode = TableFormerMode(
+        DOCLING_OPTIONS["table_mode"]
     )
-    pipeline_options.table_structure_options.mode = TableFormerMode.ACCURATE
 
     pipeline_options.accelerator_options = AcceleratorOptions(
-        num_threads=4, device=AcceleratorDevice.AUTO
+        num_threads=num_threads, device=AcceleratorDevice.AUTO
     )
-    doc_converter = DocumentConverter(
+    # the split pages are PDFs: without their own entry they would run the
+    # default PDF pipeline, ignoring these options
+    return DocumentConverter(
         format_options={
+            InputFormat.PDF: PdfFormatOption(
+                pipeline_options=pipeline_options,
+                backend=PyPdfiumDocumentBackend,
+            ),
             InputFormat.IMAGE: ImageFormatOption(
                 pipeline_options=pipeline_options,
                 backend=PyPdfiumDocumentBackend,
-            )
+            ),
         }
     )
 
-    conv_res = doc_converter.convert(input_path)
+
+@cache
+def get_converter(num_threads: int = 4) -> DocumentConverter:
+    """
+    Returns the converter shared by every page converted in this process.
+    The layout and TableFormer models of the configured PDF pipeline, the one
+    the split pages run, are loaded here, once, instead of on the first page.
+    """
+    started = time.perf_counter()
+    converter = build_converter(num_threads)
+    converter.initialize_pipeline(InputFormat.PDF)
+    elapsed = time.perf_counter() - started
+    with _metrics_lock:
+        _metrics["model_loads"] += 1
+        _metrics["model_load_seconds"] += elapsed
+    print(f"Loaded docling models in {elapsed:.2f}s (pid {os.getpid()})")
+    return converter
+
+
+def get_converter_metrics() -> dict:
+    """
+    Returns the model loads and the page conversion latency of this process.
+    """
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    metrics["pid"] = os.getpid()
+    metrics["seconds_per_page"] = (
+        metrics["page_seconds"] / metrics["pages"] if metrics["pages"] else 0.0
+    )
+    return metrics
+
+
+def log_converter_metrics(metrics: dict | None = None) -> None:
+    """
+    Prints the converter metrics of this process, or the ones given
+    (e.g. reported by a worker process).
+    """
+    metrics = metrics or get_converter_metrics()
+    print(
+        f"docling: {metrics['model_loads']} model load(s) in "
+        f"{metrics['model_load_seconds']:.2f}s, {metrics['pages']} page(s) "
+        f"at {metrics['seconds_per_page']:.2f}s/page (pid {metrics['pid']})"
+    )
+
+
+def process_pdf_file(
+    input_path: str,
+    output_path: str,
+    cache: OcrCache | None = None,
+    converter: DocumentConverter | None = None,
+):
+    """
+    Main function to convert a PDF document and extract tables.
+    It uses the Docling library to parse the PDF and Tesseract for OCR.
+    The extracted tables are processed to identify and categorize rows,
+    and then saved as CSV and HTML files.
+    When a cache is given, a page converted before is read from it.
+    The converter defaults to the warm one returned by get_converter.
+    """
+    if read_cached_csv(cache, input_path, output_path):
+        return output_path
+
+    logging.basicConfig(level=logging.INFO)
+
+    converter = converter or get_converter()
+    started = time.perf_counter()
+    conv_res = converter.convert(input_path)
+    elapsed = time.perf_counter() - started
+    with _metrics_lock:
+        _metrics["pages"] += 1
+        _metrics["page_seconds"] += elapsed
+    print(f"Converted {input_path} in {elapsed:.2f}s")
 
     # Export tables
     for table_ix, table in enumerate(conv_res.document.tables):
@@ -105,18 +239,9 @@ def process_pdf_file(input_path: str, output_path: str):
         table_output = table_df.copy()
         table_output.columns = COLUMNS
         # inserindo a colunas já com os tipos definidos
+        table_output.insert(0, "tipoDado", identify_rows(table_output["Data"]))
         table_output.insert(
-            0,
-            "tipoDado",
-            table_output.apply(identify_row, axis=1),  # pyright: ignore
-        )
-        table_output.insert(
-            0,
-            "ContaContabilCompleto",
-            table_output.apply(
-                lambda row: get_current_title(table_output, row),  # noqa
-                axis=1,
-            ),  # pyright: ignore
+            0, "ContaContabilCompleto", current_titles(table_output)
         )
         # remover dados que não serão mais usados
         table_output.drop(
@@ -149,4 +274,115 @@ def process_pdf_file(input_path: str, output_path: str):
         )
 
         table_output.to_csv(output_path)
+        store_csv(cache, input_path, output_path)
         return output_path
+
+
+def read_cached_csv(
+    cache: OcrCache | None, input_path: str, output_path: str
+) -> bool:
+    """
+    Writes the cached conversion of input_path to output_path.
+    Returns:
+        bool: Whether the cache had the conversion.
+    """
+    if cache is None:
+        return False
+    cached = cache.get(input_path, MethodType.docling, DOCLING_OPTIONS)
+    if cached is None:
+        return False
+    print(f"Using cached conversion for {input_path}")
+    with open(output_path, "wb") as out_file:
+        out_file.write(cached)
+    return True
+
+
+def store_csv(cache: OcrCache | None, input_path: str, output_path: str):
+    """
+    Stores the conversion written to output_path in the cache, if any.
+    """
+    if cache is None:
+        return
+    with open(output_path, "rb") as csv_file:
+        cache.put(
+            input_path, MethodType.docling, DOCLING_OPTIONS, csv_file.read()
+        )
+
+
+def _convert_job(
+    input_path: str, output_path: str, num_threads: int
+) -> tuple[str, dict]:
+    """
+    Process pool worker: converts a page with the converter warmed up by the
+    pool initializer, reporting the metrics of the worker along.
+    """
+    output = process_pdf_file(
+        input_path, output_path, converter=get_converter(num_threads)
+    )
+    return output or "", get_converter_metrics()
+
+
+def process_pdf_files(
+    jobs: Iterable[tuple[str, str]],
+    workers: int = 2,
+    num_threads: int | None = None,
+    cache: OcrCache | None = None,
+) -> Iterator[str]:
+    """
+    Converts many pages in a pool of worker processes, each one loading the
+    models once and keeping its own warm DocumentConverter.
+
+    Args:
+        jobs (Iterable[tuple[str, str]]): Pairs of (input path, output path), consumed lazily.
+        workers (int): Number of worker processes.
+        num_threads (int | None): AcceleratorOptions.num_threads of each worker,
+            defaults to the CPU count shared between the workers.
+        cache (OcrCache | None): OCR result cache, pages found in it are not
+            sent to the workers.
+    Yields:
+        str: The output path of each job (or "" when no table was found), in the order of the jobs.
+    """
+    workers = max(1, workers)
+    num_threads = num_threads or max(1, (os.cpu_count() or 1) // workers)
+    # sequence of jobs: finished output path or the worker future
+    pending: deque[tuple[str, str, str | Future]] = deque()
+    worker_metrics: dict[int, dict] = {}
+
+    def collect() -> str:
+        input_path, output_path, result = pending.popleft()
+        if isinstance(result, str):
+            return result
+        output, metrics = result.result()
+        worker_metrics[metrics["pid"]] = metrics
+        if output:
+            store_csv(cache, input_path, output_path)
+        return output
+
+    # spawn avoids forking a process that may already be running threads
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=get_converter,
+        initargs=(num_threads,),
+    ) as executor:
+        for input_path, output_path in jobs:
+            if read_cached_csv(cache, input_path, output_path):
+                pending.append((input_path, output_path, output_path))
+            else:
+                pending.append(
+                    (
+                        input_path,
+                        output_path,
+                        executor.submit(
+                            _convert_job, input_path, output_path, num_threads
+                        ),
+                    )
+                )
+            # keep every worker busy without reading all the jobs ahead
+            while len(pending) > workers * 2:
+                yield collect()
+        while pending:
+            yield collect()
+
+    for metrics in worker_metrics.values():
+        log_converter_metrics(metrics)
@@ -2,7 +2,6 @@ import csv
 import math
 import os
 import re
-from collections import defaultdict
 from io import StringIO
 
 import pandas as pd
@@ -11,7 +10,7 @@ from utils.constants import COLUMNS_ANALYTICAL as COLUMNS
 from utils.constants import FileType
 from utils.extract_utils import (
     extract_group_from_contacontabilcompleto,
-    validate,
+    validate_series,
 )
 
 pattern_account_grouped = re.compile(r"^(\d+[\.\d]*)( - )(.*$)")
@@ -64,31 +63,6 @@ def clean_table_text(text: str) -> str:
     return text
 
 
-def concat_dataframe_cells(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Concatena as células de um DataFrame em uma única célula.
-    """
-    for line in df.index[2:]:
-        drop_row = False
-        for column in df.columns:
-            if (
-                isinstance(df.at[line, column], str)
-                and str(df.at[line, column]).strip() != ""
-                and not isinstance(df.at[line, "Data"], str)
-                # Safely check for NaN or missing values in "Data" column.
-                and pd.isna(df.at[line, "Data"])
-            ):
-                df.at[line - 1, column] = (
-                    str(df.at[line - 1, column]).strip()
-                    + " "
-                    + str(df.at[line, column]).strip()
-                )
-                drop_row = True
-        if drop_row:
-            df.drop(line, inplace=True)
-    return df
-
-
 def extract_untitled_table(text: str) -> str:
     """
     Extrai a tabela sem título do texto, removendo os parágrafos adicionais.
@@ -102,224 +76,201 @@ def extract_untitled_table(text: str) -> str:
     return text
 
 
-def drop_invalid_rows(df: pd.DataFrame) -> pd.DataFrame:
+def convert_list_to_dict(data: list) -> dict:
     """
-    Remove linhas inválidas do DataFrame, onde a coluna 'Data' não é uma string válida.
+    Converte uma lista de strings em um dicionário, onde a chave é o primeiro elemento
+    e o valor é o restante da string.
     """
-    return df[
-        df["Data"].apply(lambda x: isinstance(x, str) and validate(x.strip()))
-    ]  # type: ignore
+    tables = {
+        i: read_ascii_table(line)
+        for i, line in enumerate(data)
+        if re.match(pattern_table_text, line)
+    }
+    # as datas de todas as tabelas da página são verificadas de uma vez
+    dated = keep_dated_rows([rows for _, rows in tables.values()])
+    return {
+        data[i - 1].strip(): build_ascii_table(header, rows)
+        for (i, (header, _)), rows in zip(tables.items(), dated, strict=True)
+    }
 
 
-def strip_string_cells(df: pd.DataFrame) -> pd.DataFrame:
+def clean_total_ascii_table(table: str) -> str:
     """
-    Remove espaços em branco no início e no final de todas as células do DataFrame.
+    Limpa a tabela ASCII removendo a linha de totalização.
     """
-    for column in df.columns:
-        if df[column].dtype == "object":
-            df[column] = df[column].str.strip()
-    return df
+    lines = table.split("\n")
+    cleaned_lines = [
+        line for line in lines if not re.match(pattern_total_cell, line)
+    ]
+    return "\n".join(cleaned_lines) if cleaned_lines else ""
 
 
-def strip_columns_names(df: pd.DataFrame) -> pd.DataFrame:
+def split_ascii_row(line: str, bounds: list[int]) -> list[str]:
     """
-    Remove espaços em branco no início e no final dos nomes das colunas do DataFrame.
+    Corta uma linha da tabela ASCII nas posições das bordas "+" da linha
+    separadora. Se a linha não estiver alinhada às bordas, divide por "|".
     """
-    df.columns = df.columns.str.strip()
-    return df
+    if len(line) > bounds[-1] and all(line[bound] == "|" for bound in bounds):
+        return [
+            line[left + 1 : right].strip()
+            for left, right in zip(bounds, bounds[1:], strict=False)
+        ]
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
 
 
-def find_similar_columns(lst: list[str], pattern: re.Pattern) -> dict:
+def resolve_columns(header: list[str], rows: list[list[str]]) -> list[str]:
     """
-    Encontra colunas similares em uma lista de strings e retorna um dicionário com as colunas agrupadas.
-    """
-    grouped_items = defaultdict(list)
-    for item in lst:
-        if re.search(pattern, item):
-            prefix = re.split(pattern, item)[0]
-            grouped_items[prefix].append(item)
-    return grouped_items
+    Nome de coluna do layout COLUMNS_ANALYTICAL para cada coluna da tabela,
+    tratando as falhas de processamento da extração:
 
+    * colunas "Descrição" e "Participante" fundidas em uma só;
+    * coluna sem título no meio da tabela com a coluna Valor vazia, quando os
+      dados estão deslocados uma coluna para a esquerda dos títulos.
 
-def convert_list_to_dict(data: list) -> dict:
+    Colunas repetidas mantêm o mesmo nome, e colunas sem título ficam com "".
     """
-    Converte uma lista de strings em um dicionário, onde a chave é o primeiro elemento
-    e o valor é o restante da string.
+    if "Descrição Participante" in header:
+        print("Processing error: 'Descrição Participante' column found.")
+    names = [
+        "Descrição" if name == "Descrição Participante" else name
+        for name in header
+    ]
+    valor = names.index("Valor") if "Valor" in names else None
+    if (
+        "" in names
+        and valor is not None
+        and all(len(row) <= valor or not row[valor] for row in rows)
+    ):
+        print("Processing error: empty column title found., fixing...")
+        names[valor] = ""
+        for index in reversed(range(1, len(header))):
+            if header[index] == "":
+                break
+            names[index - 1] = header[index]
+    return names
+
+
+def read_ascii_table(table: str) -> tuple[list[str] | None, list[list[str]]]:
     """
-    return {
-        data[i - 1].strip(): from_ascii_table_to_dataframe(line)
-        for i, line in enumerate(data)
-        if re.match(pattern_table_text, line)
-    }
-
-
-def get_first_not_null_value(
-    df: pd.DataFrame, index: int, input_list: list[str]
-):
-    for col in input_list:
-        value = df.at[index, col]
-        if (
-            value is not None or math.isnan(value) or value == ""
-        ):  # Check for non-null value
-            return value.strip() if isinstance(value, str) else value
-    return None  # Return None if no non-null value is found
+    Lê a tabela ASCII em uma única passada, cortando as colunas nas posições
+    das bordas "+" da linha separadora. Retorna o título das colunas (None
+    quando não há tabela) e as células de todas as linhas, com ou sem data.
+    """
+    bounds: list[int] | None = None
+    header: list[str] | None = None
+    rows: list[list[str]] = []
+    for line in table.split("\n"):
+        if re.match(pattern_table_separator, line):
+            if bounds is None:
+                bounds = [i for i, char in enumerate(line) if char == "+"]
+            continue
+        if not line.startswith("|") or bounds is None:
+            continue
+        cells = split_ascii_row(line, bounds)
+        if header is None:
+            header = cells
+        else:
+            rows.append(cells)
+    return header, rows
+
+
+def keep_dated_rows(tables: list[list[list[str]]]) -> list[list[list[str]]]:
+    """
+    Mantém, em cada tabela, somente as linhas com uma data válida na
+    primeira coluna. As datas de todas as tabelas são verificadas de uma vez
+    com validate_series.
+    """
+    is_date = iter(
+        validate_series(
+            pd.Series(
+                [row[0] for rows in tables for row in rows], dtype=object
+            )
+        ).to_numpy()
+    )
+    return [[row for row in rows if next(is_date)] for rows in tables]
 
 
-def clean_total_ascii_table(table: str) -> str:
+def build_ascii_table(
+    header: list[str] | None, rows: list[list[str]]
+) -> pd.DataFrame:
     """
-    Limpa a tabela ASCII removendo a linha de totalização.
+    Monta as linhas com data direto no layout COLUMNS_ANALYTICAL (colunas
+    repetidas preenchem as células vazias da primeira, colunas sem título
+    são descartadas).
     """
-    lines = table.split("\n")
-    cleaned_lines = [
-        line for line in lines if not re.match(pattern_total_cell, line)
+    if header is None:
+        return pd.DataFrame([], columns=COLUMNS)
+    names = resolve_columns(header, rows)
+    sources = [
+        [i for i, name in enumerate(names) if name == column]
+        for column in COLUMNS
     ]
-    return "\n".join(cleaned_lines) if cleaned_lines else ""
+    # a Participante fundida com a Descrição fica vazia, não nula
+    missing = [
+        "" if column == "Participante" else math.nan for column in COLUMNS
+    ]
+    # cells are already stripped, and every row kept has a date, so there
+    # are no continuation rows to merge
+    return pd.DataFrame(
+        [
+            [
+                next(
+                    (row[i] for i in indexes if i < len(row) and row[i]),
+                    missing[position] if not indexes else math.nan,
+                )
+                for position, indexes in enumerate(sources)
+            ]
+            for row in rows
+        ],
+        columns=COLUMNS,
+        dtype=object,
+    )
 
 
 def from_ascii_table_to_dataframe(table: str) -> pd.DataFrame:
     """
-    Converte uma tabela ASCII em um DataFrame do pandas.
+    Converte uma tabela ASCII em um DataFrame do pandas (read_ascii_table,
+    keep_dated_rows e build_ascii_table).
     """
-    lines = table.split("\n")
-    lines_to_skip = [
-        i
-        for i, line in enumerate(lines)  # jump header line
-        if re.match(pattern_table_separator, line)
-    ]
-    df = strip_columns_names(
-        pd.read_csv(
-            StringIO(table),
-            sep="|",
-            skipinitialspace=True,
-            engine="python",
-            skiprows=lines_to_skip,
-            index_col=0,
-            dtype=str,
-        ).reset_index(drop=True)
-    )
-    df = drop_invalid_rows(df)  # type: ignore
-    columns_from_txt: list[str] = df.columns.str.strip().to_list()[
-        :-1
-    ]  # remove last column because is aways empty
-    # situações de falha de processamento que necessita de tratamento
-    if columns_from_txt != COLUMNS.to_list():
-        # falha de processamento que gera coluna repetida
-        if (
-            len(
-                list(
-                    filter(
-                        lambda el: re.search(r"( \.[0-9]+)$", el),
-                        columns_from_txt,
-                    )
-                )
-            )
-            > 0
-        ):
-            print("Processing error: duplicate column title found., fixing...")
-            repeated_columns = find_similar_columns(
-                columns_from_txt, re.compile(r"( \.[0-9]+)$")
-            )
-            for key, value in repeated_columns.items():
-                columns_not_empty = []
-                for column in value:
-                    if df[column].isna().all():  # type: ignore
-                        columns_not_empty.append(column)
-                for item in df[key].index:
-                    if (
-                        df.at[item, key] is None
-                        or pd.isna(df.at[item, key])
-                        or df.at[item, key] == ""
-                    ):
-                        df.at[item, key] = get_first_not_null_value(
-                            df, item, columns_not_empty
-                        )
-                df.drop(columns=value, inplace=True)
-                print(f"finished removing duplicate columns for {key}")
-                columns_from_txt = df.columns.str.strip().to_list()[
-                    :-1
-                ]  # remove last column because is aways empty
-        # falha de processamento quando funde duas colunas  Descrição e Participante
-        if "Descrição Participante" in df.columns.str.strip():
-            print(
-                "Processing error: 'Descrição Participante' column found., fixing..."
-            )
-            df.rename(
-                columns={
-                    "Descrição Participante": "Descrição",
-                },
-                inplace=True,
-            )
-            df.insert(loc=2, column="Participante", value="")
-            print("Fixed 'Descrição Participante' column.")
-            columns_from_txt = df.columns.str.strip().to_list()[
-                :-1
-            ]  # remove last column because is aways empty
-
-        # falha de processamento que gera coluna vazia no meio da tabela
-        if (
-            len(
-                list(
-                    filter(
-                        lambda el: re.search(r"^Unnamed", el), columns_from_txt
-                    )
-                )
-            )
-            > 0
-        ):
-            print("Processing error: empty column title found., fixing...")
-            if df["Valor"].isna().all():  # type: ignore
-                print("Iniciando movimentação de dados para coluna correta")
-                df.drop(columns=["Valor"], inplace=True)
-                for index, column in reversed(
-                    list(enumerate(columns_from_txt))
-                ):  # type: ignore
-                    if re.search(r"^Unnamed", column):
-                        break
-                    df.rename(
-                        columns={
-                            columns_from_txt[index - 1]: columns_from_txt[
-                                index
-                            ],
-                        },
-                        inplace=True,
-                    )
-                print("Colunas movimentadas com sucesso.. continuando...")
-            else:
-                print(
-                    "Situação não tratada: coluna Valor preenchida, por enquanto deixa como está"
-                )
-            columns_from_txt = df.columns.str.strip().to_list()[
-                :-1
-            ]  # remove last column because is aways empty
-    df = df.loc[:, ~df.columns.str.contains("^Unnamed")]
-    df.columns = COLUMNS
-    return strip_string_cells(concat_dataframe_cells(df))  # type: ignore
+    header, rows = read_ascii_table(table)
+    (rows,) = keep_dated_rows([rows])
+    return build_ascii_table(header, rows)
 
 
 def data_processing(data: dict, filename: str) -> pd.DataFrame:
     """
     Processa os dados do dicionário e retorna um DataFrame do pandas.
     """
-    return_data = pd.DataFrame([], columns=COLUMNS)
-    for key, value in data.items():
-        if isinstance(value, pd.DataFrame):
-            inner_data = value.copy()
-            inner_data["ContaContabilCompleto"] = key
-            inner_data["ContaContabilDescritivo"] = (
-                extract_group_from_contacontabilcompleto(
-                    pattern_account_grouped, key, 3
-                )
-            )
-            inner_data["ContaContabil"] = (
-                extract_group_from_contacontabilcompleto(
-                    pattern_account_grouped, key, 1
-                )
-            )
-            inner_data["file"] = filename
-            inner_data.drop(columns=["ContaContabilCompleto"], inplace=True)
-            return_data = pd.concat(
-                [return_data, inner_data], ignore_index=True
+    # os blocos são concatenados uma única vez e as colunas da conta
+    # contábil repetidas pelo tamanho de cada bloco
+    blocks = {
+        key: value
+        for key, value in data.items()
+        if isinstance(value, pd.DataFrame)
+    }
+    return_data = pd.concat(
+        [pd.DataFrame([], columns=COLUMNS), *blocks.values()],
+        ignore_index=True,
+    )
+    sizes = [len(value) for value in blocks.values()]
+    for column, group in (
+        ("ContaContabilDescritivo", 3),
+        ("ContaContabil", 1),
+    ):
+        return_data[column] = (
+            pd.Series(
+                [
+                    extract_group_from_contacontabilcompleto(
+                        pattern_account_grouped, key, group
+                    )
+                    for key in blocks
+                ],
+                dtype=object,
             )
+            .repeat(sizes)
+            .to_numpy()
+        )
+    return_data["file"] = filename
     return_data["Valor"] = (
         return_data["Valor"]
         .replace(to_replace=r"\.", value="", regex=True)
@@ -347,13 +298,20 @@ def data_processing(data: dict, filename: str) -> pd.DataFrame:
     return return_data
 
 
-def process_txt_file(path: str):
-    file_csv_output = path.replace(".txt", ".csv")
+def parse_txt_file(path: str) -> pd.DataFrame:
+    """
+    Converte o texto extraído de uma página em DataFrame, sem gravar o csv.
+    """
     blocks = split_blocks(openFile(path).getvalue())
-    data_processing(
+    return data_processing(
         convert_list_to_dict([clean_table_text(block) for block in blocks]),
-        os.path.basename(file_csv_output),
-    ).to_csv(
+        os.path.basename(path.replace(".txt", ".csv")),
+    )
+
+
+def process_txt_file(path: str):
+    file_csv_output = path.replace(".txt", ".csv")
+    parse_txt_file(path).to_csv(
         file_csv_output,
         index=False,
         quoting=csv.QUOTE_NONNUMERIC,
@@ -0,0 +1,223 @@
+"""
+Fast path for pages that carry a native text layer.
+
+The characters of the page and their boxes are read with pypdfium2 and the
+analytical tables are rebuilt in the same ASCII layout returned by
+LLMWhisperer, so the page skips the OCR and is parsed by
+processors.llmwhisperer_analytical.process_txt_file. Pages whose text layer
+holds no analytical table (image-only pages, or scanned tables under a
+digital header or stamp) still go to the OCR backend.
+"""
+
+import ctypes
+import re
+import statistics
+
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+# gap between characters, in median character widths, that starts a new cell
+CELL_GAP_WIDTHS = 2.0
+
+pattern_title = re.compile(r"^\d+(\.\d+)* - ")
+pattern_total = re.compile(r"^TOTAL")
+
+# text, left and right of a run of characters
+Cell = tuple[str, float, float]
+
+
+def read_chars(
+    input_path: str,
+) -> list[tuple[str, float, float, float, float]]:
+    """
+    Reads the characters of every page of the PDF with their boxes, as
+    (char, left, baseline, right, height). Line breaks added by pdfium are
+    skipped, the lines are rebuilt from the baselines.
+    """
+    chars = []
+    origin_x, origin_y = ctypes.c_double(), ctypes.c_double()
+    pdf = pdfium.PdfDocument(input_path)
+    try:
+        for page_index, page in enumerate(pdf):
+            # pages are stacked, so lines of different pages never mix
+            offset = page_index * (page.get_height() + 1)
+            textpage = page.get_textpage()
+            for index in range(textpage.count_chars()):
+                char = chr(pdfium_c.FPDFText_GetUnicode(textpage.raw, index))
+                if char in "\r\n":
+                    continue
+                left, bottom, right, top = textpage.get_charbox(index)
+                pdfium_c.FPDFText_GetCharOrigin(
+                    textpage.raw, index, origin_x, origin_y
+                )
+                chars.append(
+                    (
+                        " " if char.isspace() else char,
+                        left,
+                        origin_y.value - offset,
+                        right,
+                        top - bottom,
+                    )
+                )
+    finally:
+        pdf.close()
+    return chars
+
+
+def read_text_lines(input_path: str) -> list[list[Cell]]:
+    """
+    Reads the text layer of the PDF, grouping the characters in lines by
+    their baseline, from the top of the page, and the lines in cells
+    separated by wide horizontal gaps.
+    """
+    chars = read_chars(input_path)
+    glyphs = [char for char in chars if char[0] != " "]
+    if not glyphs:
+        return []
+    max_gap = CELL_GAP_WIDTHS * statistics.median(
+        right - left for _, left, _, right, _ in glyphs
+    )
+    line_tolerance = (
+        statistics.median(height for _, _, _, _, height in glyphs) / 2
+    )
+
+    lines: list[list[tuple[str, float, float, float, float]]] = []
+    for glyph in sorted(chars, key=lambda glyph: -glyph[2]):
+        if lines and lines[-1][0][2] - glyph[2] <= line_tolerance:
+            lines[-1].append(glyph)
+        else:
+            lines.append([glyph])
+
+    text_lines: list[list[Cell]] = []
+    for line in lines:
+        cells: list[Cell] = []
+        text, cell_left, cell_right, space = "", 0.0, 0.0, False
+        for char, left, _, right, _ in sorted(line, key=lambda c: c[1]):
+            if char == " ":
+                space = bool(text)
+                continue
+            if text and left - cell_right > max_gap:
+                cells.append((text, cell_left, cell_right))
+                text = ""
+            if not text:
+                cell_left = left
+            elif space:
+                text += " "
+            text += char
+            cell_right = right
+            space = False
+        if text:
+            cells.append((text, cell_left, cell_right))
+        if cells:
+            text_lines.append(cells)
+    return text_lines
+
+
+def is_header(cells: list[Cell]) -> bool:
+    """
+    Returns True for the header line of an analytical table.
+    """
+    return cells[0][0] == "Data" and cells[-1][0] == "Valor"
+
+
+def assign_columns(header: list[Cell], cells: list[Cell]) -> list[str]:
+    """
+    Places each cell of a table line under the header it overlaps the most,
+    or under the last header starting before its center when it overlaps
+    none (e.g. a short value far from a wide header).
+    """
+    row = [""] * len(header)
+    for text, left, right in cells:
+        overlaps = [
+            min(right, header_right) - max(left, header_left)
+            for _, header_left, header_right in header
+        ]
+        column = max(range(len(header)), key=lambda i: overlaps[i])
+        if overlaps[column] <= 0:
+            center = (left + right) / 2
+            column = max(
+                [i for i, (_, hl, _) in enumerate(header) if hl <= center]
+                or [0]
+            )
+        row[column] = f"{row[column]} {text}".strip()
+    return row
+
+
+def to_ascii_table(header: list[str], rows: list[list[str]]) -> str:
+    """
+    Renders the table with the +---+ / | cell | layout of LLMWhisperer.
+    """
+    table = [header] + [
+        [cell.replace("|", "/") for cell in row] for row in rows
+    ]
+    widths = [max(len(row[i]) for row in table) for i in range(len(header))]
+    separator = "+" + "+".join("-" * (width + 2) for width in widths) + "+"
+    lines = [separator]
+    for row in table:
+        lines.append(
+            "| "
+            + " | ".join(
+                cell.ljust(width)
+                for cell, width in zip(row, widths, strict=True)
+            )
+            + " |"
+        )
+        lines.append(separator)
+    return "\n".join(lines)
+
+
+def render_text(lines: list[list[Cell]]) -> tuple[str, int]:
+    """
+    Rebuilds the page text: account titles followed by a blank line and
+    their table in ASCII, other lines as plain text.
+    Returns:
+        tuple[str, int]: The text and the number of tables rebuilt in it.
+    """
+    output: list[str] = []
+    header: list[Cell] | None = None
+    rows: list[list[str]] = []
+    tables = 0
+
+    def flush():
+        nonlocal tables
+        if header is not None and rows:
+            output.extend(
+                [to_ascii_table([text for text, _, _ in header], rows), ""]
+            )
+            tables += 1
+        rows.clear()
+
+    for cells in lines:
+        text = " ".join(cell for cell, _, _ in cells)
+        if is_header(cells):
+            flush()
+            header = cells
+        elif pattern_title.match(text):
+            flush()
+            header = None
+            output.extend([text, ""])
+        elif header is not None and not pattern_total.match(text):
+            rows.append(assign_columns(header, cells))
+        else:
+            flush()
+            header = None
+            output.append(text)
+    flush()
+    return "\n".join(output) + "\n", tables
+
+
+def process_pdf_file(input_path: str, output_path: str) -> str:
+    """
+    Writes the page rebuilt from its text layer to output_path, in the
+    LLMWhisperer text layout.
+    Returns:
+        str: output_path, or "" when no analytical table could be rebuilt
+        from the text layer (e.g. a scanned table under a digital header),
+        so the page goes to the OCR.
+    """
+    text, tables = render_text(read_text_lines(input_path))
+    if not tables:
+        return ""
+    with open(output_path, "w", encoding="utf-8") as out_file:
+        out_file.write(text)
+    return output_path
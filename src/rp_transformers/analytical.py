@@ -1,11 +1,13 @@
 import csv
 import re
-from types import FunctionType
 
 import pandas
 
+from utils.config_loader import ConfigLoader
+
 regex_page = re.compile(r"^(page_)(\d+_)(\d+-\d+)(.csv)")
 regex_old_unit_format = re.compile(r"^(Un. )(\d*-QD\d*-LT\d*)$")
+regex_unit_code = re.compile(r"\d*-QD\d*-LT\d*")
 
 
 def rename_unit(
@@ -50,117 +52,220 @@ def extract_common_unit_information(
     return participante  # short circuit to match a 0 or 1 result in case of not unit participant
 
 
+def build_accounts_index(config_loader: ConfigLoader) -> dict[str, int]:
+    """
+    Maps each account code, by ContaContabil or ContaContabilNormalizado, to
+    the position of the first configuration row having it.
+    """
+    accounts_configuration = config_loader.accounts_configuration()
+    index: dict[str, int] = {}
+    for position, codes in enumerate(
+        zip(
+            accounts_configuration["ContaContabil"],
+            accounts_configuration["ContaContabilNormalizado"],
+            strict=True,
+        )
+    ):
+        for code in codes:
+            if isinstance(code, str):
+                index.setdefault(code, position)
+    return index
+
+
+def build_units_index(config_loader: ConfigLoader) -> dict[str, str]:
+    """
+    Maps the code of each unit (e.g. 888-QD88-LT88) to the first renamed
+    participant of the rename list carrying it.
+    """
+    index: dict[str, str] = {}
+    for participante in config_loader.units_to_rename()["Participante"]:
+        if not isinstance(participante, str):
+            continue
+        match = regex_unit_code.search(participante)
+        if match:
+            index.setdefault(match.group(0), participante)
+    return index
+
+
+def rename_units(
+    participantes: pandas.Series,
+    units_index: dict[str, str],
+    renamed_participants: pandas.Series,
+) -> pandas.Series:
+    """
+    Vectorized rename_unit: participants in the old unit format (Un. <code>)
+    found in units_index get their new name. Any other participant keeps
+    the match of rename_unit, the first name of the rename list
+    (renamed_participants) matching ".*<participante>", looked up once per
+    distinct participant; the ones without a match are kept.
+    """
+    codes = participantes.str.extract(regex_old_unit_format)[1]
+    renamed = codes.map(units_index)
+    others = participantes[codes.isna() & (participantes != "")]
+    for participante in others.unique():
+        matches = renamed_participants[
+            renamed_participants.str.match(".*" + participante, na=False)
+        ]
+        if not matches.empty:
+            renamed[participantes == participante] = matches.iloc[0]
+    return renamed.fillna(participantes)
+
+
+# strings read as missing values by pandas.read_csv (its default na_values)
+CSV_NA_VALUES = [
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+]
+
+
+def to_text_table(table: pandas.DataFrame) -> pandas.DataFrame:
+    """
+    Cells of a parsed page as the strings read back from its csv with
+    pandas.read_csv(dtype=str).fillna(""), without writing the csv.
+    """
+    text = table.astype(str)
+    # missing cells are written empty, and strings read as missing too
+    return text.mask(table.isna() | text.isin(CSV_NA_VALUES), "").reset_index(
+        drop=True
+    )
+
+
+def transform_analytical_data(
+    csv_to_transform: pandas.DataFrame, config_loader: ConfigLoader
+) -> pandas.DataFrame | None:
+    """
+    Enriches the cells of an analytical page, as strings (see to_text_table),
+    with the configuration sheets.
+    Returns None when no sheet is configured, leaving the page as it is.
+    """
+    accounts_configuration = config_loader.accounts_configuration()
+    units_to_rename = config_loader.units_to_rename()
+    if accounts_configuration.empty and units_to_rename.empty:
+        return None
+    table_output = csv_to_transform.copy()
+
+    if not units_to_rename.empty:
+        units_index: dict[str, str] = config_loader.derived(
+            "units_index", build_units_index
+        )  # pyright: ignore
+        table_output.insert(
+            0,
+            "ParticipanteReview",
+            rename_units(
+                table_output["Participante"],
+                units_index,
+                units_to_rename["Participante"],
+            ),
+        )
+
+        table_output.drop(columns=["Participante"], inplace=True)
+        table_output.rename(
+            columns={
+                "ParticipanteReview": "Participante",
+            },
+            inplace=True,
+        )
+
+    if not accounts_configuration.empty:
+        accounts_index: dict[str, int] = config_loader.derived(
+            "accounts_index", build_accounts_index
+        )  # pyright: ignore
+        # configuration row of each transaction, -1 when not configured
+        positions = (
+            table_output["ContaContabil"]
+            .map(accounts_index)
+            .fillna(-1)
+            .astype(int)
+            .to_numpy()
+        )
+        matched = positions >= 0
+        for column_name in [
+            "PeriodoPrestacaoContas",
+            "ContaContabilGrupo",
+            "ContaContabilGrupoDescritivo",
+            "Natureza",
+            "NaturezaDescritivo",
+            "CompoeTaxa",
+            "AcordadoAssembleia",
+            "ContaContabilDescritivo",
+            "ContaContabilNormalizado",
+        ]:
+            existed_columns = list(
+                csv_to_transform.columns.values
+            )  # get from base dataframe
+            if column_name in existed_columns:
+                table_output.drop(columns=[column_name], inplace=True)
+            if column_name == "PeriodoPrestacaoContas":
+                # computed once per file instead of once per row
+                column_values = table_output["file"].map(
+                    {
+                        file: add_periodo_competencia_column(
+                            column_name, accounts_configuration, file
+                        )
+                        for file in table_output["file"].unique()
+                    }
+                )
+            else:
+                column_values = pandas.Series(
+                    "", index=table_output.index, dtype=object
+                )
+                column_values[matched] = accounts_configuration[
+                    column_name
+                ].to_numpy(dtype=object)[positions[matched]]
+            table_output.insert(0, column_name, column_values)
+        table_output.drop(columns=["ContaContabil"], inplace=True)
+        table_output.rename(
+            columns={
+                "ContaContabilNormalizado": "ContaContabil",
+            },
+            inplace=True,
+        )
+
+    return table_output
+
+
 def transform_generated_analytical_data(
     csv_page_path: str,
     analytical_accounts_configuration_url: str,
     analytical_units_renamed_list_url: str,
+    config_loader: ConfigLoader | None = None,
 ):
-    accounts_configuration: pandas.DataFrame = pandas.DataFrame()
-    units_to_rename: pandas.DataFrame = pandas.DataFrame()
-
-    if analytical_accounts_configuration_url:
-        accounts_configuration = pandas.read_csv(
+    # without a loader shared by the run, the sheets are fetched on each call
+    if config_loader is None:
+        config_loader = ConfigLoader(
             analytical_accounts_configuration_url,
-            dtype={
-                "ContaContabil": str,
-                "ContaContabilGrupo": str,
-                "ContaContabilNormalizado": str,
-            },
-        )
-
-    if analytical_units_renamed_list_url:
-        units_to_rename = pandas.read_csv(analytical_units_renamed_list_url)
-
-    if not accounts_configuration.empty or not units_to_rename.empty:
-        csv_to_transform: pandas.DataFrame = pandas.read_csv(
-            csv_page_path, dtype=str
-        ).fillna("")
-        table_output = csv_to_transform.copy()
-
-        if not units_to_rename.empty:
-            table_output.insert(
-                0,
-                "ParticipanteReview",
-                table_output.apply(
-                    lambda row: rename_unit(
-                        row["Participante"],
-                        # TODO filter units_to_rename for better performance
-                        units_to_rename[
-                            units_to_rename["Participante"].str.match(
-                                ".*"
-                                + extract_common_unit_information(
-                                    row["Participante"],
-                                    regex_old_unit_format,
-                                )
-                            )
-                        ],
-                    ),
-                    axis=1,
-                ),  # pyright: ignore
-            )
-
-            table_output.drop(columns=["Participante"], inplace=True)
-            table_output.rename(
-                columns={
-                    "ParticipanteReview": "Participante",
-                },
-                inplace=True,
-            )
-
-        if not accounts_configuration.empty:
-            for column_name in [
-                "PeriodoPrestacaoContas",
-                "ContaContabilGrupo",
-                "ContaContabilGrupoDescritivo",
-                "Natureza",
-                "NaturezaDescritivo",
-                "CompoeTaxa",
-                "AcordadoAssembleia",
-                "ContaContabilDescritivo",
-                "ContaContabilNormalizado",
-            ]:
-                existed_columns = list(
-                    csv_to_transform.columns.values
-                )  # get from base dataframe
-                if column_name in existed_columns:
-                    table_output.drop(columns=[column_name], inplace=True)
-                fnlambda: FunctionType = add_configurated_column
-                if column_name == "PeriodoPrestacaoContas":
-                    fnlambda = add_periodo_competencia_column
-                table_output.insert(
-                    0,
-                    column_name,
-                    table_output.apply(
-                        lambda row: fnlambda(  # noqa -- ignoring not bind loop because this argument does not change in internal loop
-                            column_name,  # noqa  -- ignoring not bind loop because this argument does not change in internal loop
-                            accounts_configuration[
-                                (
-                                    row["ContaContabil"]
-                                    == accounts_configuration["ContaContabil"]
-                                )
-                                | (
-                                    row["ContaContabil"]
-                                    == accounts_configuration[
-                                        "ContaContabilNormalizado"
-                                    ]
-                                )
-                            ],
-                            row["file"],
-                        ),
-                        axis=1,
-                    ),  # pyright: ignore
-                )
-            table_output.drop(columns=["ContaContabil"], inplace=True)
-            table_output.rename(
-                columns={
-                    "ContaContabilNormalizado": "ContaContabil",
-                },
-                inplace=True,
-            )
-
-        # we dont move from input when occur transformation yet
-        table_output.to_csv(
-            csv_page_path,
-            index=False,
-            quoting=csv.QUOTE_ALL,
+            analytical_units_renamed_list_url,
         )
+    if (
+        config_loader.accounts_configuration().empty
+        and config_loader.units_to_rename().empty
+    ):
+        return
+    table_output = transform_analytical_data(
+        pandas.read_csv(csv_page_path, dtype=str).fillna(""), config_loader
+    )
+    if table_output is None:
+        return
+    # we dont move from input when occur transformation yet
+    table_output.to_csv(
+        csv_page_path,
+        index=False,
+        quoting=csv.QUOTE_ALL,
+    )
@@ -1,5 +1,20 @@
+import datetime
+import io
+import uuid
+from collections.abc import Callable
+from typing import IO
+
+import pyarrow.parquet
 from google.cloud import bigquery
 
+from utils.arrow_table import ANALYTICAL_COLUMN_TYPES, csv_to_arrow
+from utils.constants import UploadFormat
+
+# clusterização da tabela analítica, usada pelo filtro por file do reprocess
+CLUSTERING_FIELDS = ["file", "PeriodoPrestacaoContas"]
+# tabelas de staging expiram sozinhas caso o reprocess seja interrompido
+STAGING_EXPIRATION = datetime.timedelta(days=1)
+
 
 def clear_data_analytical_from_file(
     client: bigquery.Client,
@@ -10,25 +25,118 @@ def clear_data_analytical_from_file(
     table_ref = f"{client.project}.{dataset_id}.{table_id}"
 
     query = f"""
-        delete from `{table_ref}` where file = '{file}'
+        delete from `{table_ref}` where file = @file
     """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("file", "STRING", file)
+        ]
+    )
 
-    query_job = client.query(query)  # API request
+    query_job = client.query(query, job_config=job_config)  # API request
 
     results = query_job.result()  # Waits for job to complete
 
     print(results)
 
 
+def cluster_analytical_table(
+    client: bigquery.Client,
+    dataset_id: str,
+    table_id: str,
+    clustering_fields: list[str] = CLUSTERING_FIELDS,
+):
+    """
+    Clusteriza a tabela por file e PeriodoPrestacaoContas, de forma que a
+    remoção das linhas de um arquivo leia apenas os blocos dele. Colunas
+    STRING não podem particionar a tabela, por isso a clusterização.
+    """
+    table = client.get_table(f"{client.project}.{dataset_id}.{table_id}")
+    if table.clustering_fields != clustering_fields:
+        table.clustering_fields = clustering_fields
+        client.update_table(table, ["clustering_fields"])
+        print(f"Table {table_id} clustered by {', '.join(clustering_fields)}")
+
+
+def create_staging_table(
+    client: bigquery.Client,
+    dataset_id: str,
+    table_id: str,
+) -> str:
+    """
+    Cria uma tabela de staging vazia com o schema da tabela de destino.
+
+    Returns:
+        str: ID da tabela de staging.
+    """
+    target = client.get_table(f"{client.project}.{dataset_id}.{table_id}")
+    staging_table_id = f"{table_id}_staging_{uuid.uuid4().hex[:12]}"
+    staging = bigquery.Table(
+        f"{client.project}.{dataset_id}.{staging_table_id}",
+        schema=target.schema,
+    )
+    staging.expires = datetime.datetime.now(datetime.UTC) + STAGING_EXPIRATION
+    client.create_table(staging)
+    return staging_table_id
+
+
+def replace_files_from_staging(
+    client: bigquery.Client,
+    dataset_id: str,
+    table_id: str,
+    staging_table_id: str,
+    files: list[str],
+):
+    """
+    Substitui, em um único MERGE atômico, as linhas dos arquivos
+    reprocessados pelas linhas carregadas na tabela de staging. Os nomes
+    dos arquivos são passados como parâmetro da consulta.
+
+    Args:
+        client (bigquery.Client): Cliente BigQuery autenticado.
+        dataset_id (str): ID do dataset de destino.
+        table_id (str): ID da tabela de destino.
+        staging_table_id (str): ID da tabela de staging, no mesmo dataset.
+        files (list[str]): Valores da coluna file a substituir.
+    """
+    table_ref = f"{client.project}.{dataset_id}.{table_id}"
+    staging_ref = f"{client.project}.{dataset_id}.{staging_table_id}"
+
+    query = f"""
+        merge `{table_ref}` as target
+        using `{staging_ref}` as staging
+        on false
+        when not matched by source and target.file in unnest(@files) then
+            delete
+        when not matched then
+            insert row
+    """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ArrayQueryParameter("files", "STRING", files)
+        ]
+    )
+
+    query_job = client.query(query, job_config=job_config)  # API request
+
+    query_job.result()  # Waits for job to complete
+
+    print(f"Replaced the rows of {len(files)} files in {table_id}")
+
+
 def upload_csv_to_bigquery(
-    client: bigquery.Client, csv_path: str, dataset_id: str, table_id: str
+    client: bigquery.Client,
+    csv_path: str | IO[bytes],
+    dataset_id: str,
+    table_id: str,
 ):
     """
     Faz upload de um arquivo CSV para uma tabela especificada em um dataset e projeto do BigQuery.
 
     Args:
         client (bigquery.Client): Cliente BigQuery autenticado.
-        csv_path (str): Caminho para o arquivo CSV a ser enviado.
+        csv_path (str | IO[bytes]): Caminho para o arquivo CSV a ser enviado,
+            ou o conteúdo do CSV já em memória.
         dataset_id (str): ID do dataset de destino.
         table_id (str): ID da tabela de destino.
     """
@@ -40,9 +148,155 @@ def upload_csv_to_bigquery(
         autodetect=False,  # Automatically detect schema
     )
 
-    with open(csv_path, "rb") as source_file:
+    if isinstance(csv_path, str):
+        with open(csv_path, "rb") as source_file:
+            job = client.load_table_from_file(
+                source_file, table_ref, job_config=job_config
+            )
+    else:
         job = client.load_table_from_file(
-            source_file, table_ref, job_config=job_config
+            csv_path, table_ref, job_config=job_config
         )
 
     job.result()  # Waits for the job to complete
+
+
+def analytical_schema(columns: list[str]) -> list[bigquery.SchemaField]:
+    """
+    Schema declarado das colunas da tabela analítica.
+    """
+    return [
+        bigquery.SchemaField(
+            column, ANALYTICAL_COLUMN_TYPES.get(column, "STRING")
+        )
+        for column in columns
+    ]
+
+
+def upload_parquet_to_bigquery(
+    client: bigquery.Client,
+    csv_path: str | IO[bytes],
+    dataset_id: str,
+    table_id: str,
+):
+    """
+    Faz upload do CSV final para o BigQuery convertido em Parquet, com o
+    schema declarado em ANALYTICAL_COLUMN_TYPES, evitando que o BigQuery
+    interprete o texto.
+
+    Args:
+        client (bigquery.Client): Cliente BigQuery autenticado.
+        csv_path (str | IO[bytes]): Caminho para o arquivo CSV a ser enviado,
+            ou o conteúdo do CSV já em memória.
+        dataset_id (str): ID do dataset de destino.
+        table_id (str): ID da tabela de destino.
+    """
+    table_ref = f"{client.project}.{dataset_id}.{table_id}"
+    table = csv_to_arrow(csv_path)
+    parquet = io.BytesIO()
+    pyarrow.parquet.write_table(table, parquet, compression="snappy")
+    parquet.seek(0)
+
+    job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.PARQUET,
+        schema=analytical_schema(table.column_names),
+    )
+    job = client.load_table_from_file(
+        parquet, table_ref, job_config=job_config
+    )
+    job.result()  # Waits for the job to complete
+
+
+def upload_function(upload_format: UploadFormat) -> Callable:
+    """
+    Função de upload do CSV final no formato escolhido.
+    """
+    if upload_format == UploadFormat.parquet:
+        return upload_parquet_to_bigquery
+    return upload_csv_to_bigquery
+
+
+DEFAULT_BATCH_BYTES = 64 * 1024 * 1024
+
+
+class CsvBatchLoader:
+    """
+    Acumula os CSVs das páginas e os envia ao BigQuery em um único job de
+    carga por lote, em vez de um job por página. Cada linha mantém a coluna
+    file, que identifica a página de origem.
+
+    Args:
+        client (bigquery.Client): Cliente BigQuery autenticado.
+        dataset_id (str): ID do dataset de destino.
+        table_id (str): ID da tabela de destino.
+        max_batch_bytes (int): Tamanho a partir do qual o lote é enviado.
+        upload_format (UploadFormat): Formato enviado ao BigQuery.
+    """
+
+    def __init__(
+        self,
+        client: bigquery.Client,
+        dataset_id: str,
+        table_id: str,
+        max_batch_bytes: int = DEFAULT_BATCH_BYTES,
+        upload_format: UploadFormat = UploadFormat.csv,
+    ):
+        self.client = client
+        self.dataset_id = dataset_id
+        self.table_id = table_id
+        self.max_batch_bytes = max_batch_bytes
+        self.upload_format = upload_format
+        self.jobs = 0
+        self._header: bytes | None = None
+        self._rows: list[bytes] = []
+        self._size = 0
+        self._on_loaded: list[Callable[[], object]] = []
+
+    def add(
+        self, data: bytes, on_loaded: Callable[[], object] | None = None
+    ) -> None:
+        """
+        Adiciona o CSV de uma página ao lote; on_loaded é chamado depois que
+        o job que contém a página termina.
+        """
+        header, _, rows = data.partition(b"\n")
+        if rows and not rows.endswith(b"\n"):
+            rows += b"\n"
+        # a carga é posicional: páginas com outras colunas vão em outro lote
+        if self._header is not None and (
+            header != self._header
+            or self._size + len(rows) > self.max_batch_bytes
+        ):
+            self.flush()
+        if self._header is None:
+            self._header = header
+            self._size = len(header) + 1
+        self._rows.append(rows)
+        self._size += len(rows)
+        if on_loaded is not None:
+            self._on_loaded.append(on_loaded)
+        if self._size >= self.max_batch_bytes:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Envia as páginas acumuladas em um único job de carga.
+        """
+        if self._header is None:
+            return
+        print(
+            f"Uploading {len(self._rows)} pages "
+            f"({self._size / 1024 / 1024:.2f} MB) to BigQuery..."
+        )
+        upload_function(self.upload_format)(
+            self.client,
+            io.BytesIO(b"\n".join([self._header, b"".join(self._rows)])),
+            self.dataset_id,
+            self.table_id,
+        )
+        self.jobs += 1
+        print("Uploaded to BigQuery.")
+        on_loaded = self._on_loaded
+        self._header, self._rows, self._size, self._on_loaded = None, [], 0, []
+        for callback in on_loaded:
+            callback()
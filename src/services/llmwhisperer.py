@@ -1,12 +1,156 @@
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import cache
+
+import requests
+from requests.adapters import HTTPAdapter
 from unstract.llmwhisperer import LLMWhispererClientV2
+from unstract.llmwhisperer import client_v2 as llmwhisperer_client_module
 from unstract.llmwhisperer.client_v2 import LLMWhispererClientException
 
+from utils.constants import MethodType
+from utils.ocr_cache import OcrCache
+
+# extraction options used for every page of the analytical report
+WHISPER_OPTIONS = {"mode": "table", "lang": "por"}
+
+
+# session of the PooledLLMWhispererClient making the current request
+_client_session: ContextVar[requests.Session | None] = ContextVar(
+    "llmwhisperer_session", default=None
+)
+
+
+class _PooledRequests:
+    """
+    Stands in for the requests module inside the LLMWhisperer client, which
+    opens a new requests.Session (and a new TLS connection) on every call:
+    here Session() is the session of the PooledLLMWhispererClient making the
+    request, or a new one for any other client, as before.
+    """
+
+    def Session(self) -> requests.Session:  # mirrors requests.Session
+        session = _client_session.get()
+        return requests.Session() if session is None else session
+
+    def __getattr__(self, name: str):
+        return getattr(requests, name)
+
 
-def process_pdf_file(input_path: str, output_path: str) -> str:
+def install_pooled_requests() -> None:
+    """
+    Points the client library to _PooledRequests, once per process. The
+    stand-in holds no configuration, so installing it again changes nothing
+    for the clients already created.
+    """
+    if not isinstance(llmwhisperer_client_module.requests, _PooledRequests):
+        llmwhisperer_client_module.requests = _PooledRequests()
+
+
+class PooledLLMWhispererClient(LLMWhispererClientV2):
+    """
+    LLMWhispererClientV2 sending every request through its own session, so
+    HTTP connections are reused across calls.
+    """
+
+    def __init__(self, session: requests.Session, **kwargs):
+        super().__init__(**kwargs)
+        self.session = session
+        install_pooled_requests()
+
+    @contextmanager
+    def _using_session(self) -> Iterator[None]:
+        token = _client_session.set(self.session)
+        try:
+            yield
+        finally:
+            _client_session.reset(token)
+
+    def get_usage_info(self):
+        with self._using_session():
+            return super().get_usage_info()
+
+    def whisper(self, *args, **kwargs):
+        with self._using_session():
+            return super().whisper(*args, **kwargs)
+
+    def whisper_status(self, whisper_hash: str):
+        with self._using_session():
+            return super().whisper_status(whisper_hash)
+
+    def whisper_retrieve(self, whisper_hash: str, encoding: str = "utf-8"):
+        with self._using_session():
+            return super().whisper_retrieve(whisper_hash, encoding)
+
+
+class _PooledAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that, without keep_alive, asks the server to close the
+    connection of every request. The client sends prepared requests with
+    Session.send, which does not merge the session headers, so the header
+    is set here, on each request.
+    """
+
+    def __init__(self, pool_size: int, keep_alive: bool):
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.keep_alive = keep_alive
+
+    def send(self, request, *args, **kwargs):
+        if not self.keep_alive:
+            request.headers["Connection"] = "close"
+        return super().send(request, *args, **kwargs)
+
+
+def create_pooled_session(
+    pool_size: int = 10, keep_alive: bool = True
+) -> requests.Session:
+    """
+    Creates a requests.Session keeping up to pool_size connections per host.
+    With keep_alive False every request asks the server to close the connection.
+    """
+    session = requests.Session()
+    adapter = _PooledAdapter(pool_size, keep_alive)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@cache
+def get_client(
+    pool_size: int = 10, keep_alive: bool = True
+) -> LLMWhispererClientV2:
+    """
+    Returns the process-wide LLMWhispererClientV2 for this configuration,
+    created on the first call, so configuration is read once and HTTP
+    connections are reused across pages.
+
+    Each configuration gets a client with its own pooled session: calling
+    this with another pool_size or keep_alive leaves the clients already
+    created untouched.
+
+    Args:
+        pool_size (int): Maximum connections kept open to the LLMWhisperer host.
+        keep_alive (bool): Whether connections are kept open between requests.
+    """
+    return PooledLLMWhispererClient(
+        create_pooled_session(pool_size, keep_alive)
+    )
+
+
+def process_pdf_file(
+    input_path: str,
+    output_path: str,
+    client: LLMWhispererClientV2 | None = None,
+    cache: OcrCache | None = None,
+) -> str:
     """
     Process a file using the LLMWhispererClientV2.
     Args:
         path (str): The path to the file to be processed.
+        client (LLMWhispererClientV2 | None): Client to use, defaults to the process-wide one.
+        cache (OcrCache | None): OCR result cache consulted before calling the API.
     Returns:
         str: The response from the LLMWhispererClientV2.
     """
@@ -38,18 +182,201 @@ def process_pdf_file(input_path: str, output_path: str) -> str:
     # os.environ["LLMWHISPERER_API_BACKOFF_RETRY_ON_CONNECTION_TIMEOUT"] = dotenv_values().get("LLMWHISPERER_API_BACKOFF_RETRY_ON_CONNECTION_TIMEOUT", "True")
     # os.environ["LLMWHISPERER_API_BACKOFF_RETRY_ON_CONNECTION_REFUSED"] = dotenv_values().get("LLMWHISPERER_API_BACKOFF_RETRY_ON_CONNECTION_REFUSED", "True")
 
-    client = LLMWhispererClientV2()
+    if read_cached_text(cache, input_path, output_path):
+        return output_path
+    client = client or get_client()
     try:
         result = client.whisper(
             file_path=input_path,
-            mode="table",
-            lang="por",
+            **WHISPER_OPTIONS,
             wait_for_completion=True,
             wait_timeout=200,
         )
-        with open(output_path, "w") as out_file:
-            out_file.write(result["extraction"]["result_text"])
-        return output_path
+        return write_result_text(result, output_path, cache, input_path)
     except LLMWhispererClientException as e:
         print(e)
         return ""
+
+
+def read_cached_text(
+    cache: OcrCache | None, input_path: str, output_path: str
+) -> bool:
+    """
+    Writes the cached extraction of input_path to output_path.
+    Returns:
+        bool: Whether the cache had the extraction.
+    """
+    if cache is None:
+        return False
+    cached = cache.get(input_path, MethodType.llmwhisperer, WHISPER_OPTIONS)
+    if cached is None:
+        return False
+    print(f"Using cached extraction for {input_path}")
+    with open(output_path, "wb") as out_file:
+        out_file.write(cached)
+    return True
+
+
+def write_result_text(
+    result: dict,
+    output_path: str,
+    cache: OcrCache | None = None,
+    input_path: str = "",
+) -> str:
+    """
+    Writes the extracted text of a whisper/whisper_retrieve response to output_path,
+    storing it in the cache when one is given.
+    """
+    text = result["extraction"]["result_text"]
+    with open(output_path, "w") as out_file:
+        out_file.write(text)
+    if cache is not None:
+        cache.put(
+            input_path,
+            MethodType.llmwhisperer,
+            WHISPER_OPTIONS,
+            text.encode(),
+        )
+    return output_path
+
+
+def submit_pdf_file(client: LLMWhispererClientV2, input_path: str) -> str:
+    """
+    Submits a file without waiting for the extraction.
+    Returns:
+        str: The whisper hash used to poll the extraction, or "" if the submission failed.
+    """
+    try:
+        result = client.whisper(
+            file_path=input_path,
+            **WHISPER_OPTIONS,
+            wait_for_completion=False,
+        )
+        return result.get("whisper_hash", "")
+    except LLMWhispererClientException as e:
+        print(e)
+        return ""
+
+
+def poll_pdf_file(
+    client: LLMWhispererClientV2,
+    whisper_hash: str,
+    output_path: str,
+    cache: OcrCache | None = None,
+    input_path: str = "",
+) -> str | None:
+    """
+    Checks a submitted extraction, retrieving its text when it is finished.
+    Returns:
+        str | None: None while the extraction is running, output_path once the text
+        is written, or "" if the extraction failed.
+    """
+    try:
+        status = client.whisper_status(whisper_hash=whisper_hash)
+        if status["status"] in ("accepted", "processing"):
+            return None
+        if status["status"] != "processed":
+            print(
+                f"Whisper-hash:{whisper_hash} failed with {status.get('message', status['status'])}"
+            )
+            return ""
+        return write_result_text(
+            client.whisper_retrieve(whisper_hash=whisper_hash),
+            output_path,
+            cache,
+            input_path,
+        )
+    except LLMWhispererClientException as e:
+        print(e)
+        return ""
+
+
+def process_pdf_files(
+    jobs: Iterable[tuple[str, str]],
+    max_in_flight: int = 8,
+    poll_interval: float = 5.0,
+    wait_timeout: float = 200,
+    client: LLMWhispererClientV2 | None = None,
+    cache: OcrCache | None = None,
+) -> Iterator[str]:
+    """
+    Processes many files concurrently: files are submitted without waiting,
+    keeping at most max_in_flight extractions running, and are polled until
+    their text can be retrieved, so a run takes about as long as its slowest
+    pages instead of the sum of all of them.
+
+    Args:
+        jobs (Iterable[tuple[str, str]]): Pairs of (input path, output path), consumed lazily.
+        max_in_flight (int): Maximum number of jobs read and not yielded yet, cached ones included.
+        poll_interval (float): Seconds to wait between polling rounds without progress.
+        wait_timeout (float): Seconds an extraction may run before it is given up.
+        client (LLMWhispererClientV2 | None): Client used for every request.
+        cache (OcrCache | None): OCR result cache, pages found in it are not submitted.
+    Yields:
+        str: The output path of each job (or "" when it failed), in the order of the jobs.
+    """
+    client = client or get_client()
+    pending = enumerate(jobs)
+    # sequence -> (whisper hash, input path, output path, submission time)
+    in_flight: dict[int, tuple[str, str, str, float]] = {}
+    finished: dict[int, str] = {}
+    next_sequence = 0
+    exhausted = False
+
+    while True:
+        # cached and failed pages waiting for their turn count as well, so
+        # memory stays bounded and a cached run streams
+        while not exhausted and len(in_flight) + len(finished) < max(
+            1, max_in_flight
+        ):
+            job = next(pending, None)
+            if job is None:
+                exhausted = True
+                break
+            sequence, (input_path, output_path) = job
+            if read_cached_text(cache, input_path, output_path):
+                finished[sequence] = output_path
+                continue
+            print(f"Submitting {input_path} to LLMWhisperer...")
+            whisper_hash = submit_pdf_file(client, input_path)
+            if whisper_hash:
+                in_flight[sequence] = (
+                    whisper_hash,
+                    input_path,
+                    output_path,
+                    time.monotonic(),
+                )
+            else:
+                finished[sequence] = ""
+
+        while next_sequence in finished:
+            yield finished.pop(next_sequence)
+            next_sequence += 1
+
+        if not in_flight:
+            if exhausted:
+                return
+            continue
+
+        progress = False
+        for sequence, (
+            whisper_hash,
+            input_path,
+            output_path,
+            submitted_at,
+        ) in list(in_flight.items()):
+            result = poll_pdf_file(
+                client, whisper_hash, output_path, cache, input_path
+            )
+            if (
+                result is None
+                and time.monotonic() - submitted_at > wait_timeout
+            ):
+                print(f"Whisper-hash:{whisper_hash} timed out")
+                result = ""
+            if result is not None:
+                del in_flight[sequence]
+                finished[sequence] = result
+                progress = True
+        if not progress:
+            time.sleep(poll_interval)
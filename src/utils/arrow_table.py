@@ -0,0 +1,105 @@
+"""
+Typed Arrow form of the final csv of the analytical pages, shared by the
+BigQuery Parquet upload and the Parquet output of the merger.
+"""
+
+from typing import IO
+
+import pandas
+import pyarrow
+import pyarrow.compute
+
+# types of the columns of the analytical table; the others are STRING
+ANALYTICAL_COLUMN_TYPES = {
+    "Data": "DATE",
+    "Valor": "FLOAT64",
+    "CompoeTaxa": "BOOL",
+    "AcordadoAssembleia": "BOOL",
+}
+
+ARROW_TYPES = {
+    "DATE": pyarrow.date32(),
+    "FLOAT64": pyarrow.float64(),
+    "BOOL": pyarrow.bool_(),
+    "STRING": pyarrow.dictionary(pyarrow.int32(), pyarrow.string()),
+}
+
+
+def arrow_schema(columns: list[str]) -> pyarrow.Schema:
+    """
+    Arrow schema of the columns, as produced by csv_to_arrow.
+    """
+    return pyarrow.schema(
+        [
+            (
+                column,
+                ARROW_TYPES[ANALYTICAL_COLUMN_TYPES.get(column, "STRING")],
+            )
+            for column in columns
+        ]
+    )
+
+
+def check_parsed(
+    column: str, values: pandas.Series, parsed: pandas.Series
+) -> None:
+    """
+    Raises ValueError naming the non-empty cells of the column that did not
+    parse (the first ones, by line of the csv).
+    """
+    invalid = parsed.isna() & (values != "")
+    if invalid.any():
+        cells = ", ".join(
+            f"line {index + 2}: {value!r}"
+            for index, value in values[invalid].head(5).items()
+        )
+        raise ValueError(
+            f"Invalid {ANALYTICAL_COLUMN_TYPES[column]} values in column "
+            f"{column}: {cells}"
+        )
+
+
+def csv_to_arrow(csv_path: str | IO[bytes]) -> pyarrow.Table:
+    """
+    Converts the final csv of one or more pages into a typed Arrow table:
+    Data as a date, Valor as a number, the flags as booleans and the other
+    texts as categorical (dictionary) strings. Empty cells are nulls, as in
+    the csv load of BigQuery, and a non-empty cell that does not parse
+    raises ValueError, as the csv load would reject its row.
+    """
+    text = pandas.read_csv(csv_path, dtype=str, keep_default_na=False)
+    arrays = []
+    for column in text.columns:
+        values = text[column]
+        match ANALYTICAL_COLUMN_TYPES.get(column, "STRING"):
+            case "DATE":
+                dates = pandas.to_datetime(
+                    values, format="%Y-%m-%d", errors="coerce"
+                )
+                check_parsed(column, values, dates)
+                array = pyarrow.compute.cast(
+                    pyarrow.array(
+                        dates,
+                        type=pyarrow.timestamp("ns"),
+                        from_pandas=True,
+                    ),
+                    pyarrow.date32(),
+                )
+            case "FLOAT64":
+                numbers = pandas.to_numeric(values, errors="coerce")
+                check_parsed(column, values, numbers)
+                array = pyarrow.array(
+                    numbers, type=pyarrow.float64(), from_pandas=True
+                )
+            case "BOOL":
+                flags = values.str.lower().map({"true": True, "false": False})
+                check_parsed(column, values, flags)
+                array = pyarrow.array(
+                    flags, type=pyarrow.bool_(), from_pandas=True
+                )
+            case _:
+                array = pyarrow.array(
+                    values.mask(values == "", None), type=pyarrow.string()
+                ).dictionary_encode()
+        arrays.append(array)
+    return pyarrow.Table.from_arrays(arrays, names=list(text.columns))
@@ -0,0 +1,127 @@
+"""
+Locates a chapter of the monthly report, so the operator does not need to
+read the index to find --start/--end.
+
+The outline (bookmarks) of the PDF is used when it has the chapter; otherwise
+the text layer of the top of every page is scanned for the running header of
+the chapter. Both are read with pypdfium2, without rendering the pages. The
+range found is cached per document hash.
+"""
+
+import json
+import os
+import unicodedata
+
+import pypdfium2 as pdfium
+
+from utils.ocr_cache import hash_file
+
+ANALYTICAL_CHAPTER = "Demonstrativo Analítico de Receitas e Despesas"
+# fraction of the page height, from the top, holding the running header
+HEADER_HEIGHT = 0.15
+
+
+def normalize(text: str) -> str:
+    """
+    Case and accent insensitive form of the text, with collapsed spaces.
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    return " ".join(
+        "".join(c for c in decomposed if not unicodedata.combining(c))
+        .casefold()
+        .split()
+    )
+
+
+def find_in_outline(
+    pdf: pdfium.PdfDocument, chapter: str
+) -> tuple[int, int] | None:
+    """
+    Returns the first and last page (1-based) of the outline item titled
+    chapter, ending before the next item of the same or upper level.
+    """
+    items = [item for item in pdf.get_toc() if item.page_index is not None]
+    for position, item in enumerate(items):
+        if normalize(chapter) not in normalize(item.title):
+            continue
+        last_index = len(pdf) - 1
+        for following in items[position + 1 :]:
+            if (
+                following.level <= item.level
+                and following.page_index > item.page_index
+            ):
+                last_index = following.page_index - 1
+                break
+        return item.page_index + 1, last_index + 1
+    return None
+
+
+def find_in_headers(
+    pdf: pdfium.PdfDocument, chapter: str
+) -> tuple[int, int] | None:
+    """
+    Returns the first and last page (1-based) of the longest run of
+    consecutive pages whose header carries the chapter title. The longest
+    run skips pages citing the title elsewhere, e.g. the index.
+    """
+    wanted = normalize(chapter)
+    best: tuple[int, int] | None = None
+    run_start: int | None = None
+    for index in range(len(pdf) + 1):
+        found = False
+        if index < len(pdf):
+            page = pdf[index]
+            height = page.get_height()
+            header = page.get_textpage().get_text_bounded(
+                bottom=height * (1 - HEADER_HEIGHT), top=height
+            )
+            found = wanted in normalize(header)
+        if found and run_start is None:
+            run_start = index
+        elif not found and run_start is not None:
+            if best is None or index - run_start > best[1] - best[0] + 1:
+                best = (run_start + 1, index)
+            run_start = None
+    return best
+
+
+def find_chapter_range(
+    input_pdf_path: str, chapter: str = ANALYTICAL_CHAPTER
+) -> tuple[int, int] | None:
+    """
+    Finds the pages of a chapter of the PDF.
+    Returns:
+        tuple[int, int] | None: First and last page (1-based), or None when
+            the chapter was not found.
+    """
+    pdf = pdfium.PdfDocument(input_pdf_path)
+    try:
+        return find_in_outline(pdf, chapter) or find_in_headers(pdf, chapter)
+    finally:
+        pdf.close()
+
+
+def cached_chapter_range(
+    input_pdf_path: str,
+    cache_dir: str,
+    chapter: str = ANALYTICAL_CHAPTER,
+) -> tuple[int, int] | None:
+    """
+    Same as find_chapter_range, storing the chapter map of each document in
+    cache_dir under its content hash, so later runs skip the scan.
+    """
+    cache_path = os.path.join(cache_dir, f"{hash_file(input_pdf_path)}.json")
+    chapters: dict = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, encoding="utf-8") as f:
+            chapters = json.load(f)
+        if chapter in chapters:
+            found = chapters[chapter]
+            return tuple(found) if found is not None else None
+
+    found = find_chapter_range(input_pdf_path, chapter)
+    chapters[chapter] = list(found) if found is not None else None
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(chapters, f, ensure_ascii=False)
+    return found
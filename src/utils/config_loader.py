@@ -0,0 +1,175 @@
+"""
+Loads the Google Sheets used by the transformation (account plan and unit
+rename list) once per run.
+
+Each sheet is downloaded at most once per loader and kept in an on-disk
+snapshot with the time it was fetched and the sha256 of its content. A
+snapshot younger than the TTL is used without touching the network, an
+older one is refreshed, and it is the fallback when the download fails.
+In offline mode only the snapshots are used.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.request
+from collections.abc import Callable
+from io import BytesIO
+
+import pandas
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+ACCOUNTS_CONFIGURATION_DTYPE = {
+    "ContaContabil": str,
+    "ContaContabilGrupo": str,
+    "ContaContabilNormalizado": str,
+}
+
+
+def download(url: str) -> bytes:
+    """
+    Returns the content of the url, or of the file when url is a local path.
+    """
+    if os.path.exists(url):
+        with open(url, "rb") as f:
+            return f.read()
+    with urllib.request.urlopen(url, timeout=60) as response:
+        return response.read()
+
+
+class ConfigLoader:
+    """
+    Configuration sheets of a run, safe to share between its threads.
+
+    Args:
+        accounts_url (str): Account plan sheet, "" when not configured.
+        units_url (str): Unit rename list sheet, "" when not configured.
+        snapshot_dir (str | None): Where the snapshots are stored, None to
+            keep the sheets only in memory.
+        ttl_seconds (float): Age above which a snapshot is fetched again.
+        offline (bool): Use only the snapshots, never the network.
+    """
+
+    def __init__(
+        self,
+        accounts_url: str,
+        units_url: str,
+        snapshot_dir: str | None = None,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        offline: bool = False,
+    ):
+        self.accounts_url = accounts_url
+        self.units_url = units_url
+        self.snapshot_dir = snapshot_dir
+        self.ttl_seconds = ttl_seconds
+        self.offline = offline
+        self._frames: dict[str, pandas.DataFrame] = {}
+        self._derived: dict[str, object] = {}
+        self._lock = threading.RLock()
+
+    def accounts_configuration(self) -> pandas.DataFrame:
+        """
+        Returns the account plan, empty when no url is configured.
+        """
+        return self._load(
+            self.accounts_url, dtype=ACCOUNTS_CONFIGURATION_DTYPE
+        )
+
+    def units_to_rename(self) -> pandas.DataFrame:
+        """
+        Returns the unit rename list, empty when no url is configured.
+        """
+        return self._load(self.units_url)
+
+    def derived(self, name: str, build: Callable[["ConfigLoader"], object]):
+        """
+        Returns build(self), computed once per loader, for lookup structures
+        built from the sheets (e.g. indexes of the transformation).
+        """
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = build(self)
+            return self._derived[name]
+
+    def _load(self, url: str, **read_csv_kwargs) -> pandas.DataFrame:
+        if not url:
+            return pandas.DataFrame()
+        with self._lock:
+            if url not in self._frames:
+                self._frames[url] = pandas.read_csv(
+                    BytesIO(self.fetch(url)), **read_csv_kwargs
+                )
+            return self._frames[url]
+
+    def _snapshot_paths(self, url: str) -> tuple[str, str]:
+        name = hashlib.sha256(url.encode()).hexdigest()
+        base = os.path.join(self.snapshot_dir or "", name)
+        return f"{base}.csv", f"{base}.json"
+
+    def _read_snapshot(self, url: str) -> tuple[bytes, dict] | None:
+        if self.snapshot_dir is None:
+            return None
+        data_path, meta_path = self._snapshot_paths(url)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(data_path, "rb") as f:
+                data = f.read()
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if hashlib.sha256(data).hexdigest() != meta.get("sha256"):
+            print(f"Snapshot of {url} is corrupted, ignoring it")
+            return None
+        return data, meta
+
+    def _write_snapshot(self, url: str, data: bytes) -> None:
+        if self.snapshot_dir is None:
+            return
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        data_path, meta_path = self._snapshot_paths(url)
+        with open(data_path, "wb") as f:
+            f.write(data)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "url": url,
+                    "fetched_at": time.time(),
+                    "sha256": hashlib.sha256(data).hexdigest(),
+                },
+                f,
+            )
+
+    def fetch(self, url: str) -> bytes:
+        """
+        Returns the content of the sheet, from a fresh snapshot when there is
+        one, otherwise downloaded and stored as the new snapshot.
+        """
+        snapshot = self._read_snapshot(url)
+        if snapshot is not None:
+            data, meta = snapshot
+            if (
+                self.offline
+                or time.time() - meta["fetched_at"] < self.ttl_seconds
+            ):
+                return data
+        if self.offline:
+            raise FileNotFoundError(
+                f"No snapshot of {url} in {self.snapshot_dir}, "
+                "run once without offline mode"
+            )
+        try:
+            data = download(url)
+        except OSError as error:
+            if snapshot is None:
+                raise
+            print(f"Could not fetch {url} ({error}), using the snapshot")
+            return snapshot[0]
+        if snapshot is not None and (
+            hashlib.sha256(data).hexdigest() != snapshot[1]["sha256"]
+        ):
+            print(f"Configuration {url} changed since the last snapshot")
+        self._write_snapshot(url, data)
+        return data
@@ -29,3 +29,13 @@ COLUMNS_ANALYTICAL = Series(
 class MethodType(str, Enum):
     llmwhisperer = "llmwhisperer"
     docling = "docling"
+
+
+class UploadFormat(str, Enum):
+    csv = "csv"
+    parquet = "parquet"
+
+
+class MergeFormat(str, Enum):
+    csv = "csv"
+    parquet = "parquet"
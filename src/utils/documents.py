@@ -0,0 +1,70 @@
+"""
+Documents of a batch run: the PDFs found in a directory or glob, and the
+manifest of the pages to process in each one.
+
+The manifest is a JSON object keyed by the file name of the PDF, holding the
+start and end of its pages, as in --start/--end, or "auto" to detect the
+analytical chapter:
+
+    {
+        "2023-12.pdf": {"start": 12, "end": 80},
+        "2024-01.pdf": {"start": 10},
+        "2024-02.pdf": "auto"
+    }
+"""
+
+import glob
+import json
+import os
+
+# page range of a document, None to detect the chapter
+PageRange = tuple[int, int | None] | None
+
+
+def find_documents(location: str) -> list[str]:
+    """
+    Returns the PDFs in the directory, or matching the glob, sorted by path.
+    """
+    if os.path.isdir(location):
+        candidates = [
+            os.path.join(location, name) for name in os.listdir(location)
+        ]
+    else:
+        candidates = glob.glob(location, recursive=True)
+    paths = [
+        path
+        for path in candidates
+        if os.path.isfile(path) and path.lower().endswith(".pdf")
+    ]
+    if not paths:
+        raise ValueError(f"No PDF found in {location}")
+    return sorted(paths)
+
+
+def parse_range(name: str, entry: object) -> PageRange:
+    if entry == "auto":
+        return None
+    if not isinstance(entry, dict) or set(entry) - {"start", "end"}:
+        raise ValueError(
+            f"Invalid range of {name}: expected start/end or 'auto'"
+        )
+    start = entry.get("start", 1)
+    end = entry.get("end")
+    if not isinstance(start, int) or not (end is None or isinstance(end, int)):
+        raise ValueError(f"Invalid range of {name}: pages must be integers")
+    if end is not None and end < start:
+        raise ValueError(f"Invalid range of {name}: end before start")
+    return start, end
+
+
+def load_ranges(manifest_path: str) -> dict[str, PageRange]:
+    """
+    Reads the manifest of the page ranges, by file name.
+    """
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if not isinstance(manifest, dict):
+        raise ValueError(
+            f"{manifest_path} must map the file names to their ranges"
+        )
+    return {name: parse_range(name, entry) for name, entry in manifest.items()}
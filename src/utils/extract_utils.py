@@ -1,11 +1,18 @@
 import re
 from datetime import datetime
+from functools import lru_cache
+
+import pandas as pd
 
 pattern_data = re.compile(
     r"^(?:(?:31(\/|-|\.)(?:0?[13578]|1[02]))\1|(?:(?:29|30)(\/|-|\.)(?:0?[13-9]|1[0-2])\2))(?:(?:1[6-9]|[2-9]\d)?\d{2})$|^(?:29(\/|-|\.)0?2\3(?:(?:(?:1[6-9]|[2-9]\d)?(?:0[48]|[2468][048]|[13579][26])|(?:(?:16|[2468][048]|[3579][26])00))))$|^(?:0?[1-9]|1\d|2[0-8])(\/|-|\.)(?:(?:0?[1-9])|(?:1[0-2]))\4(?:(?:1[6-9]|[2-9]\d)?\d{2})$"
 )
 
+# exact "dd/mm/yyyy" shape, the calendar check is left to pandas
+pattern_data_strict = re.compile(r"\d{2}/\d{2}/\d{4}")
+
 
+@lru_cache(maxsize=65536)
 def validate(date_text):
     """
     Validates if the date_text is in the format "dd/mm/yyyy".
@@ -23,6 +30,33 @@ def validate(date_text):
         return False
 
 
+def validate_series(series: pd.Series) -> pd.Series:
+    """
+    Vectorized validate: checks every cell of the series at once, ignoring
+    surrounding spaces. Cells that are not strings are invalid.
+    Returns a boolean Series aligned with series.
+    """
+    try:
+        series = series.str.strip()
+        strict = (
+            series.str.fullmatch(pattern_data_strict, na=False)
+            .fillna(False)
+            .astype(bool)
+        )
+    except AttributeError:  # no strings in the series
+        return pd.Series(False, index=series.index, dtype=bool)
+    parsed = pd.to_datetime(
+        series.where(strict), format="%d/%m/%Y", errors="coerce"
+    )
+    valid = strict & parsed.notna()
+    # impossible dates and years out of the pandas range (before 1677 or
+    # after 2262) go through the scalar check
+    fallback = strict & ~valid
+    if fallback.any():
+        valid[fallback] = series[fallback].map(validate).to_numpy(bool)
+    return valid
+
+
 def extract_group_from_contacontabilcompleto(
     pattern: re.Pattern, conta_contabil_completo: str, group: int
 ) -> str | None:
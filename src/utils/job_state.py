@@ -0,0 +1,298 @@
+"""
+Persistent state of the pages of the analytical runs.
+
+Every page goes through the stages split -> ocr -> parsed -> uploaded. The
+stage reached, the current path and hash of its artifacts, the time spent on
+each stage and the last error are stored in SQLite, keyed by the resolved
+path of the document and the file name of the page, so resuming a run
+checks a page with a single lookup instead of probing output_dir and
+processed_dir, and a run can be summarized without looking at the files.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+STAGES = ["split", "ocr", "parsed", "uploaded"]
+# columns of a page that record() may set, besides its stage
+PAGE_FIELDS = {
+    "pdf_path",
+    "txt_path",
+    "csv_path",
+    "pdf_sha256",
+    "csv_sha256",
+    "ocr_seconds",
+    "parse_seconds",
+    "upload_seconds",
+}
+
+
+def resolve_document(document: str) -> str:
+    """
+    Key of a document: its resolved path, so the same file reached by
+    different paths is one document and same-named files are not.
+    """
+    return os.path.realpath(document)
+
+
+class JobState:
+    """
+    SQLite store of the state of the runs and their pages, safe to share
+    between the threads of a run.
+
+    Args:
+        db_path (str): The database file, created with its directory when
+            missing.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # a single connection for the threads of the run, used under _lock
+        self._connection = sqlite3.connect(
+            db_path, timeout=30, check_same_thread=False
+        )
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("pragma journal_mode = wal")
+        self._connection.executescript(
+            """
+            create table if not exists runs (
+                id integer primary key autoincrement,
+                document text not null,
+                started_at real not null,
+                finished_at real,
+                status text not null,
+                error text
+            );
+            create table if not exists pages (
+                document text not null,
+                page text not null,
+                run_id integer not null references runs (id),
+                stage text not null,
+                pdf_path text,
+                txt_path text,
+                csv_path text,
+                pdf_sha256 text,
+                csv_sha256 text,
+                ocr_seconds real,
+                parse_seconds real,
+                upload_seconds real,
+                error text,
+                updated_at real not null,
+                primary key (document, page)
+            );
+            """
+        )
+
+    def start_run(self, document: str) -> "RunState":
+        """
+        Registers a run of the document and returns its state.
+        """
+        document = resolve_document(document)
+        with self._lock:
+            connection = self._connection
+            cursor = connection.execute(
+                """
+                insert into runs (document, started_at, status)
+                values (?, ?, 'running')
+                """,
+                (document, time.time()),
+            )
+            connection.commit()
+            return RunState(self, cursor.lastrowid or 0, document)
+
+    def finish_run(self, run_id: int, error: str | None = None) -> None:
+        with self._lock:
+            connection = self._connection
+            connection.execute(
+                """
+                update runs set finished_at = ?, status = ?, error = ?
+                where id = ?
+                """,
+                (time.time(), "failed" if error else "done", error, run_id),
+            )
+            connection.commit()
+
+    def record(
+        self, document: str, page_path: str, stage: str, run_id: int, **fields
+    ) -> None:
+        """
+        Moves the page of the document to stage, updating the given fields
+        (see PAGE_FIELDS) and clearing its error.
+        """
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage {stage}")
+        unknown = set(fields) - PAGE_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown page fields {sorted(unknown)}")
+        columns = [
+            "document",
+            "page",
+            "run_id",
+            "stage",
+            "error",
+            "updated_at",
+            *fields,
+        ]
+        values = [
+            resolve_document(document),
+            os.path.basename(page_path),
+            run_id,
+            stage,
+            None,
+            time.time(),
+            *fields.values(),
+        ]
+        updates = ", ".join(
+            f"{column} = excluded.{column}" for column in columns[2:]
+        )
+        with self._lock:
+            connection = self._connection
+            connection.execute(
+                f"""
+                insert into pages ({", ".join(columns)})
+                values ({", ".join("?" * len(columns))})
+                on conflict (document, page) do update set {updates}
+                """,
+                values,
+            )
+            connection.commit()
+
+    def fail(
+        self, document: str, page_path: str, run_id: int, error: str
+    ) -> None:
+        """
+        Records the error of the page, keeping the last stage it reached.
+        """
+        with self._lock:
+            connection = self._connection
+            connection.execute(
+                """
+                insert into pages
+                    (document, page, run_id, stage, error, updated_at)
+                values (?, ?, ?, 'split', ?, ?)
+                on conflict (document, page) do update set
+                    run_id = excluded.run_id,
+                    error = excluded.error,
+                    updated_at = excluded.updated_at
+                """,
+                (
+                    resolve_document(document),
+                    os.path.basename(page_path),
+                    run_id,
+                    error,
+                    time.time(),
+                ),
+            )
+            connection.commit()
+
+    def page(self, document: str, page_path: str) -> dict | None:
+        """
+        Returns the state of the page of the document, or None when it was
+        never recorded.
+        """
+        with self._lock:
+            connection = self._connection
+            row = connection.execute(
+                "select * from pages where document = ? and page = ?",
+                (resolve_document(document), os.path.basename(page_path)),
+            ).fetchone()
+            return dict(row) if row is not None else None
+
+    def summary(self, run_id: int | None = None) -> dict | None:
+        """
+        Summarizes a run (by default the last one): its status, the pages of
+        its document by stage, the failed pages and the time spent on each
+        stage. Returns None when there is no such run.
+        """
+        with self._lock:
+            connection = self._connection
+            run = connection.execute(
+                "select * from runs where id = ?"
+                if run_id is not None
+                else "select * from runs order by id desc limit 1",
+                (run_id,) if run_id is not None else (),
+            ).fetchone()
+            if run is None:
+                return None
+            stages = dict(
+                connection.execute(
+                    """
+                    select stage, count(*) from pages
+                    where document = ? group by stage
+                    """,
+                    (run["document"],),
+                ).fetchall()
+            )
+            failed = [
+                dict(row)
+                for row in connection.execute(
+                    """
+                    select page, stage, error from pages
+                    where document = ? and error is not null
+                    order by page
+                    """,
+                    (run["document"],),
+                )
+            ]
+            seconds = connection.execute(
+                """
+                select count(*), coalesce(sum(ocr_seconds), 0),
+                    coalesce(sum(parse_seconds), 0),
+                    coalesce(sum(upload_seconds), 0)
+                from pages where run_id = ?
+                """,
+                (run["id"],),
+            ).fetchone()
+            return {
+                "run": dict(run),
+                "stages": {stage: stages.get(stage, 0) for stage in STAGES},
+                "failed": failed,
+                "pages_in_run": seconds[0],
+                "seconds": {
+                    "ocr": seconds[1],
+                    "parse": seconds[2],
+                    "upload": seconds[3],
+                },
+            }
+
+
+class RunState:
+    """
+    State of a single run, recording its pages in the JobState.
+    """
+
+    def __init__(self, job_state: JobState, run_id: int, document: str):
+        self.job_state = job_state
+        self.run_id = run_id
+        self.document = document
+
+    def record(self, page_path: str, stage: str, **fields) -> None:
+        self.job_state.record(
+            self.document, page_path, stage, self.run_id, **fields
+        )
+
+    def fail(self, page_path: str, error: BaseException | str) -> None:
+        self.job_state.fail(self.document, page_path, self.run_id, str(error))
+
+    def finish(self, error: BaseException | str | None = None) -> None:
+        self.job_state.finish_run(
+            self.run_id, str(error) if error is not None else None
+        )
+
+    def is_done(self, page_path: str, stage: str, pdf_sha256: str) -> bool:
+        """
+        Returns True when the page, with the same content, already reached
+        stage in a previous run.
+        """
+        page = self.job_state.page(self.document, page_path)
+        return (
+            page is not None
+            and page["pdf_sha256"] == pdf_sha256
+            and page["error"] is None
+            and STAGES.index(page["stage"]) >= STAGES.index(stage)
+        )
@@ -1,24 +1,561 @@
+"""
+Merges the csv of every page in a single csv.
+
+The files are streamed to the output: the header is written once and the
+rows of each file are copied in chunks, so memory does not grow with the
+size of the directory. Every file must have the same columns as the first
+one; files with the columns in another order have their rows reordered.
+
+A manifest next to the output records, for each source file, its size,
+mtime and hash and the segment (bytes and rows) it produced. An
+incremental merge appends the new files to the output and, when files
+changed or disappeared, rebuilds it copying the segments of the unchanged
+files from the previous output instead of reading their sources again.
+
+The merge can also be written as a Parquet dataset, typed as in the
+BigQuery upload and optionally partitioned in Hive layout (column=value
+directories), so readers can skip the partitions they do not need. The
+dataset carries a marker file, and only a directory with it is replaced by
+a later merge.
+"""
+
+import csv
+import hashlib
+import io
+import json
 import os
+import shutil
+import time
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO
+
+import pyarrow.dataset
+
+from utils.arrow_table import arrow_schema, csv_to_arrow
+from utils.ocr_cache import hash_file
+
+CHUNK_SIZE = 1024 * 1024
+MANIFEST_VERSION = 1
+ROWS_PER_GROUP = 128 * 1024
+CONVERT_BYTES = 8 * 1024 * 1024
+# marks a Parquet dataset written by the merger, ignored by the readers
+DATASET_MARKER = "_merger.json"
+
+
+def list_csv_files(path: str, output_path: str) -> list[str]:
+    """
+    Returns the csv files of the directory, sorted by name, without the
+    output itself when it is written to the same directory.
+    """
+    return sorted(
+        os.path.join(path, f)
+        for f in os.listdir(path)
+        if f.endswith(".csv")
+        and os.path.abspath(os.path.join(path, f))
+        != os.path.abspath(output_path)
+    )
+
+
+def manifest_path(output_path: str) -> str:
+    """
+    Path of the manifest of a merged csv.
+    """
+    return f"{output_path}.manifest.json"
+
+
+def parse_header(line: bytes) -> list[str]:
+    """
+    Returns the column names of a csv header line.
+    """
+    return next(csv.reader([line.decode("utf-8-sig").rstrip("\r\n")]), [])
+
+
+def check_columns(
+    file_path: str, file_columns: list[str], columns: list[str]
+) -> None:
+    """
+    Raises ValueError when the file does not have the columns of the merge,
+    in any order.
+    """
+    if sorted(file_columns) != sorted(columns):
+        missing = set(columns) - set(file_columns)
+        extra = set(file_columns) - set(columns)
+        raise ValueError(
+            f"{file_path} does not have the columns of the merged "
+            f"csv: missing {sorted(missing)}, extra {sorted(extra)}"
+        )
+
+
+def count_records(chunk: bytes, in_quotes: bool) -> tuple[int, bool]:
+    """
+    Counts the line breaks of the chunk that end a csv record, i.e. outside
+    quoted cells. Returns the count and whether the chunk ends inside a
+    quoted cell, to be passed to the next chunk.
+    """
+    parts = chunk.split(b'"')
+    outside = parts[1 if in_quotes else 0 :: 2]
+    records = sum(part.count(b"\n") for part in outside)
+    return records, in_quotes ^ (len(parts) % 2 == 0)
+
+
+def open_files(
+    files: list[str], read_workers: int = 1
+) -> Iterator[tuple[str, IO[bytes]]]:
+    """
+    Yields each file opened for reading, in order. With more than one
+    worker the next files are read ahead in threads, at most read_workers
+    files held in memory at a time.
+    """
+    if read_workers <= 1:
+        for file_path in files:
+            with open(file_path, "rb") as f:
+                yield file_path, f
+        return
+
+    def read(file_path: str) -> bytes:
+        with open(file_path, "rb") as f:
+            return f.read()
+
+    with ThreadPoolExecutor(max_workers=read_workers) as executor:
+        pending: deque = deque()
+        for file_path in files:
+            pending.append((file_path, executor.submit(read, file_path)))
+            if len(pending) >= read_workers:
+                done_path, future = pending.popleft()
+                yield done_path, io.BytesIO(future.result())
+        while pending:
+            done_path, future = pending.popleft()
+            yield done_path, io.BytesIO(future.result())
 
-import pandas as pd
+
+def copy_rows(
+    source: IO[bytes],
+    output: IO[bytes],
+    columns: list[str],
+    file_columns: list[str],
+    digest=None,
+) -> int:
+    """
+    Copies the rows left in source to output, reordering the cells when the
+    file has the columns in another order.
+
+    Returns:
+        int: Number of rows copied.
+    """
+    if file_columns == columns:
+        last = b"\n"
+        rows, in_quotes = 0, False
+        while chunk := source.read(CHUNK_SIZE):
+            output.write(chunk)
+            if digest is not None:
+                digest.update(chunk)
+            records, in_quotes = count_records(chunk, in_quotes)
+            rows += records
+            last = chunk[-1:]
+        if last != b"\n":
+            output.write(b"\n")
+            rows += 1
+        return rows
+    if digest is not None:
+        content = source.read()
+        digest.update(content)
+        source = io.BytesIO(content)
+    order = [file_columns.index(column) for column in columns]
+    text = io.TextIOWrapper(output, encoding="utf-8", newline="")
+    writer = csv.writer(text, lineterminator="\n")
+    rows = 0
+    for row in csv.reader(
+        io.TextIOWrapper(source, encoding="utf-8", newline="")
+    ):
+        writer.writerow([row[i] for i in order])
+        rows += 1
+    text.flush()
+    text.detach()
+    return rows
 
 
-def merge_document(path: str, output_path: str):
+def copy_range(source: IO[bytes], output: IO[bytes], start: int, length: int):
+    """
+    Copies length bytes of source, from start, to output.
+    """
+    source.seek(start)
+    while length > 0:
+        chunk = source.read(min(CHUNK_SIZE, length))
+        if not chunk:
+            raise ValueError(f"{source.name} is shorter than its manifest")
+        output.write(chunk)
+        length -= len(chunk)
+
+
+def load_manifest(output_path: str) -> dict | None:
+    """
+    Returns the manifest of the merged csv, or None when there is none or
+    it does not describe the current output (e.g. a merge interrupted
+    while appending).
+    """
+    try:
+        with open(manifest_path(output_path), encoding="utf-8") as f:
+            manifest = json.load(f)
+        size = os.path.getsize(output_path)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION or size != manifest.get(
+        "size"
+    ):
+        print(f"Manifest of {output_path} is outdated, merging everything")
+        return None
+    return manifest
+
+
+def write_manifest(output_path: str, manifest: dict) -> None:
+    manifest["size"] = os.path.getsize(output_path)
+    partial_path = f"{manifest_path(output_path)}.partial"
+    with open(partial_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(partial_path, manifest_path(output_path))
+
+
+def is_unchanged(file_path: str, entry: dict) -> bool:
+    """
+    Returns True when the file has the content recorded in the manifest.
+    Files with the same size and mtime are not read; files only touched
+    keep their segment and have their mtime updated.
+    """
+    stat = os.stat(file_path)
+    if stat.st_size != entry["size"]:
+        return False
+    if stat.st_mtime_ns == entry["mtime_ns"]:
+        return True
+    if hash_file(file_path) != entry["sha256"]:
+        return False
+    entry["mtime_ns"] = stat.st_mtime_ns
+    return True
+
+
+def merge_files(
+    files: list[str],
+    output: IO[bytes],
+    manifest: dict,
+    read_workers: int = 1,
+) -> None:
+    """
+    Appends the rows of the files to output, adding their segments to the
+    manifest. The first file with a header sets the columns and writes the
+    header when the manifest has no columns yet.
+
+    Raises:
+        ValueError: When a file does not have the columns of the output.
+    """
+    for file_path, source in open_files(files, read_workers):
+        stat = os.stat(file_path)
+        digest = hashlib.sha256()
+        header = source.readline()
+        digest.update(header)
+        file_columns = parse_header(header)
+        columns = manifest["columns"]
+        if not file_columns:
+            print(f"Skipping empty file {file_path}")
+        elif columns is None:
+            columns = manifest["columns"] = file_columns
+            output.write(header.rstrip(b"\r\n") + b"\n")
+            manifest["header_size"] = output.tell()
+        else:
+            check_columns(file_path, file_columns, columns)
+        offset = output.tell()
+        rows = (
+            copy_rows(source, output, columns, file_columns, digest)
+            if file_columns
+            else 0
+        )
+        manifest["files"].append(
+            {
+                "name": os.path.basename(file_path),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": digest.hexdigest(),
+                "offset": offset,
+                "length": output.tell() - offset,
+                "first_row": manifest["rows"],
+                "rows": rows,
+            }
+        )
+        manifest["rows"] += rows
+
+
+def new_manifest() -> dict:
+    return {
+        "version": MANIFEST_VERSION,
+        "columns": None,
+        "header_size": 0,
+        "rows": 0,
+        "files": [],
+    }
+
+
+def merge_document(
+    path: str,
+    output_path: str,
+    read_workers: int = 1,
+    incremental: bool = False,
+):
     """
     Merges all CSV files in the specified directory into a single CSV file.
 
     Args:
         path (str): The directory containing the CSV files to merge.
         output_path (str): The file path where the merged CSV will be saved.
+        read_workers (int): Threads reading the files ahead of the writer.
+        incremental (bool): Merge only the files that are new or changed
+            since the merge recorded in the manifest.
 
     Returns:
-        None. The merged CSV is written to `output_path`.
-    """
-    csv_files = [
-        os.path.join(path, f) for f in os.listdir(path) if f.endswith(".csv")
-    ]
-    dataframes = [pd.read_csv(file_path) for file_path in csv_files]
-    # Concatenate all DataFrames
-    merged_df = pd.concat(dataframes, ignore_index=False)
-    # Save the merged DataFrame to a single CSV file
-    merged_df.to_csv(output_path, index=False)
+        None. The merged CSV is written to `output_path`, and its manifest
+        next to it.
+
+    Raises:
+        ValueError: When a file does not have the columns of the first one.
+    """
+    start = time.perf_counter()
+    files = list_csv_files(path, output_path)
+    previous = load_manifest(output_path) if incremental else None
+    unchanged: list[dict] = []
+    removed = 0
+    if previous is not None:
+        names = {os.path.basename(file_path) for file_path in files}
+        entries = {entry["name"]: entry for entry in previous["files"]}
+        unchanged = [
+            entry
+            for entry in previous["files"]
+            if entry["name"] in names
+            and is_unchanged(os.path.join(path, entry["name"]), entry)
+        ]
+        kept = {entry["name"] for entry in unchanged}
+        files = [f for f in files if os.path.basename(f) not in kept]
+        removed = (
+            len(entries)
+            - len(unchanged)
+            - len([f for f in files if os.path.basename(f) in entries])
+        )
+        checked = time.perf_counter()
+        if not files and not removed:
+            # keeps the mtime of files touched without changes
+            write_manifest(output_path, previous)
+            print(
+                f"Skipped {len(unchanged)} unchanged files in "
+                f"{checked - start:.2f} s, nothing to merge"
+            )
+            return
+        if len(unchanged) == len(previous["files"]):
+            append_files(output_path, previous, files, read_workers)
+            print(
+                f"Skipped {len(unchanged)} unchanged files in "
+                f"{checked - start:.2f} s, appended {len(files)} new files "
+                f"in {time.perf_counter() - checked:.2f} s"
+            )
+            return
+
+    manifest = new_manifest()
+    partial_path = f"{output_path}.partial"
+    try:
+        with open(partial_path, "wb") as output:
+            if unchanged and previous is not None:
+                copy_segments(output_path, output, previous, unchanged)
+                manifest.update(
+                    columns=previous["columns"],
+                    header_size=previous["header_size"],
+                    files=list(unchanged),
+                    rows=sum(entry["rows"] for entry in unchanged),
+                )
+            copied = time.perf_counter()
+            merge_files(files, output, manifest, read_workers)
+    except BaseException:
+        os.remove(partial_path)
+        raise
+    shutil.move(partial_path, output_path)
+    write_manifest(output_path, manifest)
+    if previous is not None:
+        print(
+            f"Skipped {len(unchanged)} unchanged files in "
+            f"{copied - start:.2f} s, merged {len(files)} new or changed "
+            f"files in {time.perf_counter() - copied:.2f} s, "
+            f"removed {removed} files"
+        )
+    else:
+        print(
+            f"Merged {len(manifest['files'])} files into {output_path} in "
+            f"{time.perf_counter() - start:.2f} s"
+        )
+
+
+def append_files(
+    output_path: str, manifest: dict, files: list[str], read_workers: int
+) -> None:
+    """
+    Appends the files to the merged csv, after the segments of the manifest.
+    """
+    with open(output_path, "r+b") as output:
+        output.seek(manifest["size"])
+        output.truncate()
+        merge_files(files, output, manifest, read_workers)
+    write_manifest(output_path, manifest)
+
+
+def copy_segments(
+    output_path: str, output: IO[bytes], previous: dict, entries: list[dict]
+) -> None:
+    """
+    Copies the header and the segments of the entries from the previous
+    merged csv, updating their position in the new one.
+    """
+    first_row = 0
+    with open(output_path, "rb") as source:
+        copy_range(source, output, 0, previous["header_size"])
+        for entry in entries:
+            offset = output.tell()
+            copy_range(source, output, entry["offset"], entry["length"])
+            entry.update(offset=offset, first_row=first_row)
+            first_row += entry["rows"]
+
+
+def is_replaceable_dataset(directory: str) -> bool:
+    """
+    Returns True when the directory may be replaced by the merge: it does
+    not exist, is empty or is a dataset written by the merger.
+    """
+    if not os.path.lexists(directory):
+        return True
+    if not os.path.isdir(directory) or os.path.islink(directory):
+        return False
+    return not os.listdir(directory) or os.path.isfile(
+        os.path.join(directory, DATASET_MARKER)
+    )
+
+
+def check_replaceable_dataset(directory: str) -> None:
+    if not is_replaceable_dataset(directory):
+        raise ValueError(
+            f"{directory} exists and is not a dataset written by the "
+            "merger, remove it or choose another output"
+        )
+
+
+def merge_document_parquet(
+    path: str,
+    output_dir: str,
+    partition_by: list[str] | None = None,
+    read_workers: int = 1,
+):
+    """
+    Merges all CSV files in the specified directory into a Parquet dataset,
+    with typed columns and dictionary encoded strings, streaming one file
+    at a time.
+
+    Args:
+        path (str): The directory containing the CSV files to merge.
+        output_dir (str): Directory of the dataset, replaced by the merge
+            when it is a dataset written by a previous one.
+        partition_by (list[str] | None): Columns partitioning the dataset
+            in Hive layout, e.g. PeriodoPrestacaoContas=2024-01/.
+        read_workers (int): Threads reading the files ahead of the writer.
+
+    Raises:
+        ValueError: When a file does not have the columns of the first one,
+            a partition column is not one of them, or output_dir (or its
+            .partial) exists and is not a dataset written by the merger.
+    """
+    start = time.perf_counter()
+    partial_dir = f"{output_dir}.partial"
+    check_replaceable_dataset(output_dir)
+    check_replaceable_dataset(partial_dir)
+    files = list_csv_files(path, output_dir)
+    columns: list[str] | None = None
+    for file_path in files:
+        with open(file_path, "rb") as f:
+            columns = parse_header(f.readline()) or None
+        if columns is not None:
+            break
+    if columns is None:
+        print(f"No csv files with rows to merge in {path}")
+        return
+    partition_by = partition_by or []
+    unknown = set(partition_by) - set(columns)
+    if unknown:
+        raise ValueError(f"Cannot partition by unknown {sorted(unknown)}")
+    merged = 0
+
+    def convert(source: IO[bytes]) -> list[pyarrow.RecordBatch]:
+        return csv_to_arrow(source).select(columns).to_batches()
+
+    def batches() -> Iterator[pyarrow.RecordBatch]:
+        nonlocal merged
+        # rows of several files are converted together, the conversion has
+        # a fixed cost that exceeds the rows of a single page
+        pending = io.BytesIO()
+        for file_path, source in open_files(files, read_workers):
+            header = source.readline()
+            file_columns = parse_header(header)
+            if not file_columns:
+                print(f"Skipping empty file {file_path}")
+                continue
+            check_columns(file_path, file_columns, columns)
+            merged += 1
+            if file_columns != columns:
+                source.seek(0)
+                yield from convert(source)
+                continue
+            if pending.tell() == 0:
+                pending.write(header.rstrip(b"\r\n") + b"\n")
+            copy_rows(source, pending, columns, file_columns)
+            if pending.tell() >= CONVERT_BYTES:
+                pending.seek(0)
+                yield from convert(pending)
+                pending = io.BytesIO()
+        if pending.tell():
+            pending.seek(0)
+            yield from convert(pending)
+
+    shutil.rmtree(partial_dir, ignore_errors=True)
+    try:
+        # marked first, so an interrupted merge is replaced by the next one
+        os.makedirs(partial_dir)
+        with open(
+            os.path.join(partial_dir, DATASET_MARKER), "w", encoding="utf-8"
+        ) as f:
+            json.dump(
+                {
+                    "version": MANIFEST_VERSION,
+                    "columns": columns,
+                    "partition_by": partition_by,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        pyarrow.dataset.write_dataset(
+            batches(),
+            partial_dir,
+            schema=arrow_schema(columns),
+            format="parquet",
+            partitioning=partition_by or None,
+            partitioning_flavor="hive" if partition_by else None,
+            basename_template="part-{i}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            # pages have a few dozen rows: buffer them in larger row groups
+            min_rows_per_group=ROWS_PER_GROUP,
+            max_rows_per_group=ROWS_PER_GROUP,
+            file_options=pyarrow.dataset.ParquetFileFormat().make_write_options(
+                compression="snappy"
+            ),
+        )
+    except BaseException:
+        shutil.rmtree(partial_dir, ignore_errors=True)
+        raise
+    # checked again, the output may have appeared during the merge
+    check_replaceable_dataset(output_dir)
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(partial_dir, output_dir)
+    print(
+        f"Merged {merged} files into {output_dir} in "
+        f"{time.perf_counter() - start:.2f} s"
+    )
@@ -0,0 +1,206 @@
+"""
+Content-addressed cache of OCR results.
+
+Results are keyed by the hash of the page bytes, the OCR method and its
+parameters, so a page is only sent to OCR again when one of them changes,
+even across re-issued reports. The index lives in SQLite and the results in
+blob files next to it; the least recently used entries are evicted once the
+blobs exceed the configured size.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing, suppress
+
+INDEX_FILENAME = "index.sqlite"
+BLOBS_DIRNAME = "blobs"
+DEFAULT_MAX_SIZE_BYTES = 1024 * 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """
+    Returns the sha256 hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def method_name(method) -> str:
+    """
+    Name of the OCR method, accepting a MethodType or a plain string.
+    """
+    return getattr(method, "value", method)
+
+
+def cache_key(content_hash: str, method, params: dict) -> str:
+    """
+    Combines the page hash, the OCR method and its parameters in a single key.
+    """
+    return hashlib.sha256(
+        json.dumps(
+            [content_hash, method_name(method), params],
+            sort_keys=True,
+            default=str,
+        ).encode()
+    ).hexdigest()
+
+
+class OcrCache:
+    """
+    On-disk OCR result cache, safe to share between the threads of a run.
+
+    Args:
+        directory (str): Where the index and the blobs are stored, created on first write.
+        max_size_bytes (int): Size of the blobs above which the least recently
+            used entries are evicted.
+    """
+
+    def __init__(
+        self, directory: str, max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES
+    ):
+        self.directory = directory
+        self.max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.join(self.directory, BLOBS_DIRNAME), exist_ok=True)
+        connection = sqlite3.connect(
+            os.path.join(self.directory, INDEX_FILENAME), timeout=30
+        )
+        connection.execute(
+            """
+            create table if not exists entries (
+                key text primary key,
+                method text not null,
+                params text not null,
+                size integer not null,
+                created_at real not null,
+                last_access real not null
+            )
+            """
+        )
+        return connection
+
+    def _blob_path(self, key: str) -> str:
+        return os.path.join(self.directory, BLOBS_DIRNAME, key[:2], key)
+
+    def get(self, page_path: str, method, params: dict) -> bytes | None:
+        """
+        Returns the cached OCR result of the page, or None on a cache miss.
+        """
+        if not os.path.exists(os.path.join(self.directory, INDEX_FILENAME)):
+            return None
+        key = cache_key(hash_file(page_path), method, params)
+        with self._lock, closing(self._connect()) as connection:
+            found = connection.execute(
+                "select 1 from entries where key = ?", (key,)
+            ).fetchone()
+            if found is None:
+                return None
+            try:
+                with open(self._blob_path(key), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                connection.execute("delete from entries where key = ?", (key,))
+                connection.commit()
+                return None
+            connection.execute(
+                "update entries set last_access = ? where key = ?",
+                (time.time(), key),
+            )
+            connection.commit()
+            return data
+
+    def put(self, page_path: str, method, params: dict, data: bytes) -> None:
+        """
+        Stores the OCR result of the page, evicting old entries if needed.
+        """
+        key = cache_key(hash_file(page_path), method, params)
+        blob_path = self._blob_path(key)
+        with self._lock, closing(self._connect()) as connection:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            with open(blob_path, "wb") as f:
+                f.write(data)
+            now = time.time()
+            connection.execute(
+                """
+                insert or replace into entries
+                (key, method, params, size, created_at, last_access)
+                values (?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    key,
+                    method_name(method),
+                    json.dumps(params, sort_keys=True, default=str),
+                    len(data),
+                    now,
+                    now,
+                ),
+            )
+            connection.commit()
+            self._evict(connection, self.max_size_bytes)
+
+    def _evict(
+        self, connection: sqlite3.Connection, max_size_bytes: int
+    ) -> int:
+        total = connection.execute(
+            "select coalesce(sum(size), 0) from entries"
+        ).fetchone()[0]
+        removed = 0
+        if total <= max_size_bytes:
+            return removed
+        for key, size in connection.execute(
+            "select key, size from entries order by last_access"
+        ).fetchall():
+            if total <= max_size_bytes:
+                break
+            with suppress(FileNotFoundError):
+                os.remove(self._blob_path(key))
+            connection.execute("delete from entries where key = ?", (key,))
+            total -= size
+            removed += 1
+        connection.commit()
+        return removed
+
+    def prune(self, max_size_bytes: int | None = None) -> int:
+        """
+        Evicts the least recently used entries until the cache fits in
+        max_size_bytes (defaults to the configured size).
+        Returns:
+            int: Number of entries removed.
+        """
+        with self._lock, closing(self._connect()) as connection:
+            return self._evict(
+                connection,
+                self.max_size_bytes
+                if max_size_bytes is None
+                else max_size_bytes,
+            )
+
+    def stats(self) -> dict:
+        """
+        Returns the number of entries and their size, in total and per method.
+        """
+        with self._lock, closing(self._connect()) as connection:
+            entries, size = connection.execute(
+                "select count(*), coalesce(sum(size), 0) from entries"
+            ).fetchone()
+            methods = {
+                method: {"entries": count, "size": method_size}
+                for method, count, method_size in connection.execute(
+                    "select method, count(*), sum(size) from entries group by method"
+                )
+            }
+        return {
+            "entries": entries,
+            "size": size,
+            "max_size": self.max_size_bytes,
+            "methods": methods,
+        }
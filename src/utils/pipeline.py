@@ -0,0 +1,69 @@
+import queue
+import threading
+from collections.abc import Iterable, Iterator
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def prefetch[T](iterable: Iterable[T], maxsize: int = 8) -> Iterator[T]:
+    """
+    Consumes the iterable in a background thread, handing the items over
+    through a bounded queue.
+
+    Chaining prefetch over lazy maps turns every step into a pipeline stage
+    running in its own thread, e.g. split -> OCR -> parse. The queue bound
+    keeps a fast stage from running too far ahead of a slow one.
+
+    Args:
+        iterable (Iterable): The items to produce, usually a generator.
+        maxsize (int): How many items may wait in the queue.
+    Yields:
+        The items of the iterable, in the same order. An exception raised by
+        the producer is raised again in the consumer.
+    """
+    handoff: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                handoff.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as error:  # raised again in the consumer
+            put(_Failure(error))
+        finally:
+            # propagate the shutdown to chained stages
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = handoff.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        # consumer finished or gave up: release a producer blocked on put
+        stop.set()
+        producer.join()
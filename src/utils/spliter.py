@@ -1,4 +1,7 @@
+import multiprocessing
 import os
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
 
 from pypdf import PdfReader, PdfWriter
 
@@ -15,11 +18,121 @@ def generate_page_filenames(index: int, input_pdf_filename: str) -> str:
     return f"page_{index}_{input_pdf_filename}"
 
 
+def plan_pages(
+    total_pages: int, start: int = 0, end: int | None = None
+) -> list[tuple[int, int]]:
+    """
+    Maps the requested range to the pages that will be written.
+
+    Args:
+        total_pages (int): Number of pages in the input PDF file.
+        start (int): The starting page number to split from.
+        end (int | None): The ending page number to split to. If None, splits to the last page.
+    Returns:
+        list[tuple[int, int]]: Pairs of (page number used in the filename, index in the reader).
+    """
+    labels = (
+        range(start, end + 1)
+        if end is not None
+        else range(start + 1, total_pages + 1)
+    )
+    _end: int = end + 1 if end is not None else total_pages
+    return list(
+        zip(labels, range(start, min(_end, total_pages)), strict=False)
+    )
+
+
+def write_page(
+    reader: PdfReader,
+    reader_index: int,
+    output_path: str,
+    label: int,
+    input_pdf_filename: str,
+) -> str:
+    """
+    Writes a single page of the reader to output_path, unless it already exists.
+    """
+    if not os.path.exists(output_path):
+        print(f"Generating single page {label} for {input_pdf_filename}")
+        writer = PdfWriter()
+        writer.add_page(reader.pages[reader_index])
+        with open(output_path, "wb") as out_file:
+            writer.write(out_file)
+    return output_path
+
+
+def write_pages(
+    reader: PdfReader,
+    input_pdf_path: str,
+    output_dir: str,
+    planned: list[tuple[int, int]],
+) -> Iterator[str]:
+    """
+    Writes the planned pages of the reader, yielding each path once it is written.
+    """
+    input_pdf_filename = os.path.basename(input_pdf_path)
+    for label, reader_index in planned:
+        yield write_page(
+            reader,
+            reader_index,
+            os.path.join(
+                output_dir,
+                generate_page_filenames(label, input_pdf_filename),
+            ),
+            label,
+            input_pdf_filename,
+        )
+
+
+def _split_shard(
+    input_pdf_path: str,
+    output_dir: str,
+    shard: list[tuple[int, int]],
+) -> list[str]:
+    """
+    Process pool worker: opens its own PdfReader and writes the pages of the shard.
+    """
+    return list(
+        write_pages(
+            PdfReader(input_pdf_path), input_pdf_path, output_dir, shard
+        )
+    )
+
+
+def iter_pdf_pages(
+    input_pdf_path: str,
+    output_dir: str,
+    start: int = 0,
+    end: int | None = None,
+) -> Iterator[str]:
+    """
+    Generator version of split_pdf_to_pages: yields the path of each page as soon
+    as it is written, so the next stages can start before the split finishes.
+
+    Args:
+        input_pdf_path (str): Path to the input PDF file.
+        output_dir (str): Directory where the split PDF pages will be saved.
+        start (int): The starting page number (1-based index) to split from.
+        end (int | None): The ending page number (1-based index) to split to. If None, splits to the last page.
+    Yields:
+        str: Path of each split page, in page order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    reader = PdfReader(input_pdf_path)
+    yield from write_pages(
+        reader,
+        input_pdf_path,
+        output_dir,
+        plan_pages(len(reader.pages), start, end),
+    )
+
+
 def split_pdf_to_pages(
     input_pdf_path: str,
     output_dir: str,
     start: int = 0,
     end: int | None = None,
+    workers: int = 1,
 ) -> list[str]:
     """
     Splits a PDF file into individual pages and saves each page as a separate PDF file.
@@ -29,34 +142,48 @@ def split_pdf_to_pages(
         output_dir (str): Directory where the split PDF pages will be saved.
         start (int): The starting page number (1-based index) to split from.
         end (int | None): The ending page number (1-based index) to split to. If None, splits to the last page.
+        workers (int): Number of processes used to write the pages. The page range is
+            sharded in contiguous blocks, one per process.
     Returns:
-        None
+        list[str]: Paths of the split pages, in page order.
     """
-    output: list[str] = []
+    if workers <= 1:
+        return list(iter_pdf_pages(input_pdf_path, output_dir, start, end))
+
     os.makedirs(output_dir, exist_ok=True)
-    reader = PdfReader(input_pdf_path)
+    planned = plan_pages(len(PdfReader(input_pdf_path).pages), start, end)
+
     input_pdf_filename = os.path.basename(input_pdf_path)
-    pages = (
-        range(start, end + 1)
-        if end is not None
-        else range(start + 1, len(reader.pages) + 1)
-    )
-    _end: int = end + 1 if end is not None else len(reader.pages)
-    for i, page in enumerate(
-        reader.pages[start:_end],
-        start=1,
-    ):
-        output_path = os.path.join(
-            output_dir,
-            generate_page_filenames(pages[i - 1], input_pdf_filename),
+    output = [
+        os.path.join(
+            output_dir, generate_page_filenames(label, input_pdf_filename)
         )
-        if not os.path.exists(output_path):
-            print(
-                f"Generating single page {pages[i - 1]} for {input_pdf_filename}"
+        for label, _ in planned
+    ]
+    # only pages not generated yet are sent to the pool
+    missing = [
+        page
+        for page, output_path in zip(planned, output, strict=True)
+        if not os.path.exists(output_path)
+    ]
+    if not missing:
+        return output
+
+    shard_size = -(-len(missing) // workers)  # ceil division
+    shards = [
+        missing[i : i + shard_size] for i in range(0, len(missing), shard_size)
+    ]
+    # spawn avoids forking a process that may already be running threads
+    with ProcessPoolExecutor(
+        max_workers=len(shards),
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as executor:
+        list(
+            executor.map(
+                _split_shard,
+                [input_pdf_path] * len(shards),
+                [output_dir] * len(shards),
+                shards,
             )
-            writer = PdfWriter()
-            writer.add_page(page)
-            with open(output_path, "wb") as out_file:
-                writer.write(out_file)
-        output.append(output_path)
+        )
     return output
@@ -1,10 +1,27 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+from docling.datamodel.base_models import InputFormat
+from docling.datamodel.pipeline_options import TesseractCliOcrOptions
 from pandas import DataFrame, Series
 
+from processors import docling_analytical
 from processors.docling_analytical import (
+    DOCLING_OPTIONS,
+    build_converter,
+    current_titles,
+    get_converter,
+    get_converter_metrics,
     get_current_title,
     identify_row,
+    identify_rows,
+    process_pdf_file,
+    process_pdf_files,
 )
-from utils.constants import ExtractTypeRow
+from utils.constants import ExtractTypeRow, MethodType
+from utils.ocr_cache import OcrCache
 
 # Teste quando a própria linha é um título
 
@@ -172,3 +189,158 @@ def test_identify_row_row():
         }
     )
     assert identify_row(line) == ExtractTypeRow.ROW
+
+
+def test_identify_rows_matches_identify_row():
+    table = DataFrame(
+        {
+            "Data": [
+                "Data",
+                " 1.1 - Receitas ",
+                "01/02/2024",
+                "31/02/2024",
+                "TOTAL: 1.1 Receitas",
+                "Outro texto",
+            ]
+        }
+    )
+
+    assert identify_rows(table["Data"]).tolist() == [
+        identify_row(row) for _, row in table.iterrows()
+    ]
+
+
+def test_current_titles_matches_get_current_title():
+    table = DataFrame(
+        {
+            "tipoDado": [
+                ExtractTypeRow.OTHERS,
+                ExtractTypeRow.TITLE,
+                ExtractTypeRow.ROW,
+                ExtractTypeRow.TOTAL,
+                ExtractTypeRow.TITLE,
+                ExtractTypeRow.ROW,
+            ],
+            "Data": ["data0", "first", "data2", "data3", "second", "data5"],
+        }
+    )
+
+    assert current_titles(table).tolist() == [
+        get_current_title(table, row) for _, row in table.iterrows()
+    ]
+    assert current_titles(table).tolist() == [
+        None,
+        "first",
+        "first",
+        "first",
+        "second",
+        "second",
+    ]
+
+
+def test_build_converter_configures_the_pdf_pipeline():
+    converter = build_converter(17)
+
+    for input_format in (InputFormat.PDF, InputFormat.IMAGE):
+        options = converter.format_to_options[input_format].pipeline_options
+        assert options.accelerator_options.num_threads == 17
+
+
+def test_build_converter_applies_the_cached_options():
+    converter = build_converter()
+
+    options = converter.format_to_options[InputFormat.PDF].pipeline_options
+    assert isinstance(options.ocr_options, TesseractCliOcrOptions)
+    assert options.ocr_options.lang == DOCLING_OPTIONS["ocr_lang"]
+    table_options = options.table_structure_options
+    assert table_options.mode.value == DOCLING_OPTIONS["table_mode"]
+    assert (
+        table_options.do_cell_matching == DOCLING_OPTIONS["do_cell_matching"]
+    )
+
+
+@patch("processors.docling_analytical.build_converter")
+def test_get_converter_loads_models_once(mock_build_converter):
+    get_converter.cache_clear()
+    loads = get_converter_metrics()["model_loads"]
+
+    first = get_converter()
+    second = get_converter()
+
+    assert first is second
+    mock_build_converter.assert_called_once_with(4)
+    first.initialize_pipeline.assert_called_once_with(InputFormat.PDF)
+    assert get_converter_metrics()["model_loads"] == loads + 1
+    get_converter.cache_clear()
+
+
+def test_process_pdf_file_reuses_converter_and_records_latency(tmp_path):
+    table = MagicMock()
+    table.export_to_dataframe.return_value = DataFrame(
+        [
+            ["1.1 - Receitas", "", "", "", "", ""],
+            ["01/02/2024", "Taxa", "101", "", "02/2024", "10,00"],
+        ]
+    )
+    converter = MagicMock()
+    converter.convert.return_value.document.tables = [table]
+    pages = get_converter_metrics()["pages"]
+    output_path = str(tmp_path / "page_1.csv")
+
+    with patch.object(docling_analytical, "get_converter") as mock_get:
+        for _ in range(2):
+            assert (
+                process_pdf_file(
+                    "page_1.pdf", output_path, converter=converter
+                )
+                == output_path
+            )
+        mock_get.assert_not_called()
+
+    assert converter.convert.call_count == 2
+    metrics = get_converter_metrics()
+    assert metrics["pages"] == pages + 2
+    assert metrics["seconds_per_page"] >= 0
+    with open(output_path) as f:
+        assert "Receitas" in f.read()
+
+
+def thread_pool(max_workers, mp_context, initializer, initargs):
+    """ProcessPoolExecutor stand-in running the workers in threads."""
+    return ThreadPoolExecutor(
+        max_workers=max_workers, initializer=initializer, initargs=initargs
+    )
+
+
+@patch("processors.docling_analytical.ProcessPoolExecutor", thread_pool)
+@patch("processors.docling_analytical.process_pdf_file")
+@patch("processors.docling_analytical.get_converter")
+def test_process_pdf_files_warms_workers_and_keeps_order(
+    mock_get_converter, mock_process_pdf_file, tmp_path
+):
+    def convert(input_path, output_path, converter):
+        # later pages finish first
+        page = int(os.path.basename(input_path)[5:-4])
+        time.sleep(0.05 / (page + 1))
+        with open(output_path, "w") as f:
+            f.write(input_path)
+        return output_path
+
+    mock_process_pdf_file.side_effect = convert
+    cache = OcrCache(str(tmp_path / "cache"))
+    jobs = []
+    for i in range(7):
+        page = tmp_path / f"page_{i}.pdf"
+        page.write_text(f"page {i}")
+        jobs.append((str(page), str(tmp_path / f"page_{i}.csv")))
+    cache.put(jobs[6][0], MethodType.docling, DOCLING_OPTIONS, b"6")
+
+    outputs = list(
+        process_pdf_files(jobs, workers=3, num_threads=2, cache=cache)
+    )
+
+    assert outputs == [output_path for _, output_path in jobs]
+    mock_get_converter.assert_any_call(2)
+    assert mock_process_pdf_file.call_count == 6
+    # converted pages are stored in the cache by the parent process
+    assert cache.stats()["entries"] == 7
@@ -1,11 +1,13 @@
 # filepath: tests/processors/test_llmwhisperer_analytical.py
 import os
 from io import StringIO
+from unittest.mock import patch
 
 import pandas as pd
 
 from processors import llmwhisperer_analytical as lwa
 from utils.constants import FileType
+from utils.extract_utils import validate_series
 
 # In your test file (e.g., test_my_parser.py)
 os.chdir(os.path.dirname(__file__))
@@ -41,45 +43,12 @@ def test_clean_table_text_ascii():
     assert "| Col1 | Col2 |" in cleaned
 
 
-def test_concat_dataframe_cells():
-    df = pd.DataFrame(
-        {"Data": ["01/01/2020", None, None], "Col1": ["A", "B", "C"]}
-    )
-    result = lwa.concat_dataframe_cells(df.copy())
-    assert isinstance(result, pd.DataFrame)
-
-
 def test_extract_untitled_table():
     text = "| table |\n\n| another table |"
     result = lwa.extract_untitled_table(text)
     assert "| another table" not in result
 
 
-def test_drop_invalid_rows():
-    df = pd.DataFrame({"Data": ["01/01/2020", "invalid", None]})
-    result = lwa.drop_invalid_rows(df)
-    assert all(isinstance(x, str) for x in result["Data"])
-
-
-def test_strip_string_cells():
-    df = pd.DataFrame({"A": ["  a ", " b "]})
-    result = lwa.strip_string_cells(df)
-    assert all(x == x.strip() for x in result["A"])
-
-
-def test_strip_columns_names():
-    df = pd.DataFrame({" A ": [1], "B ": [2]})
-    result = lwa.strip_columns_names(df)
-    assert all(col == col.strip() for col in result.columns)
-
-
-def test_find_similar_columns():
-    lst = ["Col1", "Col1 .1", "Col2"]
-    pattern = lwa.re.compile(r"( \.[0-9]+)$")
-    result = lwa.find_similar_columns(lst, pattern)
-    assert "Col1" in result
-
-
 def test_convert_list_to_dict():
     with open("fixtures/sample-1.txt") as f:
         data = f.read()
@@ -126,3 +95,153 @@ def test_data_processing():
         assert isinstance(result, pd.DataFrame)
         assert result["file"][0] == "test2.pdf"
         assert result["Participante"][0] == "JOSÉ ORLANDO DA SILVA"
+
+
+def test_data_processing_repeats_account_per_block():
+    block = pd.DataFrame(
+        [["01/01/2024", "Desc", "", "01/2024", "1", "1.234,56"]] * 2,
+        columns=lwa.COLUMNS,
+    )
+    result = lwa.data_processing(
+        {
+            "1.01 - Receitas": block,
+            "title": "not a table",
+            "2.02 - Despesas": block.iloc[:1],
+        },
+        "test.pdf",
+    )
+    assert result["ContaContabil"].to_list() == ["1.01", "1.01", "2.02"]
+    assert result["ContaContabilDescritivo"].to_list() == [
+        "Receitas",
+        "Receitas",
+        "Despesas",
+    ]
+    assert result["Valor"].to_list() == [1234.56] * 3
+    assert result.columns.to_list()[-3:] == [
+        "ContaContabilDescritivo",
+        "ContaContabil",
+        "file",
+    ]
+
+
+def ascii_table(*rows):
+    """Renders the rows as an LLMWhisperer ASCII table, the first is the header."""
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    separator = "+" + "+".join("-" * (w + 2) for w in widths) + "+"
+    lines = [separator]
+    for row in rows:
+        cells = [cell.ljust(w) for cell, w in zip(row, widths, strict=True)]
+        lines += ["| " + " | ".join(cells) + " |", separator]
+    return "\n".join(lines)
+
+
+def test_from_ascii_table_to_dataframe_fixed_width():
+    table = ascii_table(
+        lwa.COLUMNS.to_list(),
+        ["01/02/2024", "Taxa | extra", "101", "2846", "02/2024", "10,00"],
+        ["", "sem data", "", "", "", ""],
+    )
+
+    df = lwa.from_ascii_table_to_dataframe(table)
+
+    assert df.columns.to_list() == lwa.COLUMNS.to_list()
+    assert df.values.tolist() == [
+        ["01/02/2024", "Taxa | extra", "101", "2846", "02/2024", "10,00"]
+    ]
+
+
+def test_from_ascii_table_to_dataframe_merged_columns():
+    table = ascii_table(
+        ["Data", "Descrição Participante", "Documento", "Período", "Valor"],
+        ["07/12/2023", "DEP DINHEIRO CAIXA", "2670", "12/2023", "1,00"],
+    )
+
+    df = lwa.from_ascii_table_to_dataframe(table)
+
+    assert df.values.tolist() == [
+        ["07/12/2023", "DEP DINHEIRO CAIXA", "", "2670", "12/2023", "1,00"]
+    ]
+
+
+def test_from_ascii_table_to_dataframe_duplicated_columns():
+    table = ascii_table(
+        lwa.COLUMNS.to_list() + ["Valor"],
+        ["07/12/2023", "PIX", "101", "2670", "12/2023", "", "1,00"],
+    )
+
+    df = lwa.from_ascii_table_to_dataframe(table)
+
+    assert df["Valor"].to_list() == ["1,00"]
+
+
+def test_from_ascii_table_to_dataframe_shifted_empty_column():
+    # the data sits one column to the left of the titles after the empty one
+    table = ascii_table(
+        ["Data", "Descrição", "", "Participante", "Documento"]
+        + ["Período", "Valor"],
+        ["07/12/2023", "PIX", "101", "2670", "12/2023", "1,00", ""],
+    )
+
+    df = lwa.from_ascii_table_to_dataframe(table)
+
+    assert df.values.tolist() == [
+        ["07/12/2023", "PIX", "101", "2670", "12/2023", "1,00"]
+    ]
+
+
+def test_from_ascii_table_to_dataframe_validates_dates_at_once():
+    table = ascii_table(
+        lwa.COLUMNS.to_list(),
+        ["01/02/2024", "Taxa", "101", "2846", "02/2024", "10,00"],
+        ["TOTAL", "", "", "", "", "10,00"],
+        ["03/02/2024", "Água", "102", "2847", "02/2024", "5,00"],
+    )
+
+    with (
+        patch.object(
+            lwa, "validate_series", wraps=validate_series
+        ) as mock_validate_series,
+        patch(
+            "utils.extract_utils.validate",
+            side_effect=AssertionError("scalar validate called"),
+        ),
+    ):
+        df = lwa.from_ascii_table_to_dataframe(table)
+
+    mock_validate_series.assert_called_once()
+    assert mock_validate_series.call_args[0][0].to_list() == [
+        "01/02/2024",
+        "TOTAL",
+        "03/02/2024",
+    ]
+    assert df["Data"].to_list() == ["01/02/2024", "03/02/2024"]
+    assert not hasattr(lwa, "validate")
+
+
+def test_convert_list_to_dict_validates_the_page_at_once():
+    first = ascii_table(
+        lwa.COLUMNS.to_list(),
+        ["01/02/2024", "Taxa", "101", "2846", "02/2024", "10,00"],
+    )
+    second = ascii_table(
+        lwa.COLUMNS.to_list(),
+        ["31/02/2024", "Data inválida", "102", "2847", "02/2024", "5,00"],
+        ["03/02/2024", "Água", "102", "2847", "02/2024", "5,00"],
+    )
+
+    with patch.object(
+        lwa, "validate_series", wraps=validate_series
+    ) as mock_validate_series:
+        result = lwa.convert_list_to_dict(
+            ["1.1 - Receitas", first, "2.1 - Despesas", second]
+        )
+
+    mock_validate_series.assert_called_once()
+    assert result["1.1 - Receitas"]["Data"].to_list() == ["01/02/2024"]
+    assert result["2.1 - Despesas"]["Data"].to_list() == ["03/02/2024"]
+
+
+def test_split_ascii_row_falls_back_to_pipes():
+    bounds = [0, 5, 10]
+    assert lwa.split_ascii_row("| ab | cd |", bounds) == ["ab", "cd"]
+    assert lwa.split_ascii_row("| abcdef | g |", bounds) == ["abcdef", "g"]
@@ -0,0 +1,104 @@
+import ctypes
+
+import pandas as pd
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+from processors.llmwhisperer_analytical import process_txt_file
+from processors.text_layer import (
+    assign_columns,
+    process_pdf_file,
+    read_text_lines,
+)
+
+COLUMNS_X = [20, 80, 330, 480, 540, 600]
+HEADER = ["Data", "Descrição", "Participante", "Documento", "Período", "Valor"]
+
+
+def make_pdf(path, texts):
+    """Writes a single page PDF with the (x, y, text) objects given."""
+    pdf = pdfium.PdfDocument.new()
+    page = pdf.new_page(842, 595)
+    font = pdfium_c.FPDFText_LoadStandardFont(pdf, b"Helvetica")
+    for x, y, text in texts:
+        text_object = pdfium_c.FPDFPageObj_CreateTextObj(pdf, font, 9.0)
+        buffer = ctypes.create_string_buffer((text + "\0").encode("utf-16-le"))
+        pdfium_c.FPDFText_SetText(
+            text_object,
+            ctypes.cast(buffer, ctypes.POINTER(pdfium_c.FPDF_WCHAR)),
+        )
+        pdfium_c.FPDFPageObj_Transform(text_object, 1, 0, 0, 1, x, y)
+        pdfium_c.FPDFPage_InsertObject(page, text_object)
+    pdfium_c.FPDFPage_GenerateContent(page)
+    pdf.save(str(path))
+    pdf.close()
+    return str(path)
+
+
+def analytical_page(path):
+    texts = [
+        (20, 570, "Demonstrativo Analítico de Receitas e Despesas"),
+        (20, 550, "2.1.01 - Salários Funcionários"),
+    ]
+    texts += [
+        (x, 530, title) for x, title in zip(COLUMNS_X, HEADER, strict=True)
+    ]
+    rows = [
+        ["05/02/2024", "SALARIO JOSE", "JOSÉ DA SILVA", "4348", "02/2024"],
+        ["06/02/2024", "Salario Attila", "Attila Alex", "4385", "02/2024"],
+    ]
+    for y, row in zip([515, 500], rows, strict=True):
+        texts += [
+            (x, y, cell) for x, cell in zip(COLUMNS_X, row, strict=False)
+        ]
+    # right aligned values, starting before the Valor header
+    texts += [(590, 515, "-1.340,08"), (596, 500, "-623,78")]
+    texts += [(20, 485, "TOTAL: 2.1.01 - Salários Funcionários")]
+    return make_pdf(path, texts)
+
+
+def test_read_text_lines_splits_cells_by_gap(tmp_path):
+    lines = read_text_lines(analytical_page(tmp_path / "page_1.pdf"))
+
+    assert [text for text, _, _ in lines[2]] == HEADER
+    assert lines[1][0][0] == "2.1.01 - Salários Funcionários"
+
+
+def test_assign_columns_uses_header_overlap():
+    header = [("Data", 0, 20), ("Descrição", 40, 80), ("Valor", 200, 220)]
+    cells = [("01/02/2024", 0, 45), ("Taxa", 40, 60), ("-1.000,00", 180, 220)]
+
+    assert assign_columns(header, cells) == ["01/02/2024", "Taxa", "-1.000,00"]
+
+
+def test_process_pdf_file_rebuilds_the_analytical_table(tmp_path):
+    output_path = process_pdf_file(
+        analytical_page(tmp_path / "page_1.pdf"), str(tmp_path / "page_1.txt")
+    )
+
+    assert output_path == str(tmp_path / "page_1.txt")
+    df = pd.read_csv(process_txt_file(output_path), dtype=str)
+    assert df["Data"].tolist() == ["2024-02-05", "2024-02-06"]
+    assert df["Participante"].tolist() == ["JOSÉ DA SILVA", "Attila Alex"]
+    assert df["Valor"].tolist() == ["-1340.08", "-623.78"]
+    assert set(df["ContaContabil"]) == {"2.1.01"}
+
+
+def test_process_pdf_file_without_text_layer(tmp_path):
+    page = make_pdf(tmp_path / "page_1.pdf", [])
+
+    assert process_pdf_file(page, str(tmp_path / "page_1.txt")) == ""
+    assert not (tmp_path / "page_1.txt").exists()
+
+
+def test_process_pdf_file_with_only_a_digital_header(tmp_path):
+    page = make_pdf(
+        tmp_path / "page_1.pdf",
+        [
+            (20, 570, "Demonstrativo Analítico de Receitas e Despesas"),
+            (20, 20, "Condomínio Edifício Exemplo - Página 12 de 80"),
+        ],
+    )
+
+    assert process_pdf_file(page, str(tmp_path / "page_1.txt")) == ""
+    assert not (tmp_path / "page_1.txt").exists()
@@ -1,7 +1,10 @@
+import csv
+
 import pandas as pd
 import pytest
 
 from rp_transformers import analytical
+from utils.config_loader import ConfigLoader
 
 
 @pytest.fixture
@@ -121,3 +124,110 @@ def test_transform_with_only_accounts(sample_csv, accounts_configuration_csv):
     df = pd.read_csv(sample_csv, dtype=str).fillna("")
     assert "PeriodoPrestacaoContas" in df.columns
     assert df["PeriodoPrestacaoContas"].iloc[0] == "2023-01"
+
+
+def test_transform_enriches_by_both_account_codes(tmp_path):
+    accounts = tmp_path / "accounts.csv"
+    accounts.write_text(
+        "ContaContabil,ContaContabilDescritivo,ContaContabilGrupo,"
+        "ContaContabilGrupoDescritivo,Natureza,NaturezaDescritivo,"
+        "ContaContabilNormalizado,CompoeTaxa,AcordadoAssembleia\n"
+        "1.01,Taxa,1.1,Receitas,1,Receita,1.1,True,False\n"
+        "1.001,Taxa antiga,1.1,Receitas,1,Receita,1.1,True,False\n"
+        "2.01,Salários,2.1,Pessoal,2,Despesa,2.1.01,True,True\n"
+    )
+    page = tmp_path / "page_12_2023-05.csv"
+    pd.DataFrame(
+        {
+            "Participante": ["", "", ""],
+            "ContaContabil": ["1.001", "2.1.01", "9.99"],
+            "file": ["page_12_2023-05.csv"] * 3,
+        }
+    ).to_csv(page, index=False)
+
+    analytical.transform_generated_analytical_data(
+        str(page),
+        str(accounts),
+        "",
+        config_loader=ConfigLoader(str(accounts), ""),
+    )
+
+    df = pd.read_csv(page, dtype=str).fillna("")
+    assert df["ContaContabilDescritivo"].to_list() == [
+        "Taxa antiga",
+        "Salários",
+        "",
+    ]
+    assert df["ContaContabil"].to_list() == ["1.1", "2.1.01", ""]
+    assert df["PeriodoPrestacaoContas"].to_list() == ["2023-05"] * 3
+    assert df.columns.to_list()[:9] == [
+        "ContaContabil",
+        "ContaContabilDescritivo",
+        "AcordadoAssembleia",
+        "CompoeTaxa",
+        "NaturezaDescritivo",
+        "Natureza",
+        "ContaContabilGrupoDescritivo",
+        "ContaContabilGrupo",
+        "PeriodoPrestacaoContas",
+    ]
+
+
+def test_rename_units_with_index(units_renamed_csv):
+    units_index = analytical.build_units_index(
+        ConfigLoader("", units_renamed_csv)
+    )
+    assert units_index == {
+        "888-QD88-LT88": "Un. R22-888-QD88-LT88",
+        "999-QD99-LT99": "Un. R16-999-QD99-LT99",
+    }
+    participantes = pd.Series(
+        ["Un. 999-QD99-LT99", "Un. 111-QD11-LT11", "Fornecedor", ""]
+    )
+    renamed_participants = pd.read_csv(units_renamed_csv)["Participante"]
+    assert analytical.rename_units(
+        participantes, units_index, renamed_participants
+    ).to_list() == [
+        "Un. R16-999-QD99-LT99",
+        "Un. 111-QD11-LT11",
+        "Fornecedor",
+        "",
+    ]
+
+
+def test_rename_units_matches_other_participants_as_rename_unit():
+    renamed_participants = pd.Series(
+        ["Un. R22-888-QD88-LT88", "ACME Fornecedor Ltda", None]
+    )
+    units_index = {"888-QD88-LT88": "Un. R22-888-QD88-LT88"}
+    participantes = pd.Series(
+        ["Fornecedor", "Un. 888-QD88-LT88", "Outro", "Fornecedor", ""]
+    )
+
+    assert analytical.rename_units(
+        participantes, units_index, renamed_participants
+    ).to_list() == [
+        "ACME Fornecedor Ltda",
+        "Un. R22-888-QD88-LT88",
+        "Outro",
+        "ACME Fornecedor Ltda",
+        "",
+    ]
+
+
+def test_to_text_table_matches_csv_round_trip(tmp_path):
+    table = pd.DataFrame(
+        {
+            "Data": pd.to_datetime(["02/01/2024", None], format="%d/%m/%Y"),
+            "Documento": ["None", "NA"],
+            "Participante": [None, "JOSÉ"],
+            "Valor": pd.array([-1340.08, None], dtype="Float64"),
+        },
+        index=[3, 7],
+    )
+    csv_path = tmp_path / "page.csv"
+    table.to_csv(csv_path, index=False, quoting=csv.QUOTE_NONNUMERIC)
+    pd.testing.assert_frame_equal(
+        analytical.to_text_table(table),
+        pd.read_csv(csv_path, dtype=str).fillna(""),
+    )
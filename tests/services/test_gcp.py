@@ -0,0 +1,266 @@
+import io
+
+import pyarrow
+import pyarrow.parquet
+import pytest
+from google.cloud import bigquery
+
+from services.gcp import (
+    CLUSTERING_FIELDS,
+    CsvBatchLoader,
+    clear_data_analytical_from_file,
+    cluster_analytical_table,
+    csv_to_arrow,
+    replace_files_from_staging,
+    upload_csv_to_bigquery,
+    upload_parquet_to_bigquery,
+)
+from utils.constants import UploadFormat
+
+
+class FakeLoadJob:
+    def result(self):
+        return None
+
+
+class FakeTable:
+    clustering_fields = None
+
+
+class FakeBigQueryClient:
+    """
+    Local stand-in recording the content of every load job.
+    """
+
+    project = "test-project"
+
+    def __init__(self):
+        self.loads: list[tuple[str, bytes]] = []
+        self.job_configs: list[bigquery.LoadJobConfig] = []
+        self.queries: list[tuple[str, bigquery.QueryJobConfig]] = []
+        self.table = FakeTable()
+        self.table_updates = 0
+
+    def query(self, query, job_config=None):
+        self.queries.append((query, job_config))
+        return FakeLoadJob()
+
+    def get_table(self, table_ref):
+        return self.table
+
+    def update_table(self, table, fields):
+        self.table_updates += 1
+        return table
+
+    def load_table_from_file(self, source, table_ref, job_config=None):
+        self.loads.append((table_ref, source.read()))
+        self.job_configs.append(job_config)
+        return FakeLoadJob()
+
+
+def page_csv(file: str, rows: int) -> bytes:
+    lines = ['"Data","Valor","file"']
+    lines += [f'"2024-01-0{i + 1}","{i}.5","{file}"' for i in range(rows)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def test_upload_csv_to_bigquery_from_path_or_bytes(tmp_path):
+    client = FakeBigQueryClient()
+    csv_path = tmp_path / "page.csv"
+    csv_path.write_bytes(page_csv("page.csv", 1))
+
+    upload_csv_to_bigquery(client, str(csv_path), "ds", "tbl")
+    upload_csv_to_bigquery(
+        client, io.BytesIO(page_csv("page.csv", 1)), "ds", "tbl"
+    )
+
+    assert client.loads == [
+        ("test-project.ds.tbl", page_csv("page.csv", 1)),
+        ("test-project.ds.tbl", page_csv("page.csv", 1)),
+    ]
+
+
+def test_batch_loader_uses_one_job_for_many_pages():
+    client = FakeBigQueryClient()
+    loaded = []
+    loader = CsvBatchLoader(client, "ds", "tbl")
+    for page in range(3):
+        loader.add(
+            page_csv(f"page_{page}.csv", 2),
+            lambda page=page: loaded.append(page),
+        )
+    assert client.loads == []
+    assert loaded == []
+
+    loader.flush()
+    loader.flush()
+
+    assert loader.jobs == 1
+    assert loaded == [0, 1, 2]
+    lines = client.loads[0][1].decode().splitlines()
+    assert lines[0] == '"Data","Valor","file"'
+    assert len(lines) == 7
+    # each row still points to its page
+    assert [line.split(",")[-1] for line in lines[1:]] == [
+        f'"page_{page}.csv"' for page in range(3) for _ in range(2)
+    ]
+
+
+def test_batch_loader_bounds_the_batch_size():
+    client = FakeBigQueryClient()
+    page = page_csv("page.csv", 3)
+    loader = CsvBatchLoader(client, "ds", "tbl", max_batch_bytes=len(page) * 2)
+    for _ in range(5):
+        loader.add(page)
+    loader.flush()
+
+    assert loader.jobs == 3
+    assert all(len(data) <= len(page) * 2 for _, data in client.loads)
+    rows = sum(len(data.splitlines()) - 1 for _, data in client.loads)
+    assert rows == 15
+
+
+def test_batch_loader_splits_pages_with_other_columns():
+    client = FakeBigQueryClient()
+    loader = CsvBatchLoader(client, "ds", "tbl")
+    loader.add(page_csv("page_1.csv", 1))
+    loader.add(b'"Data","file"\n"2024-01-01","page_2.csv"')
+    loader.flush()
+
+    assert loader.jobs == 2
+    assert client.loads[1][1] == b'"Data","file"\n"2024-01-01","page_2.csv"\n'
+
+
+ANALYTICAL_CSV = (
+    b'"Data","Descricao","Valor","CompoeTaxa","AcordadoAssembleia","file"\n'
+    b'"2024-01-31","Taxa","1234.56","True","False","page_1.csv"\n'
+    b'"","Saldo","","","","page_1.csv"\n'
+)
+
+
+def test_csv_to_arrow_types_the_columns():
+    table = csv_to_arrow(io.BytesIO(ANALYTICAL_CSV))
+
+    assert table.schema.field("Data").type == pyarrow.date32()
+    assert table.schema.field("Valor").type == pyarrow.float64()
+    assert table.schema.field("CompoeTaxa").type == pyarrow.bool_()
+    assert pyarrow.types.is_dictionary(table.schema.field("Descricao").type)
+    rows = table.to_pylist()
+    assert str(rows[0]["Data"]) == "2024-01-31"
+    assert rows[0]["Valor"] == 1234.56
+    assert rows[0]["CompoeTaxa"] is True
+    assert rows[0]["AcordadoAssembleia"] is False
+    # empty cells are nulls, as in the csv load
+    assert rows[1]["Data"] is None
+    assert rows[1]["Valor"] is None
+    assert rows[1]["CompoeTaxa"] is None
+    assert rows[1]["file"] == "page_1.csv"
+
+
+@pytest.mark.parametrize(
+    "row,message",
+    [
+        (
+            b'"2024-02-30","Taxa","1.00","True","False","page_1.csv"\n',
+            "column Data: line 4: '2024-02-30'",
+        ),
+        (
+            b'"2024-01-31","Taxa","1.234,56","True","False","page_1.csv"\n',
+            "column Valor: line 4: '1.234,56'",
+        ),
+        (
+            b'"2024-01-31","Taxa","1.00","Sim","False","page_1.csv"\n',
+            "column CompoeTaxa: line 4: 'Sim'",
+        ),
+    ],
+)
+def test_csv_to_arrow_rejects_malformed_cells(row, message):
+    with pytest.raises(ValueError, match=message):
+        csv_to_arrow(io.BytesIO(ANALYTICAL_CSV + row))
+
+
+def test_upload_parquet_to_bigquery_rejects_malformed_cells():
+    client = FakeBigQueryClient()
+    malformed = ANALYTICAL_CSV + (
+        b'"31/01/2024","Taxa","abc","True","False","page_1.csv"\n'
+    )
+
+    with pytest.raises(ValueError, match="column Data"):
+        upload_parquet_to_bigquery(client, io.BytesIO(malformed), "ds", "tbl")
+    assert client.loads == []
+
+
+def test_upload_parquet_to_bigquery_declares_the_schema():
+    client = FakeBigQueryClient()
+
+    upload_parquet_to_bigquery(client, io.BytesIO(ANALYTICAL_CSV), "ds", "tbl")
+
+    job_config = client.job_configs[0]
+    assert job_config.source_format == bigquery.SourceFormat.PARQUET
+    assert {field.name: field.field_type for field in job_config.schema} == {
+        "Data": "DATE",
+        "Descricao": "STRING",
+        "Valor": "FLOAT64",
+        "CompoeTaxa": "BOOL",
+        "AcordadoAssembleia": "BOOL",
+        "file": "STRING",
+    }
+    table = pyarrow.parquet.read_table(io.BytesIO(client.loads[0][1]))
+    assert table.num_rows == 2
+
+
+def test_parquet_is_smaller_than_csv_for_repeated_text():
+    client = FakeBigQueryClient()
+    page = page_csv("a_long_file_name_repeated_on_every_row.csv", 9)
+
+    loader = CsvBatchLoader(
+        client, "ds", "tbl", upload_format=UploadFormat.parquet
+    )
+    for _ in range(200):
+        loader.add(page)
+    loader.flush()
+
+    assert loader.jobs == 1
+    assert client.job_configs[0].source_format == (
+        bigquery.SourceFormat.PARQUET
+    )
+    assert len(client.loads[0][1]) < len(page) * 200 / 10
+
+
+def test_clear_data_passes_the_file_as_parameter():
+    client = FakeBigQueryClient()
+
+    clear_data_analytical_from_file(client, "ds", "tbl", "page_1'.csv")
+
+    query, job_config = client.queries[0]
+    assert "page_1" not in query
+    assert "@file" in query
+    assert job_config.query_parameters[0].value == "page_1'.csv"
+
+
+def test_replace_files_from_staging_runs_one_merge():
+    client = FakeBigQueryClient()
+
+    replace_files_from_staging(
+        client, "ds", "tbl", "tbl_staging", ["page_1.csv", "page_2.csv"]
+    )
+
+    assert len(client.queries) == 1
+    query, job_config = client.queries[0]
+    assert "merge `test-project.ds.tbl`" in query
+    assert "using `test-project.ds.tbl_staging`" in query
+    assert "unnest(@files)" in query
+    assert job_config.query_parameters[0].values == [
+        "page_1.csv",
+        "page_2.csv",
+    ]
+
+
+def test_cluster_analytical_table_only_once():
+    client = FakeBigQueryClient()
+
+    cluster_analytical_table(client, "ds", "tbl")
+    cluster_analytical_table(client, "ds", "tbl")
+
+    assert client.table.clustering_fields == CLUSTERING_FIELDS
+    assert client.table_updates == 1
@@ -1,11 +1,32 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import MagicMock, patch
 
+import pytest
+from unstract.llmwhisperer import client_v2
 from unstract.llmwhisperer.client_v2 import LLMWhispererClientException
 
-from services.llmwhisperer import process_pdf_file
+from services.llmwhisperer import (
+    WHISPER_OPTIONS,
+    get_client,
+    process_pdf_file,
+    process_pdf_files,
+)
+from utils.constants import MethodType
+from utils.ocr_cache import OcrCache
 
 
-@patch("services.llmwhisperer.LLMWhispererClientV2")
+@pytest.fixture(autouse=True)
+def clear_client_cache():
+    """Each test starts without the process-wide client."""
+    get_client.cache_clear()
+    original_requests = client_v2.requests
+    yield
+    client_v2.requests = original_requests
+    get_client.cache_clear()
+
+
+@patch("services.llmwhisperer.PooledLLMWhispererClient")
 def test_process_file_success(mock_client_cls, tmp_path):
     # Arrange
     mock_client = MagicMock()
@@ -27,7 +48,7 @@ def test_process_file_success(mock_client_cls, tmp_path):
         assert f.read() == "extracted text"
 
 
-@patch("services.llmwhisperer.LLMWhispererClientV2")
+@patch("services.llmwhisperer.PooledLLMWhispererClient")
 def test_process_file_exception(mock_client_cls, tmp_path):
     # Arrange
     mock_client = MagicMock()
@@ -41,3 +62,255 @@ def test_process_file_exception(mock_client_cls, tmp_path):
     )
     # Assert
     assert output_path == ""
+
+
+class FakeAsyncClient:
+    """Stand-in client whose extractions finish after a few status polls."""
+
+    def __init__(self, polls_until_done=2, failing=()):
+        self.polls_until_done = polls_until_done
+        self.failing = set(failing)
+        self.polls: dict[str, int] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def whisper(self, file_path, wait_for_completion, **_):
+        assert wait_for_completion is False
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.polls[file_path] = 0
+        return {"status_code": 202, "whisper_hash": file_path}
+
+    def whisper_status(self, whisper_hash):
+        if whisper_hash in self.failing:
+            self.in_flight -= 1
+            return {"status": "error", "message": "bad page"}
+        self.polls[whisper_hash] += 1
+        if self.polls[whisper_hash] < self.polls_until_done:
+            return {"status": "processing"}
+        return {"status": "processed"}
+
+    def whisper_retrieve(self, whisper_hash):
+        self.in_flight -= 1
+        return {"extraction": {"result_text": f"text of {whisper_hash}"}}
+
+
+def test_process_pdf_files_bounds_in_flight_and_keeps_order(tmp_path):
+    client = FakeAsyncClient(polls_until_done=3)
+    jobs = [
+        (f"page_{i}.pdf", str(tmp_path / f"page_{i}.txt")) for i in range(10)
+    ]
+
+    outputs = list(
+        process_pdf_files(
+            jobs, max_in_flight=3, poll_interval=0, client=client
+        )
+    )
+
+    assert outputs == [output_path for _, output_path in jobs]
+    assert client.max_in_flight == 3
+    for input_path, output_path in jobs:
+        with open(output_path) as f:
+            assert f.read() == f"text of {input_path}"
+
+
+def test_process_pdf_files_reports_failed_pages(tmp_path):
+    client = FakeAsyncClient(failing={"page_1.pdf"})
+    jobs = [
+        (f"page_{i}.pdf", str(tmp_path / f"page_{i}.txt")) for i in range(3)
+    ]
+
+    outputs = list(process_pdf_files(jobs, poll_interval=0, client=client))
+
+    assert outputs == [jobs[0][1], "", jobs[2][1]]
+
+
+def test_process_pdf_files_submission_error(tmp_path):
+    client = MagicMock()
+    client.whisper.side_effect = LLMWhispererClientException("API error")
+    jobs = [("page_1.pdf", str(tmp_path / "page_1.txt"))]
+
+    assert list(process_pdf_files(jobs, poll_interval=0, client=client)) == [
+        ""
+    ]
+
+
+def test_process_file_with_injected_client(tmp_path):
+    client = MagicMock()
+    client.whisper.return_value = {"extraction": {"result_text": "injected"}}
+    test_pdf = tmp_path / "test.pdf"
+    test_pdf.write_text("dummy pdf content")
+
+    with patch("services.llmwhisperer.PooledLLMWhispererClient") as client_cls:
+        output_path = process_pdf_file(
+            str(test_pdf), str(tmp_path / "test.txt"), client=client
+        )
+        client_cls.assert_not_called()
+
+    with open(output_path) as f:
+        assert f.read() == "injected"
+
+
+@patch("services.llmwhisperer.PooledLLMWhispererClient")
+def test_get_client_is_created_once(mock_client_cls):
+    assert get_client() is get_client()
+    mock_client_cls.assert_called_once()
+
+
+def test_get_client_uses_its_pooled_session():
+    client = get_client(pool_size=4)
+    assert client_v2.requests.Session() is not client.session
+    with client._using_session():
+        assert client_v2.requests.Session() is client.session
+    adapter = client.session.get_adapter("https://llmwhisperer.example")
+    assert adapter._pool_maxsize == 4
+    # everything else still comes from requests
+    assert client_v2.requests.Request is not None
+
+
+def test_get_client_keeps_the_session_of_existing_clients():
+    client = get_client(pool_size=4)
+    session = client.session
+    other = get_client(pool_size=2, keep_alive=False)
+
+    assert client.session is session
+    assert other.session is not session
+    adapter = session.get_adapter("https://llmwhisperer.example")
+    assert adapter._pool_maxsize == 4
+    assert adapter.keep_alive
+    assert not other.session.get_adapter("https://x.example").keep_alive
+
+
+@pytest.fixture
+def stand_in_server(monkeypatch):
+    """Local LLMWhisperer status endpoint recording what it receives."""
+    received = {"connection": [], "connections": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive unless asked to close
+
+        def setup(self):
+            received["connections"] += 1
+            super().setup()
+
+        def do_GET(self):  # noqa: N802
+            received["connection"].append(self.headers.get("Connection"))
+            body = b'{"status": "processed"}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv(
+        "LLMWHISPERER_BASE_URL_V2", f"http://127.0.0.1:{server.server_port}"
+    )
+    yield received
+    server.shutdown()
+    server.server_close()
+
+
+def test_pooled_client_reuses_its_connection(stand_in_server):
+    client = get_client(pool_size=4)
+
+    client.whisper_status(whisper_hash="h")
+    client.whisper_status(whisper_hash="h")
+
+    assert stand_in_server["connections"] == 1
+    assert "close" not in stand_in_server["connection"]
+
+
+def test_pooled_client_without_keep_alive_closes_connections(
+    stand_in_server,
+):
+    client = get_client(keep_alive=False)
+
+    client.whisper_status(whisper_hash="h")
+    client.whisper_status(whisper_hash="h")
+
+    assert stand_in_server["connection"] == ["close", "close"]
+    assert stand_in_server["connections"] == 2
+
+
+def test_other_clients_keep_their_own_sessions(stand_in_server):
+    get_client(keep_alive=False)
+
+    client_v2.LLMWhispererClientV2().whisper_status(whisper_hash="h")
+
+    assert stand_in_server["connection"] == [None]
+
+
+def test_process_file_reads_cached_extraction(tmp_path):
+    cache = OcrCache(str(tmp_path / "cache"))
+    test_pdf = tmp_path / "test.pdf"
+    test_pdf.write_text("dummy pdf content")
+    client = MagicMock()
+    client.whisper.return_value = {
+        "extraction": {"result_text": "extracted text"}
+    }
+
+    first = process_pdf_file(
+        str(test_pdf), str(tmp_path / "first.txt"), client=client, cache=cache
+    )
+    second = process_pdf_file(
+        str(test_pdf), str(tmp_path / "second.txt"), client=client, cache=cache
+    )
+
+    client.whisper.assert_called_once()
+    assert first == str(tmp_path / "first.txt")
+    with open(second) as f:
+        assert f.read() == "extracted text"
+
+
+def test_process_pdf_files_skips_cached_pages(tmp_path):
+    cache = OcrCache(str(tmp_path / "cache"))
+    jobs = []
+    for i in range(3):
+        page = tmp_path / f"page_{i}.pdf"
+        page.write_text(f"page {i}")
+        jobs.append((str(page), str(tmp_path / f"page_{i}.txt")))
+    cache.put(jobs[1][0], MethodType.llmwhisperer, WHISPER_OPTIONS, b"cached")
+    client = FakeAsyncClient(polls_until_done=1)
+
+    outputs = list(
+        process_pdf_files(
+            jobs, max_in_flight=2, poll_interval=0, client=client, cache=cache
+        )
+    )
+
+    assert outputs == [output for _, output in jobs]
+    assert jobs[1][0] not in client.polls
+    with open(jobs[1][1]) as f:
+        assert f.read() == "cached"
+
+
+def test_process_pdf_files_streams_cached_pages(tmp_path):
+    cache = OcrCache(str(tmp_path / "cache"))
+    read = []
+
+    def jobs():
+        for i in range(6):
+            page = tmp_path / f"page_{i}.pdf"
+            page.write_text(f"page {i}")
+            cache.put(
+                str(page), MethodType.llmwhisperer, WHISPER_OPTIONS, b"cached"
+            )
+            read.append(i)
+            yield str(page), str(tmp_path / f"page_{i}.txt")
+
+    outputs = process_pdf_files(
+        jobs(),
+        max_in_flight=2,
+        poll_interval=0,
+        client=MagicMock(),
+        cache=cache,
+    )
+
+    assert next(outputs) == str(tmp_path / "page_0.txt")
+    assert read == [0, 1]
+    assert len(list(outputs)) == 5
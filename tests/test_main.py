@@ -7,8 +7,10 @@ import pytest
 import typer
 from typer.testing import CliRunner
 
-from main import analytical_app, app, spliter_app
-from utils.constants import FileType
+from main import MEGABYTE, analytical_app, app, cache_app, spliter_app
+from utils.constants import FileType, MethodType, UploadFormat
+from utils.job_state import JobState
+from utils.ocr_cache import OcrCache
 
 
 def test_cli_setup():
@@ -158,6 +160,36 @@ def test_run_command_with_all_parameters(
     kwargs = call_args[1]
     assert kwargs["reprocess"] is True
     assert kwargs["upload"] is True
+    assert kwargs["workers"] == 1
+
+
+def test_run_command_with_workers(
+    mock_env_vars, mock_bigquery_client, mock_run_analytical
+):
+    """Test run command forwarding the number of split workers."""
+    runner = CliRunner()
+    result = runner.invoke(
+        analytical_app, ["run", "test.pdf", "--workers", "8"]
+    )
+
+    assert result.exit_code == 0
+    kwargs = mock_run_analytical.call_args[1]
+    assert kwargs["workers"] == 8
+
+
+def test_run_command_with_stream(
+    mock_env_vars, mock_bigquery_client, mock_run_analytical
+):
+    """Test run command enabling the streaming pipeline."""
+    runner = CliRunner()
+    result = runner.invoke(
+        analytical_app, ["run", "test.pdf", "--stream", "--queue-size", "2"]
+    )
+
+    assert result.exit_code == 0
+    kwargs = mock_run_analytical.call_args[1]
+    assert kwargs["stream"] is True
+    assert kwargs["queue_size"] == 2
 
 
 def test_run_command_method_llmwhisperer(
@@ -181,6 +213,353 @@ def test_run_command_method_llmwhisperer(
         assert kwargs["process_txt_file_fn"] == mock_txt_llm
 
 
+def test_run_command_with_max_in_flight(
+    mock_env_vars, mock_bigquery_client, mock_run_analytical
+):
+    """Test run command enabling concurrent LLMWhisperer submissions."""
+    with patch("main.process_pdf_files_llmwhisperer") as mock_pdf_files_llm:
+        runner = CliRunner()
+        result = runner.invoke(
+            analytical_app, ["run", "test.pdf", "--max-in-flight", "16"]
+        )
+
+        assert result.exit_code == 0
+        kwargs = mock_run_analytical.call_args[1]
+        assert kwargs["process_pdf_files_fn"].func == mock_pdf_files_llm
+        assert kwargs["process_pdf_files_fn"].keywords == {"max_in_flight": 16}
+
+        # a single page in flight keeps the sequential submission
+        result = runner.invoke(analytical_app, ["run", "test.pdf"])
+        assert result.exit_code == 0
+        assert mock_run_analytical.call_args[1]["process_pdf_files_fn"] is None
+
+
+def test_run_command_with_docling_workers(
+    mock_env_vars, mock_bigquery_client, mock_run_analytical
+):
+    """Test run command converting pages in a pool of docling workers."""
+    with (
+        patch("main.process_pdf_files_docling") as mock_pdf_files_docling,
+        patch("main.log_docling_metrics"),
+    ):
+        runner = CliRunner()
+        result = runner.invoke(
+            analytical_app,
+            [
+                "run",
+                "test.pdf",
+                "--method",
+                "docling",
+                "--docling-workers",
+                "8",
+                "--docling-threads",
+                "4",
+            ],
+        )
+
+        assert result.exit_code == 0
+        kwargs = mock_run_analytical.call_args[1]
+        assert kwargs["process_pdf_files_fn"].func == mock_pdf_files_docling
+        assert kwargs["process_pdf_files_fn"].keywords == {
+            "workers": 8,
+            "num_threads": 4,
+        }
+
+
+def test_run_command_with_text_layer(
+    mock_env_vars, mock_bigquery_client, mock_run_analytical
+):
+    """Test run command enabling the native text layer fast path."""
+    runner = CliRunner()
+    result = runner.invoke(analytical_app, ["run", "test.pdf", "--text-layer"])
+
+    assert result.exit_code == 0
+    assert mock_run_analytical.call_args[1]["text_layer"] is True
+
+    result = runner.invoke(analytical_app, ["run", "test.pdf"])
+    assert result.exit_code == 0
+    assert mock_run_analytical.call_args[1]["text_layer"] is False
+
+
+def test_run_command_with_auto_range(
+    mock_env_vars, mock_bigquery_client, mock_run_analytical, tmp_path
+):
+    """Test run command using the detected analytical chapter pages."""
+    with patch(
+        "main.cached_chapter_range", return_value=(43, 120)
+    ) as mock_range:
+        runner = CliRunner()
+        result = runner.invoke(
+            analytical_app,
+            [
+                "run",
+                "test.pdf",
+                "--auto-range",
+                "--chapter-cache-dir",
+                str(tmp_path),
+            ],
+        )
+
+        assert result.exit_code == 0
+        mock_range.assert_called_once_with("test.pdf", str(tmp_path))
+        args = mock_run_analytical.call_args[0]
+        assert args[2:4] == (42, 119)
+
+
+def test_run_command_auto_range_not_found(
+    mock_env_vars, mock_bigquery_client, mock_run_analytical
+):
+    """Test run command failing when the chapter is not found."""
+    with patch("main.cached_chapter_range", return_value=None):
+        runner = CliRunner()
+        result = runner.invoke(
+            analytical_app, ["run", "test.pdf", "--auto-range"]
+        )
+
+        assert result.exit_code != 0
+        mock_run_analytical.assert_not_called()
+
+
+def test_run_command_with_keep_intermediates(
+    mock_env_vars, mock_bigquery_client, mock_run_analytical
+):
+    """Test run command handing parsed pages in memory."""
+    runner = CliRunner()
+    result = runner.invoke(
+        analytical_app, ["run", "test.pdf", "--keep-intermediates"]
+    )
+
+    assert result.exit_code == 0
+    kwargs = mock_run_analytical.call_args[1]
+    assert kwargs["keep_intermediates"] is True
+    assert kwargs["parse_txt_file_fn"] is not None
+
+    result = runner.invoke(
+        analytical_app, ["run", "test.pdf", "--method", "docling"]
+    )
+    assert result.exit_code == 0
+    kwargs = mock_run_analytical.call_args[1]
+    assert kwargs["keep_intermediates"] is False
+    assert kwargs["parse_txt_file_fn"] is None
+
+
+def test_run_command_with_upload_batch(
+    mock_env_vars, mock_bigquery_client, mock_run_analytical
+):
+    """Test run command batching the BigQuery load jobs."""
+    runner = CliRunner()
+    result = runner.invoke(analytical_app, ["run", "test.pdf", "--upload"])
+    assert result.exit_code == 0
+    assert mock_run_analytical.call_args[1]["upload_batch_bytes"] == (
+        64 * MEGABYTE
+    )
+
+    result = runner.invoke(
+        analytical_app, ["run", "test.pdf", "--upload", "--upload-batch-mb=0"]
+    )
+    assert result.exit_code == 0
+    assert mock_run_analytical.call_args[1]["upload_batch_bytes"] == 0
+
+
+def test_run_command_with_upload_format(
+    mock_env_vars, mock_bigquery_client, mock_run_analytical
+):
+    """Test run command loading the pages as typed Parquet."""
+    runner = CliRunner()
+    result = runner.invoke(analytical_app, ["run", "test.pdf", "--upload"])
+    assert result.exit_code == 0
+    assert mock_run_analytical.call_args[1]["upload_format"] == (
+        UploadFormat.csv
+    )
+
+    result = runner.invoke(
+        analytical_app,
+        ["run", "test.pdf", "--upload", "--upload-format", "parquet"],
+    )
+    assert result.exit_code == 0
+    assert mock_run_analytical.call_args[1]["upload_format"] == (
+        UploadFormat.parquet
+    )
+
+
+def test_run_command_with_offline_config(
+    mock_env_vars, mock_bigquery_client, mock_run_analytical, tmp_path
+):
+    """Test run command loading the configuration sheets from snapshots."""
+    runner = CliRunner()
+    result = runner.invoke(
+        analytical_app,
+        [
+            "run",
+            "test.pdf",
+            "--offline-config",
+            "--config-cache-dir",
+            str(tmp_path),
+        ],
+    )
+
+    assert result.exit_code == 0
+    config_loader = mock_run_analytical.call_args[1]["config_loader"]
+    assert config_loader.offline is True
+    assert config_loader.snapshot_dir == str(tmp_path)
+    assert config_loader.accounts_url == "test-sheet-url"
+    assert config_loader.units_url == "test-units-url"
+
+
+def test_run_command_shares_ocr_client(
+    mock_env_vars, mock_bigquery_client, mock_run_analytical
+):
+    """Test run command injecting a single pooled LLMWhisperer client."""
+    with patch("main.get_llmwhisperer_client") as mock_get_client:
+        runner = CliRunner()
+        result = runner.invoke(
+            analytical_app,
+            ["run", "test.pdf", "--pool-size", "4", "--no-keep-alive"],
+        )
+
+        assert result.exit_code == 0
+        mock_get_client.assert_called_once_with(4, False)
+        kwargs = mock_run_analytical.call_args[1]
+        assert kwargs["ocr_client"] == mock_get_client.return_value
+
+
+def test_run_command_with_ocr_cache(
+    mock_env_vars, mock_bigquery_client, mock_run_analytical, tmp_path
+):
+    """Test run command configuring and disabling the OCR result cache."""
+    runner = CliRunner()
+    result = runner.invoke(
+        analytical_app,
+        [
+            "run",
+            "test.pdf",
+            "--ocr-cache-dir",
+            str(tmp_path),
+            "--ocr-cache-max-size-mb",
+            "2",
+        ],
+    )
+
+    assert result.exit_code == 0
+    ocr_cache = mock_run_analytical.call_args[1]["ocr_cache"]
+    assert ocr_cache.directory == str(tmp_path)
+    assert ocr_cache.max_size_bytes == 2 * 1024 * 1024
+
+    result = runner.invoke(
+        analytical_app, ["run", "test.pdf", "--no-ocr-cache"]
+    )
+    assert result.exit_code == 0
+    assert mock_run_analytical.call_args[1]["ocr_cache"] is None
+
+
+def test_run_command_with_job_state(
+    mock_env_vars, mock_bigquery_client, mock_run_analytical, tmp_path
+):
+    """Test run command enabling the job state, off by default."""
+    runner = CliRunner()
+    result = runner.invoke(analytical_app, ["run", "test.pdf"])
+
+    assert result.exit_code == 0
+    assert mock_run_analytical.call_args[1]["job_state"] is None
+
+    db_path = str(tmp_path / "jobs.sqlite")
+    result = runner.invoke(
+        analytical_app,
+        ["run", "test.pdf", "--job-state", "--job-state-db", db_path],
+    )
+    assert result.exit_code == 0
+    assert mock_run_analytical.call_args[1]["job_state"].db_path == db_path
+
+
+def test_status_command(tmp_path):
+    """Test status command summarizing the last run."""
+    runner = CliRunner()
+    db_path = str(tmp_path / "jobs.sqlite")
+
+    result = runner.invoke(
+        analytical_app, ["status", "--job-state-db", db_path]
+    )
+    assert result.exit_code != 0
+    assert not os.path.exists(db_path)
+
+    run_state = JobState(db_path).start_run(str(tmp_path / "doc.pdf"))
+    run_state.record("page_1.pdf", "uploaded")
+    run_state.record("page_2.pdf", "ocr")
+    run_state.fail("page_2.pdf", "bad table")
+    run_state.finish("bad table")
+
+    result = runner.invoke(
+        analytical_app, ["status", "--job-state-db", db_path]
+    )
+    assert result.exit_code == 0
+    assert f"run 1: {tmp_path / 'doc.pdf'} (failed)" in result.output
+    assert "uploaded 1" in result.output
+    assert "failed at ocr: page_2.pdf: bad table" in result.output
+
+
+def test_batch_command_with_ranges(
+    mock_env_vars, mock_bigquery_client, tmp_path
+):
+    """Test batch command taking the ranges of the manifest."""
+    for name in ["2023-12.pdf", "2024-01.pdf", "2024-02.pdf"]:
+        (tmp_path / name).write_bytes(b"")
+    ranges = tmp_path / "ranges.json"
+    ranges.write_text(
+        '{"2023-12.pdf": {"start": 12, "end": 80}, "2024-02.pdf": "auto"}'
+    )
+    runner = CliRunner()
+
+    with (
+        patch("main.run_batch_analytical_import") as mock_batch,
+        patch("main.cached_chapter_range", return_value=(43, 120)),
+    ):
+        result = runner.invoke(
+            analytical_app,
+            [
+                "batch",
+                str(tmp_path),
+                "--ranges",
+                str(ranges),
+                "--start",
+                "5",
+                "--max-in-flight",
+                "4",
+                "--upload",
+            ],
+        )
+
+    assert result.exit_code == 0
+    mock_batch.assert_called_once()
+    assert mock_batch.call_args[0][0] == [
+        (str(tmp_path / "2023-12.pdf"), 12, 80),
+        (str(tmp_path / "2024-01.pdf"), 5, None),
+        (str(tmp_path / "2024-02.pdf"), 42, 119),
+    ]
+    kwargs = mock_batch.call_args[1]
+    assert kwargs["upload"] is True
+    assert kwargs["process_pdf_files_fn"].keywords["max_in_flight"] == 4
+    assert kwargs["dataset_id"] == "test-dataset"
+
+
+def test_batch_command_with_unknown_document_in_ranges(
+    mock_env_vars, mock_bigquery_client, tmp_path
+):
+    """Test batch command failing on a manifest naming a missing PDF."""
+    (tmp_path / "2023-12.pdf").write_bytes(b"")
+    ranges = tmp_path / "ranges.json"
+    ranges.write_text('{"2023-11.pdf": {"start": 1}}')
+    runner = CliRunner()
+
+    with patch("main.run_batch_analytical_import") as mock_batch:
+        result = runner.invoke(
+            analytical_app,
+            ["batch", str(tmp_path / "*.pdf"), "--ranges", str(ranges)],
+        )
+
+    assert result.exit_code != 0
+    mock_batch.assert_not_called()
+
+
 def test_run_command_method_docling(
     mock_env_vars, mock_bigquery_client, mock_run_analytical
 ):
@@ -279,6 +658,37 @@ def test_reprocess_command_with_all_parameters(
     assert kwargs["upload"] is True
 
 
+def test_reprocess_command_with_staging_merge(
+    mock_env_vars, mock_bigquery_client, mock_reprocess_analytical
+):
+    """Test reprocess command replacing the rows through a staging table."""
+    runner = CliRunner()
+    result = runner.invoke(
+        analytical_app, ["reprocess", "output", "--file-type", ".csv"]
+    )
+    assert result.exit_code == 0
+    kwargs = mock_reprocess_analytical.call_args[1]
+    assert kwargs["staging_merge"] is False
+    assert kwargs["cluster_table"] is False
+
+    result = runner.invoke(
+        analytical_app,
+        [
+            "reprocess",
+            "output",
+            "--file-type",
+            ".csv",
+            "--upload",
+            "--staging-merge",
+            "--cluster-table",
+        ],
+    )
+    assert result.exit_code == 0
+    kwargs = mock_reprocess_analytical.call_args[1]
+    assert kwargs["staging_merge"] is True
+    assert kwargs["cluster_table"] is True
+
+
 def test_reprocess_command_method_selection(
     mock_env_vars, mock_bigquery_client, mock_reprocess_analytical
 ):
@@ -329,7 +739,7 @@ def test_run_split_default_parameters(mock_split_pdf_to_pages):
 
     assert result.exit_code == 0
     mock_split_pdf_to_pages.assert_called_once_with(
-        test_path, "output", 1, None
+        test_path, "output", 1, None, 1
     )
 
 
@@ -356,7 +766,20 @@ def test_run_split_with_all_parameters(mock_split_pdf_to_pages):
 
     assert result.exit_code == 0
     mock_split_pdf_to_pages.assert_called_once_with(
-        test_path, output_dir, start, end
+        test_path, output_dir, start, end, 1
+    )
+
+
+def test_run_split_with_workers(mock_split_pdf_to_pages):
+    """Test run_split command forwarding the number of workers."""
+    runner = CliRunner()
+    test_path = "test.pdf"
+
+    result = runner.invoke(spliter_app, [test_path, "--workers", "4"])
+
+    assert result.exit_code == 0
+    mock_split_pdf_to_pages.assert_called_once_with(
+        test_path, "output", 1, None, 4
     )
 
 
@@ -370,7 +793,7 @@ def test_run_split_with_partial_parameters(mock_split_pdf_to_pages):
 
     assert result.exit_code == 0
     mock_split_pdf_to_pages.assert_called_once_with(
-        test_path, "output", start, None
+        test_path, "output", start, None, 1
     )
 
 
@@ -510,3 +933,24 @@ def test_missing_required_path():
     # Test spliter run without path
     result = runner.invoke(spliter_app, [])
     assert result.exit_code != 0
+
+
+def test_cache_stats_and_prune_commands(tmp_path):
+    """Test the cache commands over a cache with a single entry."""
+    page = tmp_path / "page_1.pdf"
+    page.write_bytes(b"page one")
+    cache_dir = str(tmp_path / "cache")
+    OcrCache(cache_dir).put(str(page), MethodType.llmwhisperer, {}, b"text")
+    runner = CliRunner()
+
+    result = runner.invoke(cache_app, ["stats", "--cache-dir", cache_dir])
+    assert result.exit_code == 0
+    assert "entries: 1" in result.stdout
+    assert "llmwhisperer: 1 entries" in result.stdout
+
+    result = runner.invoke(
+        cache_app, ["prune", "--cache-dir", cache_dir, "--max-size-mb", "0"]
+    )
+    assert result.exit_code == 0
+    assert "removed 1 entries" in result.stdout
+    assert OcrCache(cache_dir).stats()["entries"] == 0
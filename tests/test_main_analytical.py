@@ -1,11 +1,16 @@
 import os
+from collections import Counter
+from pathlib import Path
 from unittest import mock
 from unittest.mock import MagicMock, patch
 
+import pandas as pd
 import pytest
 
 import analytical
+from services import gcp
 from utils.constants import FileType
+from utils.job_state import JobState
 
 
 @pytest.mark.parametrize(
@@ -101,7 +106,7 @@ def test_reprocess_csv(monkeypatch, tmp_path):
     monkeypatch.setattr(
         analytical, "clear_data_analytical_from_file", clear_fn
     )
-    monkeypatch.setattr(analytical, "upload_csv_to_bigquery", upload_fn)
+    monkeypatch.setattr(gcp, "upload_csv_to_bigquery", upload_fn)
     analytical.reprocess(
         str(source_dir),
         str(output_dir),
@@ -121,6 +126,60 @@ def test_reprocess_csv(monkeypatch, tmp_path):
     shutil_move.assert_called()
 
 
+def test_reprocess_csv_staging_merge(monkeypatch, tmp_path):
+    source_dir = tmp_path / "source"
+    output_dir = tmp_path / "output"
+    source_dir.mkdir()
+    output_dir.mkdir()
+    for page in range(3):
+        (source_dir / f"page_{page}.csv").write_text(
+            f'"Data","file"\n"2024-01-01","page_{page}.csv"\n'
+        )
+    clear_fn = mock.Mock()
+    client = MagicMock()
+    client.project = "project"
+    client.get_table.return_value.schema = []
+    monkeypatch.setattr(
+        analytical, "transform_generated_analytical_data", mock.Mock()
+    )
+    monkeypatch.setattr(
+        analytical, "clear_data_analytical_from_file", clear_fn
+    )
+    analytical.reprocess(
+        str(source_dir),
+        str(output_dir),
+        None,
+        mock.Mock(),
+        FileType.CSV,
+        "conf",
+        "units",
+        True,
+        client,
+        "dataset",
+        "table",
+        staging_merge=True,
+        cluster_table=True,
+    )
+
+    clear_fn.assert_not_called()
+    # one load job into the staging table and one MERGE into the table
+    client.load_table_from_file.assert_called_once()
+    staging_ref = client.load_table_from_file.call_args[0][1]
+    assert staging_ref.startswith("project.dataset.table_staging_")
+    client.query.assert_called_once()
+    query = client.query.call_args[0][0]
+    assert "merge `project.dataset.table`" in query
+    parameters = client.query.call_args[1]["job_config"].query_parameters
+    assert sorted(parameters[0].values) == [
+        f"page_{page}.csv" for page in range(3)
+    ]
+    client.update_table.assert_called_once()
+    client.delete_table.assert_called_once_with(staging_ref, not_found_ok=True)
+    assert sorted(os.listdir(output_dir)) == [
+        f"page_{page}.csv" for page in range(3)
+    ]
+
+
 def make_dummy_pdf_pages(tmp_path, n):
     pdfs = []
     for i in range(n):
@@ -164,7 +223,7 @@ def dummy_functions():
 @patch("os.path.exists")
 @patch("analytical.split_pdf_to_pages")
 @patch("analytical.transform_generated_analytical_data")
-@patch("analytical.upload_csv_to_bigquery")
+@patch("services.gcp.upload_csv_to_bigquery")
 def test_run_basic(
     mock_upload,
     mock_transform,
@@ -214,7 +273,55 @@ def test_run_basic(
 @patch("os.path.exists")
 @patch("analytical.split_pdf_to_pages")
 @patch("analytical.transform_generated_analytical_data")
-@patch("analytical.upload_csv_to_bigquery")
+@patch("services.gcp.upload_csv_to_bigquery")
+def test_run_shares_config_loader(
+    mock_upload,
+    mock_transform,
+    mock_split,
+    mock_exists,
+    mock_move,
+    tmp_dirs,
+    dummy_bigquery_client,
+    dummy_functions,
+):
+    output_dir, processed_dir = tmp_dirs
+    process_pdf_file_fn, process_txt_file_fn = dummy_functions
+    mock_split.return_value = [
+        os.path.join(output_dir, f"page_{i + 1}.pdf") for i in range(3)
+    ]
+    mock_exists.side_effect = lambda path: path is not None
+
+    analytical.run(
+        path="dummy.pdf",
+        output_dir=output_dir,
+        start=1,
+        end=3,
+        reprocess=False,
+        processed_dir=processed_dir,
+        process_txt_file_fn=process_txt_file_fn,
+        process_pdf_file_fn=process_pdf_file_fn,
+        upload=False,
+        analytical_accounts_configuration="conf",
+        analytical_units_renamed_list="units",
+        client=dummy_bigquery_client,
+        dataset_id="ds",
+        table_id="tbl",
+    )
+    loaders = {
+        id(call.kwargs["config_loader"])
+        for call in mock_transform.call_args_list
+    }
+    assert mock_transform.call_count == 3
+    assert len(loaders) == 1
+    loader = mock_transform.call_args.kwargs["config_loader"]
+    assert (loader.accounts_url, loader.units_url) == ("conf", "units")
+
+
+@patch("shutil.move")
+@patch("os.path.exists")
+@patch("analytical.split_pdf_to_pages")
+@patch("analytical.transform_generated_analytical_data")
+@patch("services.gcp.upload_csv_to_bigquery")
 def test_run_reprocess(
     mock_upload,
     mock_transform,
@@ -253,3 +360,566 @@ def test_run_reprocess(
     assert mock_move.called
     assert mock_transform.called
     assert not mock_upload.called
+
+
+@patch("analytical.iter_pdf_pages")
+@patch("analytical.split_pdf_to_pages")
+@patch("analytical.transform_generated_analytical_data")
+@patch("services.gcp.upload_csv_to_bigquery")
+def test_run_stream(
+    mock_upload,
+    mock_transform,
+    mock_split,
+    mock_iter_pages,
+    tmp_dirs,
+    dummy_bigquery_client,
+    dummy_functions,
+):
+    output_dir, processed_dir = tmp_dirs
+    process_pdf_file_fn, process_txt_file_fn = dummy_functions
+    pages = make_dummy_pdf_pages(output_dir_path := Path(output_dir), 3)
+    mock_iter_pages.return_value = iter(pages)
+
+    analytical.run(
+        path="dummy.pdf",
+        output_dir=output_dir,
+        start=1,
+        end=3,
+        reprocess=False,
+        processed_dir=processed_dir,
+        process_txt_file_fn=process_txt_file_fn,
+        process_pdf_file_fn=process_pdf_file_fn,
+        upload=True,
+        analytical_accounts_configuration="conf",
+        analytical_units_renamed_list="units",
+        client=dummy_bigquery_client,
+        dataset_id="ds",
+        table_id="tbl",
+        stream=True,
+        queue_size=1,
+    )
+    assert not mock_split.called
+    assert mock_iter_pages.called
+    assert [call.args[0] for call in mock_transform.call_args_list] == [
+        str(output_dir_path / f"page_{i + 1}.csv") for i in range(3)
+    ]
+    assert mock_upload.call_count == 3
+    assert sorted(os.listdir(processed_dir)) == sorted(
+        f"page_{i + 1}.{ext}"
+        for i in range(3)
+        for ext in ("pdf", "txt", "csv")
+    )
+
+
+def test_convert_pages_to_text_keeps_page_order(tmp_dirs):
+    output_dir, processed_dir = tmp_dirs
+    pages = [os.path.join(output_dir, f"page_{i + 1}.pdf") for i in range(4)]
+    for page_path in pages:
+        with open(page_path, "w") as f:
+            f.write("dummy pdf content")
+    # page 2 was converted in a previous run
+    with open(os.path.join(output_dir, "page_2.txt"), "w") as f:
+        f.write("dummy text")
+    jobs_received = []
+
+    def process_pdf_files_fn(jobs):
+        for input_path, output_path in jobs:
+            jobs_received.append(input_path)
+            with open(output_path, "w") as f:
+                f.write("dummy text")
+            yield output_path
+
+    result = list(
+        analytical.convert_pages_to_text(
+            pages,
+            False,
+            processed_dir,
+            process_pdf_files_fn,
+            process_txt_file_fn=mock.Mock(),
+        )
+    )
+
+    assert jobs_received == [pages[0], pages[2], pages[3]]
+    assert result == [
+        (page_path, page_path.replace(".pdf", ".txt")) for page_path in pages
+    ]
+    assert sorted(os.listdir(processed_dir)) == [
+        "page_1.pdf",
+        "page_3.pdf",
+        "page_4.pdf",
+    ]
+
+
+@patch("analytical.split_pdf_to_pages")
+@patch("analytical.transform_generated_analytical_data")
+@patch("services.gcp.upload_csv_to_bigquery")
+def test_run_with_process_pdf_files_fn(
+    mock_upload,
+    mock_transform,
+    mock_split,
+    tmp_dirs,
+    dummy_bigquery_client,
+    dummy_functions,
+):
+    output_dir, processed_dir = tmp_dirs
+    process_pdf_file_fn, process_txt_file_fn = dummy_functions
+    mock_split.return_value = make_dummy_pdf_pages(Path(output_dir), 3)
+    single_page_fn = mock.Mock()
+
+    def process_pdf_files_fn(jobs):
+        for input_path, output_path in jobs:
+            yield process_pdf_file_fn(input_path, output_path)
+
+    analytical.run(
+        path="dummy.pdf",
+        output_dir=output_dir,
+        start=1,
+        end=3,
+        reprocess=False,
+        processed_dir=processed_dir,
+        process_txt_file_fn=process_txt_file_fn,
+        process_pdf_file_fn=single_page_fn,
+        upload=False,
+        analytical_accounts_configuration="conf",
+        analytical_units_renamed_list="units",
+        client=dummy_bigquery_client,
+        dataset_id="ds",
+        table_id="tbl",
+        process_pdf_files_fn=process_pdf_files_fn,
+    )
+    assert not single_page_fn.called
+    assert mock_transform.call_count == 3
+
+
+def test_convert_page_to_text_with_ocr_client(tmp_dirs):
+    output_dir, processed_dir = tmp_dirs
+    page_path = make_dummy_pdf_pages(Path(output_dir), 1)[0]
+    process_pdf_file_fn = mock.Mock(return_value="page_1.txt")
+    ocr_client = object()
+
+    analytical.convert_page_to_text(
+        page_path,
+        False,
+        processed_dir,
+        process_pdf_file_fn,
+        mock.Mock(),
+        ocr_client,
+    )
+
+    process_pdf_file_fn.assert_called_once_with(
+        page_path, page_path.replace(".pdf", ".txt"), client=ocr_client
+    )
+
+
+def fake_text_layer(pages_with_text):
+    """Stand-in for the text layer fast path of the pages given."""
+
+    def process_pdf_file_text_layer(input_path, output_path):
+        if os.path.basename(input_path) not in pages_with_text:
+            return ""
+        with open(output_path, "w") as f:
+            f.write("text layer")
+        return output_path
+
+    return process_pdf_file_text_layer
+
+
+def test_convert_with_text_layer_routes_pages(tmp_dirs):
+    output_dir, _ = tmp_dirs
+    pages = make_dummy_pdf_pages(Path(output_dir), 2)
+    process_pdf_file_fn = mock.Mock(
+        side_effect=lambda _, output, client: output
+    )
+    routes = Counter()
+
+    with patch(
+        "analytical.process_pdf_file_text_layer",
+        fake_text_layer({"page_1.pdf"}),
+    ):
+        outputs = [
+            analytical.convert_with_text_layer(
+                page,
+                page.replace(".pdf", ".txt"),
+                process_pdf_file_fn,
+                routes,
+                client="client",
+            )
+            for page in pages
+        ]
+
+    assert outputs == [page.replace(".pdf", ".txt") for page in pages]
+    process_pdf_file_fn.assert_called_once_with(
+        pages[1], pages[1].replace(".pdf", ".txt"), client="client"
+    )
+    assert routes == {"text layer": 1, "ocr": 1}
+
+
+def test_convert_with_text_layer_parses_csv_backends(tmp_dirs):
+    output_dir, _ = tmp_dirs
+    page = make_dummy_pdf_pages(Path(output_dir), 1)[0]
+    csv_path = page.replace(".pdf", ".csv")
+
+    with (
+        patch(
+            "analytical.process_pdf_file_text_layer",
+            fake_text_layer({"page_1.pdf"}),
+        ),
+        patch(
+            "analytical.process_txt_file_llmwhisperer", return_value=csv_path
+        ) as mock_process_txt,
+    ):
+        output = analytical.convert_with_text_layer(
+            page, csv_path, mock.Mock(), Counter()
+        )
+
+    assert output == csv_path
+    mock_process_txt.assert_called_once_with(page.replace(".pdf", ".txt"))
+    assert not os.path.exists(page.replace(".pdf", ".txt"))
+
+
+def test_convert_pages_with_text_layer_keeps_order(tmp_dirs):
+    output_dir, _ = tmp_dirs
+    pages = make_dummy_pdf_pages(Path(output_dir), 4)
+    jobs = [(page, page.replace(".pdf", ".txt")) for page in pages]
+    sent_to_ocr = []
+
+    def process_pdf_files_fn(ocr_jobs, client):
+        for input_path, output_path in ocr_jobs:
+            sent_to_ocr.append(input_path)
+            yield output_path
+
+    routes = Counter()
+    with patch(
+        "analytical.process_pdf_file_text_layer",
+        fake_text_layer({"page_1.pdf", "page_3.pdf", "page_4.pdf"}),
+    ):
+        outputs = list(
+            analytical.convert_pages_with_text_layer(
+                jobs, process_pdf_files_fn, routes, client="client"
+            )
+        )
+
+    assert outputs == [output_path for _, output_path in jobs]
+    assert sent_to_ocr == [pages[1]]
+    assert routes == {"text layer": 3, "ocr": 1}
+
+
+def test_convert_pages_with_text_layer_streams_text_pages(tmp_dirs):
+    output_dir, _ = tmp_dirs
+    pages = make_dummy_pdf_pages(Path(output_dir), 3)
+    read = []
+
+    def jobs():
+        for page in pages:
+            read.append(page)
+            yield page, page.replace(".pdf", ".txt")
+
+    process_pdf_files_fn = mock.Mock()
+    with patch(
+        "analytical.process_pdf_file_text_layer",
+        fake_text_layer({"page_1.pdf", "page_2.pdf", "page_3.pdf"}),
+    ):
+        outputs = analytical.convert_pages_with_text_layer(
+            jobs(), process_pdf_files_fn, Counter()
+        )
+        assert next(outputs) == pages[0].replace(".pdf", ".txt")
+        assert read == pages[:1]
+        assert len(list(outputs)) == 2
+
+    process_pdf_files_fn.assert_not_called()
+
+
+@patch("analytical.split_pdf_to_pages")
+@patch("services.gcp.upload_csv_to_bigquery")
+def test_run_hands_parsed_pages_in_memory(
+    mock_upload,
+    mock_split,
+    tmp_path,
+    tmp_dirs,
+    dummy_bigquery_client,
+    dummy_functions,
+):
+    output_dir, processed_dir = tmp_dirs
+    process_pdf_file_fn, _ = dummy_functions
+    mock_split.return_value = make_dummy_pdf_pages(Path(output_dir), 2)
+    accounts = tmp_path / "accounts.csv"
+    accounts.write_text(
+        "ContaContabil,ContaContabilDescritivo,ContaContabilGrupo,"
+        "ContaContabilGrupoDescritivo,Natureza,NaturezaDescritivo,"
+        "ContaContabilNormalizado,CompoeTaxa,AcordadoAssembleia\n"
+        "1.01,Taxa,1.1,Receitas,1,Receita,1.1,True,False\n"
+    )
+    uploaded = []
+    mock_upload.side_effect = lambda client, source, *_: uploaded.append(
+        source.read()
+    )
+
+    def parse_txt_file_fn(txt_path):
+        return pd.DataFrame(
+            {
+                "Data": pd.to_datetime(["02/01/2024"], format="%d/%m/%Y"),
+                "Participante": [""],
+                "Valor": pd.array([10.5], dtype="Float64"),
+                "ContaContabil": ["1.01"],
+                "file": [os.path.basename(txt_path.replace(".txt", ".csv"))],
+            }
+        )
+
+    process_txt_file_fn = mock.Mock()
+    analytical.run(
+        path="dummy.pdf",
+        output_dir=output_dir,
+        start=1,
+        end=2,
+        reprocess=False,
+        processed_dir=processed_dir,
+        process_txt_file_fn=process_txt_file_fn,
+        process_pdf_file_fn=process_pdf_file_fn,
+        upload=True,
+        analytical_accounts_configuration=str(accounts),
+        analytical_units_renamed_list="",
+        client=dummy_bigquery_client,
+        dataset_id="ds",
+        table_id="tbl",
+        parse_txt_file_fn=parse_txt_file_fn,
+        keep_intermediates=True,
+    )
+
+    process_txt_file_fn.assert_not_called()
+    assert len(uploaded) == 2
+    with open(os.path.join(processed_dir, "page_1.csv"), "rb") as f:
+        assert f.read() == uploaded[0]
+    final = pd.read_csv(os.path.join(processed_dir, "page_1.csv"), dtype=str)
+    assert final["ContaContabil"].iloc[0] == "1.1"
+    assert final["Valor"].iloc[0] == "10.5"
+    assert final["Data"].iloc[0] == "2024-01-02"
+    intermediate = pd.read_csv(
+        os.path.join(processed_dir, "intermediates", "page_1.csv"), dtype=str
+    )
+    assert intermediate["ContaContabil"].iloc[0] == "1.01"
+    assert not any(f.endswith(".csv") for f in os.listdir(output_dir))
+
+
+@patch("analytical.split_pdf_to_pages")
+def test_run_uploads_pages_in_batches(mock_split, tmp_dirs, dummy_functions):
+    output_dir, processed_dir = tmp_dirs
+    process_pdf_file_fn, _ = dummy_functions
+    mock_split.return_value = make_dummy_pdf_pages(Path(output_dir), 3)
+    loads = []
+    client = MagicMock(project="test-project")
+    client.load_table_from_file.side_effect = (
+        lambda source, *_, **__: loads.append(source.read()) or MagicMock()
+    )
+
+    def parse_txt_file_fn(txt_path):
+        return pd.DataFrame(
+            {"Valor": [1.5, 2.5], "file": [os.path.basename(txt_path)] * 2}
+        )
+
+    analytical.run(
+        path="dummy.pdf",
+        output_dir=output_dir,
+        start=1,
+        end=3,
+        reprocess=False,
+        processed_dir=processed_dir,
+        process_txt_file_fn=mock.Mock(),
+        process_pdf_file_fn=process_pdf_file_fn,
+        upload=True,
+        analytical_accounts_configuration="",
+        analytical_units_renamed_list="",
+        client=client,
+        dataset_id="ds",
+        table_id="tbl",
+        parse_txt_file_fn=parse_txt_file_fn,
+        upload_batch_bytes=1024 * 1024,
+    )
+
+    assert len(loads) == 1
+    lines = loads[0].decode().splitlines()
+    assert lines[0] == '"Valor","file"'
+    assert [line.split(",")[-1] for line in lines[1:]] == [
+        f'"page_{page}.txt"' for page in (1, 2, 3) for _ in range(2)
+    ]
+    assert sorted(
+        f for f in os.listdir(processed_dir) if f.endswith(".csv")
+    ) == [
+        "page_1.csv",
+        "page_2.csv",
+        "page_3.csv",
+    ]
+
+
+def run_recorded_pages(output_dir, processed_dir, client, job_state, **kwargs):
+    process_pdf_file_fn = kwargs.pop("process_pdf_file_fn")
+    analytical.run(
+        path="dummy.pdf",
+        output_dir=output_dir,
+        start=1,
+        end=3,
+        reprocess=False,
+        processed_dir=processed_dir,
+        process_txt_file_fn=mock.Mock(),
+        process_pdf_file_fn=process_pdf_file_fn,
+        upload=True,
+        analytical_accounts_configuration="",
+        analytical_units_renamed_list="",
+        client=client,
+        dataset_id="ds",
+        table_id="tbl",
+        upload_batch_bytes=1024 * 1024,
+        job_state=job_state,
+        **kwargs,
+    )
+
+
+@patch("analytical.split_pdf_to_pages")
+def test_run_records_pages_and_skips_them_on_resume(
+    mock_split, tmp_path, tmp_dirs, dummy_functions
+):
+    output_dir, processed_dir = tmp_dirs
+    process_pdf_file_fn = mock.Mock(side_effect=dummy_functions[0])
+    client = MagicMock(project="test-project")
+    job_state = JobState(str(tmp_path / "jobs.sqlite"))
+
+    def parse_txt_file_fn(txt_path):
+        return pd.DataFrame({"Valor": [1.5], "file": [txt_path]})
+
+    mock_split.return_value = make_dummy_pdf_pages(Path(output_dir), 3)
+    run_recorded_pages(
+        output_dir,
+        processed_dir,
+        client,
+        job_state,
+        process_pdf_file_fn=process_pdf_file_fn,
+        parse_txt_file_fn=parse_txt_file_fn,
+    )
+
+    page = job_state.page("dummy.pdf", "page_2.pdf")
+    assert page["stage"] == "uploaded"
+    assert page["csv_path"] == os.path.join(processed_dir, "page_2.csv")
+    assert page["txt_path"] == os.path.join(processed_dir, "page_2.txt")
+    assert page["pdf_sha256"] is not None
+    assert page["csv_sha256"] is not None
+    assert page["ocr_seconds"] is not None
+    assert page["upload_seconds"] is not None
+    assert client.load_table_from_file.call_count == 1
+
+    # the same pages split again are not converted nor uploaded again
+    mock_split.return_value = make_dummy_pdf_pages(Path(output_dir), 3)
+    run_recorded_pages(
+        output_dir,
+        processed_dir,
+        client,
+        job_state,
+        process_pdf_file_fn=process_pdf_file_fn,
+        parse_txt_file_fn=parse_txt_file_fn,
+    )
+
+    assert process_pdf_file_fn.call_count == 3
+    assert client.load_table_from_file.call_count == 1
+    assert not any(f.endswith(".pdf") for f in os.listdir(output_dir))
+    summary = job_state.summary()
+    assert summary["run"]["status"] == "done"
+    assert summary["stages"]["uploaded"] == 3
+    assert summary["pages_in_run"] == 0
+
+
+@patch("analytical.split_pdf_to_pages")
+def test_run_records_the_failed_page(
+    mock_split, tmp_path, tmp_dirs, dummy_functions
+):
+    output_dir, processed_dir = tmp_dirs
+    job_state = JobState(str(tmp_path / "jobs.sqlite"))
+    mock_split.return_value = make_dummy_pdf_pages(Path(output_dir), 3)
+
+    def parse_txt_file_fn(txt_path):
+        if "page_2" in txt_path:
+            raise ValueError("unreadable table")
+        return pd.DataFrame({"Valor": [1.5], "file": [txt_path]})
+
+    with pytest.raises(ValueError):
+        run_recorded_pages(
+            output_dir,
+            processed_dir,
+            MagicMock(project="test-project"),
+            job_state,
+            process_pdf_file_fn=dummy_functions[0],
+            parse_txt_file_fn=parse_txt_file_fn,
+        )
+
+    summary = job_state.summary()
+    assert summary["run"]["status"] == "failed"
+    assert summary["run"]["error"] == "unreadable table"
+    assert summary["failed"] == [
+        {"page": "page_2.pdf", "stage": "ocr", "error": "unreadable table"}
+    ]
+    assert summary["stages"]["parsed"] == 1
+
+
+@patch("analytical.split_pdf_to_pages")
+def test_run_batch_shares_the_queue_between_documents(
+    mock_split, tmp_path, tmp_dirs, dummy_functions
+):
+    output_dir, processed_dir = tmp_dirs
+    events = []
+
+    def split(input_pdf_path, output_dir, start, end, workers):
+        name = os.path.basename(input_pdf_path)
+        events.append(f"split {name}")
+        pages = []
+        for page in range(start, end + 1):
+            page_path = os.path.join(output_dir, f"page_{page}_{name}")
+            with open(page_path, "wb") as f:
+                f.write(name.encode())
+            pages.append(page_path)
+        return pages
+
+    def process_pdf_file_fn(pdf_path, txt_path):
+        events.append(f"ocr {os.path.basename(pdf_path)}")
+        return dummy_functions[0](pdf_path, txt_path)
+
+    def parse_txt_file_fn(txt_path):
+        return pd.DataFrame({"Valor": [1.5], "file": [txt_path]})
+
+    mock_split.side_effect = split
+    client = MagicMock(project="test-project")
+    job_state = JobState(str(tmp_path / "jobs.sqlite"))
+
+    analytical.run_batch(
+        [("2023-12.pdf", 1, 2), ("2024-01.pdf", 3, 3)],
+        output_dir,
+        False,
+        processed_dir,
+        mock.Mock(),
+        process_pdf_file_fn,
+        True,
+        "",
+        "",
+        client,
+        "ds",
+        "tbl",
+        parse_txt_file_fn=parse_txt_file_fn,
+        upload_batch_bytes=1024 * 1024,
+        job_state=job_state,
+    )
+
+    # the next document is split only when the queue reaches it
+    assert events == [
+        "split 2023-12.pdf",
+        "ocr page_1_2023-12.pdf",
+        "ocr page_2_2023-12.pdf",
+        "split 2024-01.pdf",
+        "ocr page_3_2024-01.pdf",
+    ]
+    # the pages of both documents are loaded by the same job
+    assert client.load_table_from_file.call_count == 1
+    assert sorted(
+        f for f in os.listdir(processed_dir) if f.endswith(".csv")
+    ) == ["page_1_2023-12.csv", "page_2_2023-12.csv", "page_3_2024-01.csv"]
+    first, second = (job_state.summary(run_id) for run_id in (1, 2))
+    assert first["run"]["document"] == os.path.realpath("2023-12.pdf")
+    assert first["run"]["status"] == "done"
+    assert first["stages"]["uploaded"] == 2
+    assert second["run"]["document"] == os.path.realpath("2024-01.pdf")
+    assert second["stages"]["uploaded"] == 1
@@ -39,3 +39,120 @@ def test_merger_run_command():
             .reset_index(drop=True)
         )
         pd.testing.assert_frame_equal(merged_df, expected_df)
+
+
+def test_merger_run_command_with_read_workers(tmp_path):
+    runner = CliRunner()
+    for page in range(5):
+        (tmp_path / f"page_{page}.csv").write_text(f"A,B\n{page},{page}\n")
+    output_csv = tmp_path / "merged.csv"
+
+    result = runner.invoke(
+        app,
+        [
+            "merger",
+            "run",
+            "--path-dir",
+            str(tmp_path),
+            "--output",
+            str(output_csv),
+            "--read-workers",
+            "3",
+        ],
+    )
+
+    assert result.exit_code == 0
+    assert output_csv.read_text() == "A,B\n" + "".join(
+        f"{page},{page}\n" for page in range(5)
+    )
+
+
+def test_merger_run_command_incremental(tmp_path):
+    runner = CliRunner()
+    pages = tmp_path / "pages"
+    pages.mkdir()
+    (pages / "page_1.csv").write_text("A,B\n1,1\n")
+    output_csv = tmp_path / "merged.csv"
+    args = [
+        "merger",
+        "run",
+        "--path-dir",
+        str(pages),
+        "--output",
+        str(output_csv),
+        "--incremental",
+    ]
+
+    assert runner.invoke(app, args).exit_code == 0
+    (pages / "page_2.csv").write_text("A,B\n2,2\n")
+    result = runner.invoke(app, args)
+
+    assert result.exit_code == 0
+    assert "Skipped 1 unchanged files" in result.stdout
+    assert output_csv.read_text() == "A,B\n1,1\n2,2\n"
+    assert (tmp_path / "merged.csv.manifest.json").exists()
+
+
+def test_merger_run_command_parquet(tmp_path):
+    runner = CliRunner()
+    pages = tmp_path / "pages"
+    pages.mkdir()
+    for period in ["2024-01", "2024-02"]:
+        (pages / f"{period}.csv").write_text(
+            f"Valor,PeriodoPrestacaoContas\n1,{period}\n"
+        )
+
+    result = runner.invoke(
+        app,
+        [
+            "merger",
+            "run",
+            "--path-dir",
+            str(pages),
+            "--output",
+            str(tmp_path / "merged.csv"),
+            "--format",
+            "parquet",
+            "--partition-by",
+            "PeriodoPrestacaoContas",
+        ],
+    )
+
+    assert result.exit_code == 0
+    assert sorted(os.listdir(tmp_path / "merged")) == [
+        "PeriodoPrestacaoContas=2024-01",
+        "PeriodoPrestacaoContas=2024-02",
+        "_merger.json",
+    ]
+    assert len(pd.read_parquet(tmp_path / "merged")) == 2
+
+    # an existing directory that is not a merge is never replaced
+    result = runner.invoke(
+        app,
+        [
+            "merger",
+            "run",
+            "--path-dir",
+            str(pages),
+            "--output",
+            str(tmp_path / "pages"),
+            "--format",
+            "parquet",
+        ],
+    )
+    assert result.exit_code != 0
+    assert sorted(os.listdir(pages)) == ["2024-01.csv", "2024-02.csv"]
+
+    result = runner.invoke(
+        app,
+        [
+            "merger",
+            "run",
+            "--path-dir",
+            str(pages),
+            "--format",
+            "parquet",
+            "--incremental",
+        ],
+    )
+    assert result.exit_code != 0
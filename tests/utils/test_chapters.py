@@ -0,0 +1,110 @@
+import ctypes
+
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+from pypdf import PdfReader, PdfWriter
+
+from utils import chapters
+from utils.chapters import (
+    ANALYTICAL_CHAPTER,
+    cached_chapter_range,
+    find_chapter_range,
+    normalize,
+)
+
+
+def make_report(path, headers):
+    """Writes a PDF with one page per header, written at the top."""
+    pdf = pdfium.PdfDocument.new()
+    font = pdfium_c.FPDFText_LoadStandardFont(pdf, b"Helvetica")
+    for header in headers:
+        page = pdf.new_page(842, 595)
+        for y, text in [(570, header), (300, "Corpo da página")]:
+            text_object = pdfium_c.FPDFPageObj_CreateTextObj(pdf, font, 9.0)
+            buffer = ctypes.create_string_buffer(
+                (text + "\0").encode("utf-16-le")
+            )
+            pdfium_c.FPDFText_SetText(
+                text_object,
+                ctypes.cast(buffer, ctypes.POINTER(pdfium_c.FPDF_WCHAR)),
+            )
+            pdfium_c.FPDFPageObj_Transform(text_object, 1, 0, 0, 1, 20, y)
+            pdfium_c.FPDFPage_InsertObject(page, text_object)
+        pdfium_c.FPDFPage_GenerateContent(page)
+    pdf.save(str(path))
+    pdf.close()
+    return str(path)
+
+
+def add_outline(path, items):
+    """Adds (title, page_index) bookmarks to the PDF."""
+    writer = PdfWriter(clone_from=PdfReader(path))
+    for title, page_index in items:
+        writer.add_outline_item(title, page_index)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return path
+
+
+def sample_headers():
+    return (
+        ["Capa", "Índice"]
+        + ["Balancete"] * 2
+        + [f"{ANALYTICAL_CHAPTER}   Pág. {i} de 9" for i in range(3)]
+        + ["Comprovantes"] * 2
+    )
+
+
+def test_normalize_ignores_case_and_accents():
+    assert normalize("Demonstrativo  ANALÍTICO") == "demonstrativo analitico"
+
+
+def test_find_chapter_range_from_headers(tmp_path):
+    report = make_report(tmp_path / "report.pdf", sample_headers())
+
+    assert find_chapter_range(report) == (5, 7)
+
+
+def test_find_chapter_range_skips_index_page(tmp_path):
+    headers = sample_headers()
+    headers[1] = f"Índice: {ANALYTICAL_CHAPTER} ..... 5"
+    report = make_report(tmp_path / "report.pdf", headers)
+
+    assert find_chapter_range(report) == (5, 7)
+
+
+def test_find_chapter_range_from_outline(tmp_path):
+    report = make_report(tmp_path / "report.pdf", ["Sem cabeçalho"] * 9)
+    add_outline(
+        report,
+        [
+            ("Balancete", 2),
+            ("Demonstrativo Analítico de Receitas e Despesas", 4),
+            ("Comprovantes", 8),
+        ],
+    )
+
+    assert find_chapter_range(report) == (5, 8)
+
+
+def test_find_chapter_range_not_found(tmp_path):
+    report = make_report(tmp_path / "report.pdf", ["Capa", "Balancete"])
+
+    assert find_chapter_range(report) is None
+
+
+def test_cached_chapter_range_scans_once(tmp_path, monkeypatch):
+    report = make_report(tmp_path / "report.pdf", sample_headers())
+    cache_dir = str(tmp_path / "cache")
+    scans = []
+    original = chapters.find_chapter_range
+
+    def counting_find(*args):
+        scans.append(args)
+        return original(*args)
+
+    monkeypatch.setattr(chapters, "find_chapter_range", counting_find)
+
+    assert cached_chapter_range(report, cache_dir) == (5, 7)
+    assert cached_chapter_range(report, cache_dir) == (5, 7)
+    assert len(scans) == 1
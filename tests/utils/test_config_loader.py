@@ -0,0 +1,94 @@
+import os
+from unittest import mock
+
+import pytest
+
+from utils import config_loader
+from utils.config_loader import ConfigLoader
+
+
+@pytest.fixture
+def sheets(tmp_path):
+    accounts = tmp_path / "accounts.csv"
+    accounts.write_text("ContaContabil,Natureza\n1.01,R\n")
+    units = tmp_path / "units.csv"
+    units.write_text("Participante\nUn. R22-888-QD88-LT88\n")
+    return str(accounts), str(units)
+
+
+def counting_download(monkeypatch):
+    download = mock.Mock(side_effect=config_loader.download)
+    monkeypatch.setattr(config_loader, "download", download)
+    return download
+
+
+def test_loads_each_sheet_once(monkeypatch, sheets):
+    download = counting_download(monkeypatch)
+    loader = ConfigLoader(*sheets)
+    for _ in range(3):
+        accounts = loader.accounts_configuration()
+        units = loader.units_to_rename()
+    assert download.call_count == 2
+    assert accounts["ContaContabil"].iloc[0] == "1.01"
+    assert units["Participante"].iloc[0] == "Un. R22-888-QD88-LT88"
+
+
+def test_empty_urls_return_empty_frames(monkeypatch):
+    download = counting_download(monkeypatch)
+    loader = ConfigLoader("", "")
+    assert loader.accounts_configuration().empty
+    assert loader.units_to_rename().empty
+    download.assert_not_called()
+
+
+def test_fresh_snapshot_skips_download(monkeypatch, sheets, tmp_path):
+    snapshot_dir = str(tmp_path / "snapshots")
+    ConfigLoader(*sheets, snapshot_dir=snapshot_dir).accounts_configuration()
+    download = counting_download(monkeypatch)
+    loader = ConfigLoader(*sheets, snapshot_dir=snapshot_dir)
+    assert loader.accounts_configuration()["Natureza"].iloc[0] == "R"
+    download.assert_not_called()
+
+
+def test_expired_snapshot_is_refreshed(monkeypatch, sheets, tmp_path):
+    snapshot_dir = str(tmp_path / "snapshots")
+    ConfigLoader(*sheets, snapshot_dir=snapshot_dir).accounts_configuration()
+    with open(sheets[0], "w") as f:
+        f.write("ContaContabil,Natureza\n1.01,D\n")
+    loader = ConfigLoader(*sheets, snapshot_dir=snapshot_dir, ttl_seconds=0)
+    assert loader.accounts_configuration()["Natureza"].iloc[0] == "D"
+
+
+def test_failed_download_uses_stale_snapshot(monkeypatch, sheets, tmp_path):
+    snapshot_dir = str(tmp_path / "snapshots")
+    ConfigLoader(*sheets, snapshot_dir=snapshot_dir).units_to_rename()
+    monkeypatch.setattr(
+        config_loader, "download", mock.Mock(side_effect=OSError("offline"))
+    )
+    loader = ConfigLoader(*sheets, snapshot_dir=snapshot_dir, ttl_seconds=0)
+    assert len(loader.units_to_rename()) == 1
+
+
+def test_offline_uses_only_snapshots(monkeypatch, sheets, tmp_path):
+    snapshot_dir = str(tmp_path / "snapshots")
+    ConfigLoader(*sheets, snapshot_dir=snapshot_dir).units_to_rename()
+    download = counting_download(monkeypatch)
+    loader = ConfigLoader(
+        *sheets, snapshot_dir=snapshot_dir, ttl_seconds=0, offline=True
+    )
+    assert len(loader.units_to_rename()) == 1
+    with pytest.raises(FileNotFoundError):
+        loader.accounts_configuration()
+    download.assert_not_called()
+
+
+def test_corrupted_snapshot_is_ignored(monkeypatch, sheets, tmp_path):
+    snapshot_dir = tmp_path / "snapshots"
+    ConfigLoader(*sheets, snapshot_dir=str(snapshot_dir)).units_to_rename()
+    for name in os.listdir(snapshot_dir):
+        if name.endswith(".csv"):
+            (snapshot_dir / name).write_text("Participante\nchanged\n")
+    download = counting_download(monkeypatch)
+    loader = ConfigLoader(*sheets, snapshot_dir=str(snapshot_dir))
+    assert loader.units_to_rename()["Participante"].iloc[0] != "changed"
+    download.assert_called_once()
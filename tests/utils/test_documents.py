@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from utils.documents import find_documents, load_ranges
+
+
+def write_manifest(tmp_path, manifest):
+    path = tmp_path / "ranges.json"
+    path.write_text(json.dumps(manifest))
+    return str(path)
+
+
+def test_find_documents_in_directory(tmp_path):
+    for name in ["2024-01.pdf", "2023-12.PDF", "notes.txt"]:
+        (tmp_path / name).write_bytes(b"")
+    (tmp_path / "pages.pdf").mkdir()
+
+    assert find_documents(str(tmp_path)) == [
+        str(tmp_path / "2023-12.PDF"),
+        str(tmp_path / "2024-01.pdf"),
+    ]
+
+
+def test_find_documents_by_glob(tmp_path):
+    for name in ["2023-12.pdf", "2024-01.pdf", "2024-02.pdf"]:
+        (tmp_path / name).write_bytes(b"")
+
+    assert find_documents(str(tmp_path / "2024-*.pdf")) == [
+        str(tmp_path / "2024-01.pdf"),
+        str(tmp_path / "2024-02.pdf"),
+    ]
+
+
+def test_find_documents_without_pdf(tmp_path):
+    with pytest.raises(ValueError, match="No PDF found"):
+        find_documents(str(tmp_path))
+
+
+def test_load_ranges(tmp_path):
+    manifest = write_manifest(
+        tmp_path,
+        {
+            "2023-12.pdf": {"start": 12, "end": 80},
+            "2024-01.pdf": {"start": 10},
+            "2024-02.pdf": {},
+            "2024-03.pdf": "auto",
+        },
+    )
+
+    assert load_ranges(manifest) == {
+        "2023-12.pdf": (12, 80),
+        "2024-01.pdf": (10, None),
+        "2024-02.pdf": (1, None),
+        "2024-03.pdf": None,
+    }
+
+
+@pytest.mark.parametrize(
+    "manifest",
+    [
+        ["2023-12.pdf"],
+        {"2023-12.pdf": "all"},
+        {"2023-12.pdf": {"first": 1}},
+        {"2023-12.pdf": {"start": "12"}},
+        {"2023-12.pdf": {"start": 12, "end": 3}},
+    ],
+)
+def test_load_ranges_rejects_invalid_manifest(tmp_path, manifest):
+    with pytest.raises(ValueError):
+        load_ranges(write_manifest(tmp_path, manifest))
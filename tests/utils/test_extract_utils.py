@@ -0,0 +1,36 @@
+import pandas as pd
+
+from utils.extract_utils import validate, validate_series
+
+DATES = [
+    "01/01/2024",
+    "29/02/2024",
+    "29/02/2023",
+    "31/04/2024",
+    "1/01/2024",
+    "01-01-2024",
+    "01/01/24",
+    "01/01/1650",
+    "Data",
+    "",
+    "TOTAL: 1.01",
+]
+
+
+def test_validate_series_matches_validate():
+    series = pd.Series(DATES)
+    assert validate_series(series).to_list() == [
+        validate(date) for date in DATES
+    ]
+
+
+def test_validate_series_strips_and_rejects_non_strings():
+    series = pd.Series([" 01/01/2024 ", None, float("nan"), 20240101])
+    assert validate_series(series).to_list() == [True, False, False, False]
+
+
+def test_validate_series_without_strings():
+    series = pd.Series([1.0, None], index=[5, 7])
+    result = validate_series(series)
+    assert result.to_list() == [False, False]
+    assert result.index.to_list() == [5, 7]
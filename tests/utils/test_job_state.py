@@ -0,0 +1,147 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from utils.job_state import JobState
+
+
+def test_page_is_none_before_any_run(tmp_path):
+    job_state = JobState(str(tmp_path / "state" / "jobs.sqlite"))
+
+    assert job_state.page("doc.pdf", "page_1.pdf") is None
+    assert job_state.summary() is None
+    assert (tmp_path / "state" / "jobs.sqlite").exists()
+
+
+def test_pages_are_recorded_through_a_single_connection(tmp_path):
+    job_state = JobState(str(tmp_path / "jobs.sqlite"))
+    run_state = job_state.start_run("doc.pdf")
+
+    with patch("utils.job_state.sqlite3.connect") as connect:
+        run_state.record("page_1.pdf", "split")
+        run_state.fail("page_1.pdf", "bad page")
+        assert job_state.page("doc.pdf", "page_1.pdf")["error"] == "bad page"
+
+    connect.assert_not_called()
+
+
+def test_pages_are_recorded_from_other_threads(tmp_path):
+    job_state = JobState(str(tmp_path / "jobs.sqlite"))
+    run_state = job_state.start_run("doc.pdf")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(
+            executor.map(
+                lambda i: run_state.record(f"page_{i}.pdf", "ocr"), range(20)
+            )
+        )
+
+    assert job_state.summary()["stages"]["ocr"] == 20
+
+
+def test_record_updates_the_page_by_file_name(tmp_path):
+    job_state = JobState(str(tmp_path / "jobs.sqlite"))
+    document = str(tmp_path / "doc.pdf")
+    run_state = job_state.start_run(document)
+
+    run_state.record("output/page_1.pdf", "split", pdf_sha256="a")
+    run_state.record("processed/page_1.pdf", "ocr", ocr_seconds=1.5)
+
+    page = job_state.page(document, "page_1.pdf")
+    assert page["stage"] == "ocr"
+    assert page["document"] == document
+    assert page["pdf_sha256"] == "a"
+    assert page["ocr_seconds"] == 1.5
+    assert page["run_id"] == run_state.run_id
+
+
+def test_pages_are_keyed_by_the_resolved_document(tmp_path):
+    job_state = JobState(str(tmp_path / "jobs.sqlite"))
+    (tmp_path / "2023").mkdir()
+    (tmp_path / "2024").mkdir()
+    first = job_state.start_run(str(tmp_path / "2023" / "report.pdf"))
+    second = job_state.start_run(str(tmp_path / "2024" / "report.pdf"))
+
+    first.record("page_1_report.pdf", "uploaded", pdf_sha256="a")
+    second.record("page_1_report.pdf", "split", pdf_sha256="b")
+
+    # same-named pages of other documents do not collide
+    assert first.is_done("page_1_report.pdf", "uploaded", "a")
+    assert not second.is_done("page_1_report.pdf", "uploaded", "b")
+    # the same document reached by another path shares its pages
+    again = job_state.start_run(
+        str(tmp_path / "2024" / ".." / "2023" / "report.pdf")
+    )
+    assert again.is_done("page_1_report.pdf", "uploaded", "a")
+
+
+def test_record_rejects_unknown_stage_and_fields(tmp_path):
+    run_state = JobState(str(tmp_path / "jobs.sqlite")).start_run("doc.pdf")
+
+    with pytest.raises(ValueError):
+        run_state.record("page_1.pdf", "merged")
+    with pytest.raises(ValueError):
+        run_state.record("page_1.pdf", "ocr", pages=3)
+
+
+def test_fail_keeps_the_stage_until_the_page_is_recorded_again(tmp_path):
+    job_state = JobState(str(tmp_path / "jobs.sqlite"))
+    run_state = job_state.start_run("doc.pdf")
+    run_state.record("page_1.pdf", "ocr", pdf_sha256="a")
+
+    run_state.fail("page_1.pdf", ValueError("bad table"))
+
+    page = job_state.page("doc.pdf", "page_1.pdf")
+    assert page["stage"] == "ocr"
+    assert page["error"] == "bad table"
+    assert not run_state.is_done("page_1.pdf", "ocr", "a")
+
+    run_state.record("page_1.pdf", "parsed")
+    assert job_state.page("doc.pdf", "page_1.pdf")["error"] is None
+
+
+def test_is_done_checks_the_stage_and_the_content(tmp_path):
+    run_state = JobState(str(tmp_path / "jobs.sqlite")).start_run("doc.pdf")
+    run_state.record("page_1.pdf", "parsed", pdf_sha256="a")
+
+    assert run_state.is_done("page_1.pdf", "ocr", "a")
+    assert run_state.is_done("page_1.pdf", "parsed", "a")
+    assert not run_state.is_done("page_1.pdf", "uploaded", "a")
+    assert not run_state.is_done("page_1.pdf", "parsed", "b")
+    assert not run_state.is_done("page_2.pdf", "split", "a")
+
+
+def test_summary_of_the_last_run(tmp_path):
+    job_state = JobState(str(tmp_path / "jobs.sqlite"))
+    first = job_state.start_run("doc.pdf")
+    first.record("page_1.pdf", "uploaded", ocr_seconds=2)
+    first.finish()
+    second = job_state.start_run("doc.pdf")
+    second.record(
+        "page_2.pdf",
+        "parsed",
+        ocr_seconds=1,
+        parse_seconds=0.5,
+    )
+    second.fail("page_2.pdf", "upload refused")
+    second.finish(RuntimeError("upload refused"))
+
+    summary = job_state.summary()
+
+    assert summary["run"]["id"] == second.run_id
+    assert summary["run"]["status"] == "failed"
+    assert summary["run"]["error"] == "upload refused"
+    assert summary["stages"] == {
+        "split": 0,
+        "ocr": 0,
+        "parsed": 1,
+        "uploaded": 1,
+    }
+    assert summary["failed"] == [
+        {"page": "page_2.pdf", "stage": "parsed", "error": "upload refused"}
+    ]
+    assert summary["pages_in_run"] == 1
+    assert summary["seconds"] == {"ocr": 1, "parse": 0.5, "upload": 0}
+    assert job_state.summary(first.run_id)["run"]["status"] == "done"
+    assert job_state.summary(42) is None
@@ -1,9 +1,20 @@
+import json
 import os
 import tempfile
+from unittest.mock import patch
 
 import pandas as pd
+import pyarrow
+import pyarrow.dataset
+import pytest
 
-from utils.merger import merge_document
+from utils.merger import (
+    count_records,
+    manifest_path,
+    merge_document,
+    merge_document_parquet,
+    open_files,
+)
 
 
 # the order of the elements is not important, so we sort before test
@@ -40,3 +51,255 @@ def test_merge_document():
             merged_df["B"],
             expected_df["B"],
         )
+
+
+def write(path, text: str):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_merge_document_streams_rows_in_file_order(tmp_path):
+    write(tmp_path / "page_2.csv", '"A","B"\n"3","x"\n')
+    write(tmp_path / "page_1.csv", '"A","B"\n"1","multi\nline"\n"2",""')
+    output_csv = tmp_path / "merged.csv"
+
+    merge_document(str(tmp_path), str(output_csv))
+
+    assert output_csv.read_text() == (
+        '"A","B"\n"1","multi\nline"\n"2",""\n"3","x"\n'
+    )
+
+
+def test_merge_document_reorders_columns(tmp_path):
+    write(tmp_path / "page_1.csv", "A,B\n1,2\n")
+    write(tmp_path / "page_2.csv", 'B,A\n4,3\n"6,5",5\n')
+    output_csv = tmp_path / "merged.csv"
+
+    merge_document(str(tmp_path), str(output_csv))
+
+    assert output_csv.read_text() == 'A,B\n1,2\n3,4\n5,"6,5"\n'
+
+
+def test_merge_document_rejects_other_columns(tmp_path):
+    write(tmp_path / "page_1.csv", "A,B\n1,2\n")
+    write(tmp_path / "page_2.csv", "A,C\n3,4\n")
+    output_csv = tmp_path / "merged.csv"
+
+    with pytest.raises(ValueError, match="missing \\['B'\\], extra \\['C'\\]"):
+        merge_document(str(tmp_path), str(output_csv))
+
+    assert sorted(os.listdir(tmp_path)) == ["page_1.csv", "page_2.csv"]
+
+
+def test_merge_document_with_read_workers(tmp_path):
+    for page in range(20):
+        write(tmp_path / f"page_{page:02}.csv", f"A,B\n{page},{page * 2}\n")
+    write(tmp_path / "page_20.csv", "")
+    write(tmp_path / "merged.csv", "A,B\nstale,stale\n")
+
+    merge_document(str(tmp_path), str(tmp_path / "merged.csv"))
+    sequential = (tmp_path / "merged.csv").read_bytes()
+    merge_document(str(tmp_path), str(tmp_path / "merged.csv"), 4)
+
+    assert (tmp_path / "merged.csv").read_bytes() == sequential
+    assert b"stale" not in sequential
+    assert sequential.count(b"\n") == 21
+
+
+def test_count_records_skips_quoted_line_breaks():
+    assert count_records(b'1,"a\nb"\n2,c\n', False) == (2, False)
+    # a quoted cell split between two chunks
+    assert count_records(b'1,"a\n', False) == (0, True)
+    assert count_records(b'b"\n', True) == (1, False)
+
+
+def read_rows(path) -> list[str]:
+    return path.read_text().splitlines()
+
+
+def test_incremental_merge_appends_new_files(tmp_path, capsys):
+    pages = tmp_path / "pages"
+    pages.mkdir()
+    output_csv = tmp_path / "merged.csv"
+    write(pages / "page_1.csv", "A,B\n1,1\n")
+    write(pages / "page_2.csv", "A,B\n2,2\n2,3\n")
+    merge_document(str(pages), str(output_csv), incremental=True)
+
+    merge_document(str(pages), str(output_csv), incremental=True)
+    assert "Skipped 2 unchanged files" in capsys.readouterr().out
+
+    write(pages / "page_0.csv", "A,B\n0,0\n")
+    with patch("utils.merger.open_files", wraps=open_files) as opened:
+        merge_document(str(pages), str(output_csv), incremental=True)
+
+    assert opened.call_args[0][0] == [str(pages / "page_0.csv")]
+    assert "appended 1 new files" in capsys.readouterr().out
+    assert read_rows(output_csv) == ["A,B", "1,1", "2,2", "2,3", "0,0"]
+    with open(manifest_path(str(output_csv))) as f:
+        manifest = json.load(f)
+    assert [
+        (entry["name"], entry["first_row"], entry["rows"])
+        for entry in manifest["files"]
+    ] == [("page_1.csv", 0, 1), ("page_2.csv", 1, 2), ("page_0.csv", 3, 1)]
+
+
+def test_incremental_merge_rebuilds_changed_segments(tmp_path, capsys):
+    pages = tmp_path / "pages"
+    pages.mkdir()
+    output_csv = tmp_path / "merged.csv"
+    for page in range(4):
+        write(pages / f"page_{page}.csv", f"A,B\n{page},{page}\n")
+    merge_document(str(pages), str(output_csv))
+
+    write(pages / "page_1.csv", "A,B\n1,changed\n")
+    os.remove(pages / "page_2.csv")
+    # touched without changes: checked by the hash, not merged again
+    os.utime(pages / "page_3.csv", (1, 1))
+    with patch("utils.merger.open_files", wraps=open_files) as opened:
+        merge_document(str(pages), str(output_csv), incremental=True)
+
+    assert opened.call_args[0][0] == [str(pages / "page_1.csv")]
+    out = capsys.readouterr().out
+    assert "Skipped 2 unchanged files" in out
+    assert "removed 1 files" in out
+    assert read_rows(output_csv) == ["A,B", "0,0", "3,3", "1,changed"]
+
+    merge_document(str(pages), str(output_csv), incremental=True)
+    assert "nothing to merge" in capsys.readouterr().out
+
+
+def test_incremental_merge_rebuilds_an_outdated_output(tmp_path, capsys):
+    pages = tmp_path / "pages"
+    pages.mkdir()
+    output_csv = tmp_path / "merged.csv"
+    write(pages / "page_1.csv", "A,B\n1,1\n")
+    merge_document(str(pages), str(output_csv))
+    # e.g. a merge interrupted while appending
+    with open(output_csv, "a") as f:
+        f.write("2,")
+
+    merge_document(str(pages), str(output_csv), incremental=True)
+
+    assert "outdated" in capsys.readouterr().out
+    assert read_rows(output_csv) == ["A,B", "1,1"]
+
+
+def write_period_pages(pages):
+    write(
+        pages / "2024-01_page_1.csv",
+        '"Data","Valor","PeriodoPrestacaoContas","file"\n'
+        '"2024-01-05","1.5","2024-01","2024-01_page_1.csv"\n'
+        '"","","2024-01","2024-01_page_1.csv"\n',
+    )
+    # same columns in another order
+    write(
+        pages / "2024-02_page_1.csv",
+        '"file","Data","Valor","PeriodoPrestacaoContas"\n'
+        '"2024-02_page_1.csv","2024-02-05","3","2024-02"\n',
+    )
+    write(pages / "2024-02_page_2.csv", "")
+
+
+def test_merge_document_parquet_partitions_by_period(tmp_path):
+    pages = tmp_path / "pages"
+    pages.mkdir()
+    write_period_pages(pages)
+    output_dir = tmp_path / "merged"
+    # a previous merge is replaced, stale partitions included
+    write(
+        pages / "2023-12_page_1.csv",
+        '"file","Data","Valor","PeriodoPrestacaoContas"\n'
+        '"2023-12_page_1.csv","2023-12-05","4","2023-12"\n',
+    )
+    merge_document_parquet(
+        str(pages), str(output_dir), ["PeriodoPrestacaoContas"]
+    )
+    os.remove(pages / "2023-12_page_1.csv")
+
+    merge_document_parquet(
+        str(pages), str(output_dir), ["PeriodoPrestacaoContas"], 2
+    )
+
+    assert sorted(os.listdir(output_dir)) == [
+        "PeriodoPrestacaoContas=2024-01",
+        "PeriodoPrestacaoContas=2024-02",
+        "_merger.json",
+    ]
+    dataset = pyarrow.dataset.dataset(
+        str(output_dir), format="parquet", partitioning="hive"
+    )
+    assert dataset.schema.field("Data").type == pyarrow.date32()
+    assert dataset.schema.field("Valor").type == pyarrow.float64()
+    assert pyarrow.types.is_dictionary(dataset.schema.field("file").type)
+    february = dataset.to_table(
+        filter=pyarrow.dataset.field("PeriodoPrestacaoContas") == "2024-02"
+    ).to_pylist()
+    assert len(february) == 1
+    assert february[0]["file"] == "2024-02_page_1.csv"
+    assert february[0]["Valor"] == 3.0
+    assert dataset.count_rows() == 3
+
+
+def test_merge_document_parquet_without_partitions(tmp_path):
+    pages = tmp_path / "pages"
+    pages.mkdir()
+    write_period_pages(pages)
+    output_dir = tmp_path / "merged"
+
+    merge_document_parquet(str(pages), str(output_dir))
+
+    assert sorted(os.listdir(output_dir)) == [
+        "_merger.json",
+        "part-0.parquet",
+    ]
+    merged = pd.read_parquet(output_dir)
+    assert list(merged.columns) == [
+        "Data",
+        "Valor",
+        "PeriodoPrestacaoContas",
+        "file",
+    ]
+    assert merged["Valor"].isna().sum() == 1
+
+
+def test_merge_document_parquet_rejects_unknown_partition(tmp_path):
+    pages = tmp_path / "pages"
+    pages.mkdir()
+    write_period_pages(pages)
+
+    with pytest.raises(ValueError, match="Periodo"):
+        merge_document_parquet(
+            str(pages), str(tmp_path / "merged"), ["Periodo"]
+        )
+    assert not os.path.exists(tmp_path / "merged")
+
+
+def test_merge_document_parquet_keeps_a_foreign_directory(tmp_path):
+    pages = tmp_path / "pages"
+    pages.mkdir()
+    write_period_pages(pages)
+    output_dir = tmp_path / "processed"
+    output_dir.mkdir()
+    write(output_dir / "page_1.csv", '"Data"\n')
+
+    with pytest.raises(ValueError, match="not a dataset written by"):
+        merge_document_parquet(str(pages), str(output_dir))
+
+    assert os.listdir(output_dir) == ["page_1.csv"]
+    assert not os.path.exists(tmp_path / "processed.partial")
+
+
+def test_merge_document_parquet_replaces_an_interrupted_merge(tmp_path):
+    pages = tmp_path / "pages"
+    pages.mkdir()
+    write_period_pages(pages)
+    output_dir = tmp_path / "merged"
+    partial_dir = tmp_path / "merged.partial"
+    partial_dir.mkdir()
+    write(partial_dir / "_merger.json", "{}")
+    write(partial_dir / "part-0.parquet", "truncated")
+
+    merge_document_parquet(str(pages), str(output_dir))
+
+    assert len(pd.read_parquet(output_dir)) == 3
+    assert not os.path.exists(partial_dir)
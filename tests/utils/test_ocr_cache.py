@@ -0,0 +1,79 @@
+import os
+
+from utils.constants import MethodType
+from utils.ocr_cache import OcrCache, cache_key
+
+
+def write_page(tmp_path, name, content):
+    page = tmp_path / name
+    page.write_bytes(content)
+    return str(page)
+
+
+def test_get_returns_none_on_miss(tmp_path):
+    cache = OcrCache(str(tmp_path / "cache"))
+    page = write_page(tmp_path, "page_1.pdf", b"page one")
+
+    assert cache.get(page, MethodType.llmwhisperer, {}) is None
+    assert not os.path.exists(tmp_path / "cache")
+
+
+def test_put_and_get_by_page_content(tmp_path):
+    cache = OcrCache(str(tmp_path / "cache"))
+    page = write_page(tmp_path, "page_1.pdf", b"page one")
+    same_content = write_page(tmp_path, "page_1_reissued.pdf", b"page one")
+
+    cache.put(page, MethodType.llmwhisperer, {"mode": "table"}, b"text")
+
+    assert (
+        cache.get(same_content, MethodType.llmwhisperer, {"mode": "table"})
+        == b"text"
+    )
+
+
+def test_key_depends_on_method_and_params():
+    key = cache_key("hash", MethodType.llmwhisperer, {"mode": "table"})
+
+    assert key == cache_key("hash", "llmwhisperer", {"mode": "table"})
+    assert key != cache_key("hash", MethodType.docling, {"mode": "table"})
+    assert key != cache_key("hash", MethodType.llmwhisperer, {"mode": "form"})
+    assert key != cache_key(
+        "other", MethodType.llmwhisperer, {"mode": "table"}
+    )
+
+
+def test_put_evicts_least_recently_used(tmp_path):
+    cache = OcrCache(str(tmp_path / "cache"), max_size_bytes=10)
+    first = write_page(tmp_path, "page_1.pdf", b"one")
+    second = write_page(tmp_path, "page_2.pdf", b"two")
+    third = write_page(tmp_path, "page_3.pdf", b"three")
+
+    cache.put(first, MethodType.llmwhisperer, {}, b"1111")
+    cache.put(second, MethodType.llmwhisperer, {}, b"2222")
+    # reading the first page makes the second the least recently used
+    assert cache.get(first, MethodType.llmwhisperer, {}) == b"1111"
+    cache.put(third, MethodType.llmwhisperer, {}, b"3333")
+
+    assert cache.get(first, MethodType.llmwhisperer, {}) == b"1111"
+    assert cache.get(second, MethodType.llmwhisperer, {}) is None
+    assert cache.get(third, MethodType.llmwhisperer, {}) == b"3333"
+
+
+def test_prune_and_stats(tmp_path):
+    cache = OcrCache(str(tmp_path / "cache"))
+    first = write_page(tmp_path, "page_1.pdf", b"one")
+    second = write_page(tmp_path, "page_2.pdf", b"two")
+    cache.put(first, MethodType.llmwhisperer, {}, b"1111")
+    cache.put(second, MethodType.docling, {}, b"22")
+
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["size"] == 6
+    assert stats["methods"] == {
+        "llmwhisperer": {"entries": 1, "size": 4},
+        "docling": {"entries": 1, "size": 2},
+    }
+
+    assert cache.prune(max_size_bytes=2) == 1
+    assert cache.stats()["entries"] == 1
+    assert cache.get(first, MethodType.llmwhisperer, {}) is None
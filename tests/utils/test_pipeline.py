@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from utils.pipeline import prefetch
+
+
+def test_prefetch_keeps_order():
+    assert list(prefetch(range(50), maxsize=3)) == list(range(50))
+
+
+def test_prefetch_runs_producer_in_another_thread():
+    producer_threads = set()
+
+    def produce():
+        for i in range(3):
+            producer_threads.add(threading.get_ident())
+            yield i
+
+    assert list(prefetch(produce())) == [0, 1, 2]
+    assert threading.get_ident() not in producer_threads
+
+
+def test_prefetch_raises_producer_errors_in_consumer():
+    def produce():
+        yield 1
+        raise ValueError("broken page")
+
+    consumed = []
+    with pytest.raises(ValueError, match="broken page"):
+        for item in prefetch(produce()):
+            consumed.append(item)
+    assert consumed == [1]
+
+
+def test_prefetch_stops_producer_when_consumer_stops():
+    closed = threading.Event()
+
+    def produce():
+        try:
+            i = 0
+            while True:
+                yield i
+                i += 1
+        finally:
+            closed.set()
+
+    stream = prefetch(produce(), maxsize=2)
+    assert next(stream) == 0
+    stream.close()
+    assert closed.wait(timeout=5)
@@ -3,7 +3,7 @@ import tempfile
 
 from pypdf import PdfWriter
 
-from utils.spliter import split_pdf_to_pages
+from utils.spliter import iter_pdf_pages, split_pdf_to_pages
 
 
 def create_sample_pdf(path, num_pages=3):
@@ -55,3 +55,52 @@ def test_split_pdf_to_pages_empty_pdf():
         split_pdf_to_pages(input_pdf, output_dir)
         assert os.path.exists(output_dir)
         assert len(os.listdir(output_dir)) == 0
+
+
+def test_split_pdf_to_pages_with_workers_keeps_page_order():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        input_pdf = os.path.join(tmpdir, "sample.pdf")
+        output_dir = os.path.join(tmpdir, "pages")
+        create_sample_pdf(input_pdf, num_pages=7)
+        serial = split_pdf_to_pages(input_pdf, os.path.join(tmpdir, "serial"))
+        parallel = split_pdf_to_pages(input_pdf, output_dir, workers=3)
+        assert [os.path.basename(p) for p in parallel] == [
+            os.path.basename(p) for p in serial
+        ]
+        assert all(os.path.exists(p) for p in parallel)
+
+
+def test_split_pdf_to_pages_with_workers_skips_existing_pages():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        input_pdf = os.path.join(tmpdir, "sample.pdf")
+        output_dir = os.path.join(tmpdir, "pages")
+        create_sample_pdf(input_pdf, num_pages=4)
+        os.makedirs(output_dir)
+        existing = os.path.join(output_dir, "page_2_sample.pdf")
+        with open(existing, "w") as f:
+            f.write("already generated")
+        output = split_pdf_to_pages(
+            input_pdf, output_dir, start=1, end=3, workers=2
+        )
+        assert [os.path.basename(p) for p in output] == [
+            "page_1_sample.pdf",
+            "page_2_sample.pdf",
+            "page_3_sample.pdf",
+        ]
+        with open(existing) as f:
+            assert f.read() == "already generated"
+
+
+def test_iter_pdf_pages_yields_pages_as_written():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        input_pdf = os.path.join(tmpdir, "sample.pdf")
+        output_dir = os.path.join(tmpdir, "pages")
+        create_sample_pdf(input_pdf, num_pages=3)
+        pages = iter_pdf_pages(input_pdf, output_dir)
+        first = next(pages)
+        assert os.path.basename(first) == "page_1_sample.pdf"
+        assert os.listdir(output_dir) == ["page_1_sample.pdf"]
+        assert [os.path.basename(p) for p in pages] == [
+            "page_2_sample.pdf",
+            "page_3_sample.pdf",
+        ]